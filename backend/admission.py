@@ -0,0 +1,202 @@
+"""
+Admission control for the model-inference endpoints
+Inference requests (CLIP forward passes) are admitted through a bounded FIFO
+queue instead of piling up on the worker's threads:
+- At most `concurrency` requests run inference at once; the rest wait in a
+  queue of at most `max_queue` entries
+- Each endpoint has its own limit on admitted (running + queued) requests, so
+  one expensive endpoint can't take the whole queue
+- Every request carries a deadline (the client's X-Request-Timeout budget, or
+  the server default). Requests whose deadline passes, or whose client
+  disconnects, while queued are dropped before any work is done
+- When the queue or an endpoint limit is full the request is rejected at once
+  with a Retry-After estimate from recent service times, so admitted requests
+  keep a stable latency under overload
+
+Admin ingest and background reclassify jobs (one slot per chunk) share the
+same slots, so they interleave with user requests instead of running beside
+them. Cheap endpoints (/image, /products, ...) don't go through the
+controller, so with a threaded worker they are served while inference is
+queued.
+"""
+
+import math
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+# Inference requests running at once (CPU inference already uses every core)
+CONCURRENCY = 1
+# Inference requests waiting for a slot
+MAX_QUEUE = 4
+# Admitted (running + queued) requests per endpoint
+ENDPOINT_LIMITS = {'recommend': 4, 'recommend_batch': 2, 'outfit': 2, 'classify': 2, 'ingest': 1, 'reclassify': 1}
+# Deadline for requests that don't send X-Request-Timeout, and the cap on those that do
+DEFAULT_DEADLINE_SECONDS = 30.0
+MAX_DEADLINE_SECONDS = 120.0
+DEADLINE_HEADER = 'X-Request-Timeout'
+# How often queued requests re-check their deadline and connection
+POLL_SECONDS = 0.25
+# Weight of the newest sample in the service-time moving average
+SERVICE_TIME_ALPHA = 0.2
+MAX_RETRY_AFTER = 60
+
+
+class Rejected(Exception):
+    """Request not admitted; reason is queue_full, endpoint_limit, deadline or disconnected"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_limits(spec):
+    """'recommend=4,outfit=2' -> {'recommend': 4, 'outfit': 2}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        endpoint, _, limit = item.partition('=')
+        limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+def request_deadline(headers, start, default=DEFAULT_DEADLINE_SECONDS):
+    """perf_counter deadline for a request from its X-Request-Timeout header (seconds)"""
+    try:
+        budget = float(headers.get(DEADLINE_HEADER, default))
+    except ValueError:
+        budget = default
+    return start + min(max(budget, 0.0), MAX_DEADLINE_SECONDS)
+
+
+def client_disconnected(environ):
+    """
+    Best-effort check that the client has closed its connection
+
+    Uses the raw socket gunicorn (gunicorn.socket) or the werkzeug dev server
+    (werkzeug.socket) puts in the WSGI environ: a readable socket with no data
+    means the peer closed it. Unknown servers are assumed connected.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+class AdmissionController:
+    """
+    Bounded FIFO admission for inference endpoints
+
+    Args:
+        concurrency: Requests allowed to run at once
+        max_queue: Requests allowed to wait
+        endpoint_limits: Endpoint -> admitted (running + queued) limit; unlisted endpoints
+                         are only bounded by the queue
+    """
+
+    def __init__(self, concurrency=CONCURRENCY, max_queue=MAX_QUEUE, endpoint_limits=None):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.endpoint_limits = dict(ENDPOINT_LIMITS if endpoint_limits is None else endpoint_limits)
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiters = deque()
+        self._admitted = {}
+        self._service_time = {}
+
+    def retry_after(self):
+        """Seconds until a slot is likely free, from queue length and mean service time"""
+        with self._lock:
+            return self._retry_after()
+
+    def _retry_after(self):
+        service_time = max(self._service_time.values(), default=1.0)
+        backlog = (len(self._waiters) + self._running) / self.concurrency
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(backlog * service_time)))
+
+    def acquire(self, endpoint, deadline, disconnected=None):
+        """
+        Wait for an inference slot
+
+        Args:
+            endpoint: Endpoint name (key of endpoint_limits)
+            deadline: time.perf_counter() value after which the request is dropped
+            disconnected: Optional callable returning True once the client is gone
+
+        Returns:
+            Seconds spent queued
+
+        Raises:
+            Rejected: The request must not run
+        """
+        start = time.perf_counter()
+        with self._lock:
+            limit = self.endpoint_limits.get(endpoint)
+            if limit is not None and self._admitted.get(endpoint, 0) >= limit:
+                raise Rejected('endpoint_limit', self._retry_after())
+            if self._running < self.concurrency and not self._waiters:
+                self._running += 1
+                self._admitted[endpoint] = self._admitted.get(endpoint, 0) + 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                raise Rejected('queue_full', self._retry_after())
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+            self._admitted[endpoint] = self._admitted.get(endpoint, 0) + 1
+
+        while True:
+            remaining = deadline - time.perf_counter()
+            if waiter.wait(min(POLL_SECONDS, max(remaining, 0.0))):
+                return time.perf_counter() - start
+
+            if remaining <= 0:
+                reason = 'deadline'
+            elif disconnected is not None and disconnected():
+                reason = 'disconnected'
+            else:
+                continue
+
+            with self._lock:
+                granted = waiter.is_set()
+                if not granted:
+                    self._waiters.remove(waiter)
+                    self._admitted[endpoint] -= 1
+                retry_after = self._retry_after()
+            if granted:
+                # The slot was handed over while giving up; pass it on
+                self.release(endpoint)
+            raise Rejected(reason, retry_after)
+
+    def release(self, endpoint, service_time=None):
+        """Free the slot taken by acquire, handing it to the oldest waiter"""
+        with self._lock:
+            self._admitted[endpoint] -= 1
+            if service_time is not None:
+                previous = self._service_time.get(endpoint, service_time)
+                self._service_time[endpoint] = previous + SERVICE_TIME_ALPHA * (service_time - previous)
+            if self._waiters:
+                # The running count is unchanged: the slot moves to the waiter
+                self._waiters.popleft().set()
+            else:
+                self._running -= 1
+
+    def status(self):
+        """Snapshot for /health and metrics"""
+        with self._lock:
+            return {
+                'running': self._running,
+                'queued': len(self._waiters),
+                'concurrency': self.concurrency,
+                'max_queue': self.max_queue,
+                'admitted': {endpoint: count for endpoint, count in self._admitted.items() if count},
+                'service_time': {endpoint: round(seconds, 4) for endpoint, seconds in self._service_time.items()}
+            }
@@ -3,44 +3,137 @@ Flask API Server for Outfit Recommendation System
 Provides REST API endpoints for the Flutter app to access AI recommendations
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, Response
+from functools import wraps
 from flask_cors import CORS
 import torch
-import json
 import base64
+import hmac
 import io
 from PIL import Image
 from transformers import CLIPImageProcessor, CLIPVisionModel
 from train_siamese_resnet50 import SiameseWithProjection
 from clothing_classifier import ClothingStyleClassifier
-import faiss
+from catalog_store import CatalogManager
+from catalog_ingest import ingest_products, delete_products, compact_categories
+from embedding_jobs import model_version
+from feature_store import FEATURES_DIR, FeatureStore
+from reclassify_jobs import ReclassifyJobRunner, CHUNK_SIZE, JOBS_DIR, MIN_CONFIDENCE
+from outfit_builder import (
+    build_outfits, CANDIDATES_PER_SLOT, COMPATIBILITY_WEIGHT, MAX_CANDIDATES_PER_SLOT, MAX_OUTFITS, NUM_OUTFITS
+)
+from batch_recommend import (
+    decode_images, search_batch, per_image_rankings, merged_ranking, DEFAULT_MERGE, MAX_BATCH_IMAGES, MERGE_MODES
+)
+from similarity_graph import open_graph, GRAPH_DIR, NUM_NEIGHBORS, KINDS
+from admission import (
+    AdmissionController, Rejected, client_disconnected, parse_limits, request_deadline,
+    CONCURRENCY, DEFAULT_DEADLINE_SECONDS, ENDPOINT_LIMITS, MAX_QUEUE
+)
+from http_cache import VersionedResponseCache
+from memory_report import (
+    MemoryBudget, deep_sizeof, index_bytes, module_breakdown, module_bytes, parse_budgets, print_report,
+    process_memory, tensor_bytes
+)
+from server_metrics import MetricsRegistry, StageTimer
+from request_profiler import RequestProfiler, format_server_timing, PROFILE_HEADER
 import numpy as np
 import os
+import time
 import zipfile
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Flutter app
 
-# Configuration
-MODEL_PATH = "best_model.pt"
-FAISS_DIR = "faiss_indices"
-METADATA_PATH = "product_metadata.json"
-ZIP_PATH = "all_product_images.zip"
+# Configuration (overridable so load tests can point at scaled catalogs)
+MODEL_PATH = os.environ.get("MODEL_PATH", "best_model.pt")
+FAISS_DIR = os.environ.get("FAISS_DIR", "faiss_indices")
+METADATA_PATH = os.environ.get("METADATA_PATH", "product_metadata.json")
+ZIP_PATH = os.environ.get("ZIP_PATH", "all_product_images.zip")
+# Optional style classifier checkpoint (e.g. from sweep_style_head.py); zero-shot if unset
+STYLE_MODEL_PATH = os.environ.get("STYLE_MODEL_PATH")
+PORT = int(os.environ.get("PORT", "5000"))
+FEATURE_DIR = os.environ.get("FEATURE_DIR", FEATURES_DIR)
+RECLASSIFY_JOBS_DIR = os.environ.get("RECLASSIFY_JOBS_DIR", JOBS_DIR)
+# Precomputed neighbour graph for /similar (built by similarity_graph.py)
+SIMILARITY_GRAPH_DIR = os.environ.get("SIMILARITY_GRAPH_DIR", GRAPH_DIR)
+
+# Admin and debug endpoints require this token in the X-Admin-Token header; unset = disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# Poll catalog files every N seconds and hot-reload on change (0 = disabled)
+CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", "0"))
+# Fraction of requests to profile (requests with X-Debug-Profile are always profiled)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+# Requests slower than this are kept in the slow-request buffer
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_BUFFER = int(os.environ.get("SLOW_REQUEST_BUFFER", "100"))
+# Admission control for inference endpoints (see admission.py)
+INFERENCE_CONCURRENCY = int(os.environ.get("INFERENCE_CONCURRENCY", CONCURRENCY))
+INFERENCE_QUEUE = int(os.environ.get("INFERENCE_QUEUE", MAX_QUEUE))
+# e.g. "recommend=4,outfit=2", merged over the defaults
+INFERENCE_ENDPOINT_LIMITS = {**ENDPOINT_LIMITS, **parse_limits(os.environ.get("INFERENCE_ENDPOINT_LIMITS"))}
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS))
+# Per-component memory budgets in MB, e.g. "siamese_model=700,faiss_indices=64,metadata=128"
+MEMORY_BUDGETS_MB = os.environ.get("MEMORY_BUDGETS_MB")
+# warn: log overruns; refuse: fail the load (a refused catalog reload keeps the current snapshot)
+MEMORY_BUDGET_ACTION = os.environ.get("MEMORY_BUDGET_ACTION", "warn")
 
 # Global variables for model and data
 model = None
 processor = None
 device = None
-metadata = None
-faiss_indices = {}
-id_maps = {}
+memory_budget = MemoryBudget(parse_budgets(MEMORY_BUDGETS_MB), MEMORY_BUDGET_ACTION)
+catalog = CatalogManager(FAISS_DIR, METADATA_PATH, check_memory=memory_budget.check_catalog_files)
 style_classifier = None
+similarity_graph = None
+siamese_features = None
+admission = AdmissionController(INFERENCE_CONCURRENCY, INFERENCE_QUEUE, INFERENCE_ENDPOINT_LIMITS)
+reclassify_jobs = ReclassifyJobRunner(catalog, FAISS_DIR, METADATA_PATH, FEATURE_DIR, RECLASSIFY_JOBS_DIR,
+                                      admission=admission)
+
+# Metrics exposed on /metrics
+metrics = MetricsRegistry()
+REQUEST_COUNT = metrics.counter(
+    'clothwise_http_requests_total', 'HTTP requests by endpoint, method and status',
+    ('endpoint', 'method', 'status'))
+REQUEST_LATENCY = metrics.histogram(
+    'clothwise_http_request_duration_seconds', 'HTTP request latency by endpoint', ('endpoint',))
+STAGE_LATENCY = metrics.histogram(
+    'clothwise_stage_duration_seconds', 'Latency of each pipeline stage', ('pipeline', 'stage'))
+SEARCH_LATENCY = metrics.histogram(
+    'clothwise_search_duration_seconds', 'FAISS search latency by category', ('category',))
+INDEX_VECTORS = metrics.gauge(
+    'clothwise_index_vectors', 'Vectors in each category index (including tombstoned)', ('category',))
+INDEX_BYTES = metrics.gauge(
+    'clothwise_index_bytes', 'Approximate vector storage of each category index', ('category',))
+CATALOG_PRODUCTS = metrics.gauge('clothwise_catalog_products', 'Products in the current catalog snapshot')
+CATALOG_GENERATION = metrics.gauge('clothwise_catalog_generation', 'Generation of the current catalog snapshot')
+MODEL_LOAD_SECONDS = metrics.gauge('clothwise_model_load_seconds', 'Time taken to load each model', ('model',))
+REQUESTS_SHED = metrics.counter(
+    'clothwise_requests_shed_total', 'Inference requests rejected or dropped by admission control',
+    ('endpoint', 'reason'))
+ADMISSION_WAIT = metrics.histogram(
+    'clothwise_admission_wait_seconds', 'Time admitted inference requests spent queued', ('endpoint',))
+INFERENCE_RUNNING = metrics.gauge('clothwise_inference_running', 'Inference requests running')
+RESPONSE_CACHE = metrics.counter(
+    'clothwise_response_cache_total', 'Catalog read responses by cache result (not_modified, hit, miss)',
+    ('endpoint', 'result'))
+MEMORY_BYTES = metrics.gauge('clothwise_memory_bytes', 'Memory attributed to each component', ('component',))
+PROCESS_RSS = metrics.gauge('clothwise_process_rss_bytes', 'Resident memory of the server process')
+INFERENCE_QUEUED = metrics.gauge('clothwise_inference_queued', 'Inference requests waiting for a slot')
+
+# Catalog read endpoints answer from here, keyed on the catalog version
+catalog_responses = VersionedResponseCache(observe=lambda result: RESPONSE_CACHE.inc(request.url_rule.rule, result))
+profiler = RequestProfiler(PROFILE_SAMPLE_RATE, SLOW_REQUEST_MS / 1000, SLOW_REQUEST_BUFFER)
 
 
 def load_model():
     """Load the CLIP model and processor"""
     global model, processor, device
 
+    start = time.perf_counter()
+    # The checkpoint holds the full state dict, so its size is the model's
+    memory_budget.check('siamese_model', os.path.getsize(MODEL_PATH), estimated=True)
     print("Loading CLIP model...")
     clip = CLIPVisionModel.from_pretrained("openai/clip-vit-base-patch32", use_safetensors=True)
     processor = CLIPImageProcessor.from_pretrained("openai/clip-vit-base-patch32")
@@ -52,86 +145,328 @@ def load_model():
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model.to(device).eval()
+    memory_budget.check('siamese_model', module_bytes(model))
 
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - start, 'siamese_clip')
     print(f"Model loaded successfully on {device}")
 
 
-def load_metadata():
-    """Load product metadata"""
-    global metadata
+def siamese_feature_store():
+    """Feature store for the loaded siamese model's embeddings (opened on first use)"""
+    global siamese_features
 
-    with open(METADATA_PATH, 'r') as f:
-        metadata = json.load(f)
+    version = model_version(MODEL_PATH)
+    if siamese_features is None or siamese_features.model_version != version:
+        siamese_features = FeatureStore('siamese', version, root=FEATURE_DIR)
+    return siamese_features
 
-    print(f"Loaded {len(metadata)} products from metadata")
 
+def load_style_classifier():
+    """Load the clothing style classifier"""
+    global style_classifier
 
-def load_faiss_indices():
-    """Load all FAISS indices"""
-    global faiss_indices, id_maps
+    start = time.perf_counter()
+    print("\nLoading clothing style classifier...")
+    classifier = ClothingStyleClassifier(model_path=STYLE_MODEL_PATH)
+    memory_budget.check('style_classifier', sum(style_classifier_memory(classifier).values()))
+    style_classifier = classifier
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - start, 'style_classifier')
+
+
+def load_similarity_graph():
+    """Load (or reload) the precomputed neighbour graph, if it has been built"""
+    global similarity_graph
+
+    try:
+        similarity_graph = open_graph(SIMILARITY_GRAPH_DIR)
+    except Exception as e:
+        print(f"⚠ Could not load similarity graph: {e}")
 
-    for file in os.listdir(FAISS_DIR):
-        if file.endswith(".index"):
-            category = file.replace(".index", "")
-            index_path = os.path.join(FAISS_DIR, file)
-            ids_path = os.path.join(FAISS_DIR, f"{category}_ids.json")
 
-            # Load index
-            faiss_indices[category] = faiss.read_index(index_path)
+def style_classifier_memory(classifier):
+    """Bytes of the style classifier's OpenAI CLIP (vision and text towers), head and prompt features"""
+    memory = module_breakdown(classifier.model, {
+        'vision_tower': ['visual'],
+        'text_tower': ['transformer', 'token_embedding', 'positional_embedding', 'ln_final', 'text_projection']
+    })
+    if classifier.classifier_head is not None:
+        memory['classifier_head'] = module_bytes(classifier.classifier_head)
+    if isinstance(getattr(classifier, 'text_features', None), torch.Tensor):
+        memory['text_features'] = tensor_bytes([classifier.text_features])
+    return memory
 
-            # Load ID mapping
-            with open(ids_path, 'r') as f:
-                id_maps[category] = json.load(f)
 
-    print(f"Loaded {len(faiss_indices)} FAISS indices")
+# Deep object sizes of the current catalog version (walking metadata is slow-ish)
+_catalog_object_sizes = {}
 
 
-def get_recommendations_from_image(image, num_recommendations=15):
-    """Generate recommendations for an uploaded image"""
-    # Process image
-    inputs = processor(images=image, return_tensors="pt").to(device)
+def catalog_object_sizes(snapshot):
+    """Deep sizes of a snapshot's metadata and ID maps, computed once per catalog version"""
+    key = (snapshot.version, snapshot.generation)
+    sizes = _catalog_object_sizes.get(key)
+    if sizes is None:
+        sizes = {'metadata': deep_sizeof(snapshot.metadata), 'id_maps': deep_sizeof(snapshot.id_maps)}
+        _catalog_object_sizes.clear()
+        _catalog_object_sizes[key] = sizes
+    return sizes
+
+
+def memory_report():
+    """
+    Memory attributed to each serving component, with budgets
+
+    Returns:
+        Dict with 'components' (name -> {'bytes', 'budget_bytes', 'over_budget', 'detail'}),
+        'accounted_bytes', 'process' (rss_bytes, peak_rss_bytes) and 'budget_action'
+    """
+    details = {}
+    if model is not None:
+        details['siamese_model'] = module_breakdown(model, {'clip_vision': ['clip'], 'projector': ['projector']})
+    if style_classifier is not None:
+        details['style_classifier'] = style_classifier_memory(style_classifier)
+
+    snapshot = catalog.current()
+    if snapshot is not None:
+        details['faiss_indices'] = {category: index_bytes(index) for category, index in snapshot.faiss_indices.items()}
+        sizes = catalog_object_sizes(snapshot)
+        details['metadata'] = {'products': sizes['metadata']}
+        details['id_maps'] = {'categories': sizes['id_maps']}
+
+    graph = similarity_graph
+    if graph is not None:
+        # Memory-mapped: pages count toward RSS only once read
+        details['similarity_graph'] = {
+            'arrays_mapped': int(graph.neighbors.nbytes + graph.distances.nbytes),
+            'names': deep_sizeof(graph.names)
+        }
+    details['response_cache'] = {'bodies': catalog_responses.memory_bytes()}
+
+    components = {}
+    for component, detail in details.items():
+        nbytes = sum(detail.values())
+        budget = memory_budget.limit(component)
+        components[component] = {
+            'bytes': nbytes,
+            'budget_bytes': budget,
+            'over_budget': budget is not None and nbytes > budget,
+            'detail': detail
+        }
+
+    return {
+        'components': components,
+        'accounted_bytes': sum(entry['bytes'] for entry in components.values()),
+        'process': process_memory(),
+        'budget_action': memory_budget.action
+    }
+
+
+def collect_catalog_metrics():
+    """Refresh catalog gauges from the current snapshot (runs on each scrape)"""
+    snapshot = catalog.current()
+    INDEX_VECTORS.clear()
+    INDEX_BYTES.clear()
+    if snapshot is None:
+        return
+    for category, index in snapshot.faiss_indices.items():
+        INDEX_VECTORS.set(index.ntotal, category)
+        INDEX_BYTES.set(index.ntotal * index.d * 4, category)
+    CATALOG_PRODUCTS.set(len(snapshot.metadata))
+    CATALOG_GENERATION.set(snapshot.generation)
+
+
+def collect_memory_metrics():
+    report = memory_report()
+    MEMORY_BYTES.clear()
+    for component, entry in report['components'].items():
+        MEMORY_BYTES.set(entry['bytes'], component)
+    if report['process']['rss_bytes'] is not None:
+        PROCESS_RSS.set(report['process']['rss_bytes'])
+
+
+def collect_admission_metrics():
+    status = admission.status()
+    INFERENCE_RUNNING.set(status['running'])
+    INFERENCE_QUEUED.set(status['queued'])
+
+
+metrics.add_collector(collect_catalog_metrics)
+metrics.add_collector(collect_admission_metrics)
+metrics.add_collector(collect_memory_metrics)
+
+
+def request_timer(pipeline):
+    """Stage timer for the current request, kept on g for profiling"""
+    g.stage_timer = StageTimer(STAGE_LATENCY, pipeline)
+    return g.stage_timer
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile = profiler.start() if profiler.should_profile(request.headers) else None
+    g.profiled = g.profile is not None or bool(request.headers.get(PROFILE_HEADER))
 
-    # Generate embedding
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+
+    duration = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(duration, endpoint)
+    REQUEST_COUNT.inc(endpoint, request.method, str(response.status_code))
+
+    timer = g.pop('stage_timer', None)
+    timings = timer.timings if timer else []
+    profile = g.pop('profile', None)
+    profile_report = profiler.stop(profile) if profile is not None else None
+
+    if g.pop('profiled', False):
+        response.headers['Server-Timing'] = format_server_timing(timings, duration)
+    profiler.record(endpoint, duration, timings, g.pop('profile_params', None), profile_report)
+    return response
+
+
+def require_admin(f):
+    """Reject admin requests without a valid X-Admin-Token; all are rejected if ADMIN_TOKEN is unset"""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'success': False, 'error': 'Admin endpoints are disabled (ADMIN_TOKEN not set)'}), 403
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def admission_controlled(endpoint):
+    """
+    Run the view only once admission control grants it an inference slot
+
+    Rejected requests get 503 with Retry-After. The body is read before
+    queueing, so a client that gives up while queued shows as a closed socket.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            environ = request.environ
+            deadline = request_deadline(request.headers, g.request_start, REQUEST_DEADLINE_SECONDS)
+            request.get_data(cache=True)
+            try:
+                waited = admission.acquire(endpoint, deadline, lambda: client_disconnected(environ))
+                if waited and client_disconnected(environ):
+                    admission.release(endpoint)
+                    raise Rejected('disconnected', admission.retry_after())
+            except Rejected as e:
+                REQUESTS_SHED.inc(endpoint, e.reason)
+                return jsonify({
+                    'success': False,
+                    'error': 'Server busy, retry later',
+                    'reason': e.reason
+                }), 503, {'Retry-After': str(e.retry_after)}
+
+            ADMISSION_WAIT.observe(waited, endpoint)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                admission.release(endpoint, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def embed_images(images, timer):
+    """Siamese embeddings (the catalog index space) of uploaded images, one forward pass, (n, d)"""
+    # Process images
+    with timer('preprocess'):
+        inputs = processor(images=images, return_tensors="pt").to(device)
+
+    # Generate embeddings
     with torch.no_grad():
-        user_emb = model.clip(pixel_values=inputs['pixel_values']).last_hidden_state[:, 0, :]
-        user_emb = model.projector(user_emb).squeeze(0).cpu().numpy().astype("float32")
+        with timer('clip_forward'):
+            user_emb = model.clip(pixel_values=inputs['pixel_values']).last_hidden_state[:, 0, :]
+        with timer('projector'):
+            return model.projector(user_emb).cpu().numpy().astype("float32")
+
+
+def embed_image(image, timer):
+    """Siamese embedding (the catalog index space) of an uploaded image"""
+    return embed_images([image], timer)[0]
+
+
+def get_recommendations_from_image(image, snapshot, num_recommendations=15, timer=None):
+    """Generate recommendations for an uploaded image"""
+    timer = timer or StageTimer(STAGE_LATENCY, 'recommend')
+    user_emb = embed_image(image, timer)
 
     # Search in each category
     recommendations = {}
-    for category, index in faiss_indices.items():
-        id_map = id_maps[category]
-        k = min(num_recommendations, len(id_map))
+    with timer('search'):
+        for category in snapshot.faiss_indices:
+            start = time.perf_counter()
+            hits = snapshot.search(category, user_emb[None], num_recommendations)[0]
+            SEARCH_LATENCY.observe(time.perf_counter() - start, category)
+            recommendations[category] = [name for name, _ in hits]
 
-        D, I = index.search(user_emb[None], k=k)
-        top_indices = [int(i) for i in I[0]]
+    return recommendations
 
-        recommendations[category] = [id_map[idx] for idx in top_indices]
 
-    return recommendations
+def product_payload(product_name, product_info, default_category=''):
+    """Product fields returned by the API"""
+    return {
+        'name': product_name,
+        'category': product_info.get('category', default_category),
+        'price': product_info.get('price', 'N/A'),
+        'description': product_info.get('desc', ''),
+        'image_id': product_info.get('image', ''),
+        'gender': product_info.get('gender', 'unisex'),
+        'url': product_info.get('href', ''),
+        'style_type': product_info.get('style_type', 'casual')
+    }
+
+
+def build_recommendation_payload(recommendations, metadata):
+    """Attach product details to per-category lists of recommended names"""
+    response_data = {}
+    for category, product_names in recommendations.items():
+        response_data[category] = [
+            product_payload(product_name, metadata[product_name], category)
+            for product_name in product_names
+            if product_name in metadata
+        ]
+    return response_data
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    snapshot = catalog.current()
+    graph = similarity_graph
     return jsonify({
         'status': 'healthy',
         'model_loaded': model is not None,
-        'metadata_loaded': metadata is not None,
-        'categories': len(faiss_indices)
+        'metadata_loaded': snapshot is not None,
+        'categories': len(snapshot.faiss_indices) if snapshot else 0,
+        'catalog_generation': snapshot.generation if snapshot else None,
+        'inference': admission.status(),
+        'similarity_graph': graph.status(snapshot) if graph is not None else None
     })
 
 
 @app.route('/categories', methods=['GET'])
 def get_categories():
     """Get list of available categories"""
-    categories = sorted(list(faiss_indices.keys()))
-    return jsonify({
-        'categories': categories,
-        'count': len(categories)
+    snapshot = catalog.current()
+    return catalog_responses.respond(request, snapshot.version, snapshot.modified_at, lambda: {
+        'categories': snapshot.categories,
+        'count': len(snapshot.faiss_indices)
     })
 
 
 @app.route('/recommend', methods=['POST'])
+@admission_controlled('recommend')
 def recommend():
     """
     Generate outfit recommendations from uploaded image
@@ -167,13 +502,26 @@ def recommend():
         if 'image' not in data:
             return jsonify({'success': False, 'error': 'No image provided'}), 400
 
+        # Pin the catalog for the whole request, even if a reload swaps it
+        snapshot = catalog.current()
+        metadata = snapshot.metadata
+        timer = request_timer('recommend')
+
         # Decode base64 image
-        image_data = base64.b64decode(data['image'])
-        image = Image.open(io.BytesIO(image_data)).convert("RGB")
+        with timer('decode_base64'):
+            image_data = base64.b64decode(data['image'])
+        with timer('decode_image'):
+            image = Image.open(io.BytesIO(image_data)).convert("RGB")
 
         # Get recommendations
         num_items = data.get('num_items', 15)
-        all_recommendations = get_recommendations_from_image(image, num_items)
+        g.profile_params = {
+            'num_items': num_items,
+            'categories': data.get('categories'),
+            'image_bytes': len(image_data),
+            'image_size': list(image.size)
+        }
+        all_recommendations = get_recommendations_from_image(image, snapshot, num_items, timer)
 
         # Filter by requested categories if specified
         requested_categories = data.get('categories')
@@ -184,28 +532,239 @@ def recommend():
             }
 
         # Build response with product details
-        response_data = {}
-        for category, product_names in all_recommendations.items():
-            response_data[category] = []
-            for product_name in product_names:
-                if product_name in metadata:
-                    product_info = metadata[product_name]
-                    response_data[category].append({
-                        'name': product_name,
-                        'category': product_info.get('category', category),
-                        'price': product_info.get('price', 'N/A'),
-                        'description': product_info.get('desc', ''),
-                        'image_id': product_info.get('image', ''),
-                        'gender': product_info.get('gender', 'unisex'),
-                        'url': product_info.get('href', ''),
-                        'style_type': product_info.get('style_type', 'casual')
-                    })
+        with timer('build_response'):
+            response_data = build_recommendation_payload(all_recommendations, metadata)
+            response = jsonify({
+                'success': True,
+                'recommendations': response_data,
+                'total_categories': len(response_data)
+            })
+
+        return response
 
+    except Exception as e:
         return jsonify({
-            'success': True,
-            'recommendations': response_data,
-            'total_categories': len(response_data)
-        })
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/recommend/batch', methods=['POST'])
+@admission_controlled('recommend_batch')
+def recommend_batch():
+    """
+    Recommendations for several uploaded images in one request
+
+    All images are embedded in one forward pass and every category index is
+    searched once for all of them. Besides the per-image lists, a merged
+    ranking scores each candidate against the whole set of images.
+
+    Request body (JSON):
+    {
+        "images": ["base64_encoded_image_data", ...],  // max MAX_BATCH_IMAGES
+        "categories": ["Pants", "Shirts"],  // optional, filter by categories
+        "num_items": 15,  // optional, default 15
+        "merge": "mean",  // optional, "mean" | "min" | "max", or null for no merged ranking
+        "per_image": true  // optional, false returns only the merged ranking
+    }
+
+    Response:
+    {
+        "success": true,
+        "results": [
+            {"index": 0, "success": true, "recommendations": {"Pants": [{...product, "distance": 0.41}, ...], ...}},
+            {"index": 1, "success": false, "error": "Could not decode image: ..."},
+            ...
+        ],
+        "merged": {"Pants": [{...product, "distance": 0.52, "distances": [0.41, 0.63]}, ...], ...},
+        "images": 2,
+        "failed": 1
+    }
+    """
+    try:
+        data = request.get_json()
+
+        images = data.get('images')
+        if not isinstance(images, list) or not images:
+            return jsonify({'success': False, 'error': 'No images provided'}), 400
+        if len(images) > MAX_BATCH_IMAGES:
+            return jsonify({'success': False, 'error': f'At most {MAX_BATCH_IMAGES} images per batch'}), 400
+        merge = data.get('merge', DEFAULT_MERGE)
+        if merge is not None and merge not in MERGE_MODES:
+            return jsonify({'success': False, 'error': f'merge must be one of {sorted(MERGE_MODES)} or null'}), 400
+        per_image = bool(data.get('per_image', True))
+
+        snapshot = catalog.current()
+        metadata = snapshot.metadata
+        timer = request_timer('recommend_batch')
+
+        with timer('decode_images'):
+            decoded = decode_images(images)
+        ok = [i for i, (image, _, error) in enumerate(decoded) if error is None]
+        if not ok:
+            return jsonify({'success': False, 'error': 'No image could be decoded',
+                            'errors': [error for _, _, error in decoded]}), 400
+
+        num_items = int(data.get('num_items', 15))
+        requested_categories = data.get('categories')
+        categories = [cat for cat in snapshot.faiss_indices
+                      if not requested_categories or cat in requested_categories]
+        g.profile_params = {
+            'num_items': num_items,
+            'categories': requested_categories,
+            'images': len(images),
+            'image_bytes': sum(size for _, size, _ in decoded),
+            'merge': merge
+        }
+
+        queries = embed_images([decoded[i][0] for i in ok], timer)
+        with timer('search'):
+            hits = search_batch(snapshot, queries, categories, num_items, SEARCH_LATENCY.observe)
+        merged = None
+        if merge is not None:
+            with timer('merge'):
+                merged = merged_ranking(snapshot, queries, hits, num_items, merge)
+
+        with timer('build_response'):
+            results = [{'index': i, 'success': False, 'error': error} for i, (_, _, error) in enumerate(decoded)]
+            if per_image:
+                for i, ranking in zip(ok, per_image_rankings(snapshot, hits, len(ok))):
+                    results[i] = {
+                        'index': i,
+                        'success': True,
+                        'recommendations': {
+                            category: [
+                                dict(product_payload(name, metadata[name], category), distance=distance)
+                                for name, distance in items if name in metadata
+                            ]
+                            for category, items in ranking.items()
+                        }
+                    }
+            else:
+                for i in ok:
+                    results[i] = {'index': i, 'success': True}
+
+            payload = {
+                'success': True,
+                'results': results,
+                'images': len(ok),
+                'failed': len(images) - len(ok)
+            }
+            if merged is not None:
+                payload['merged'] = {
+                    category: [
+                        dict(product_payload(name, metadata[name], category), distance=distance, distances=distances)
+                        for name, distance, distances in items if name in metadata
+                    ]
+                    for category, items in merged.items()
+                }
+            response = jsonify(payload)
+
+        return response
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/outfit', methods=['POST'])
+@admission_controlled('outfit')
+def outfit():
+    """
+    Assemble complete outfits (one item per slot) for an uploaded image
+
+    Items are chosen for similarity to the image and for compatibility with
+    each other, so the client gets a few finished outfits instead of long
+    per-category lists.
+
+    Request body (JSON):
+    {
+        "image": "base64_encoded_image_data",
+        "slots": ["top", "bottom", "outerwear"],  // optional, or {"top": ["Shirts", "Polos"], ...}
+        "num_outfits": 5,  // optional
+        "candidates_per_slot": 30,  // optional, max 200
+        "compatibility_weight": 1.0,  // optional, 0 = similarity to the image only
+        "unique_items": true  // optional, use each product in at most one outfit
+    }
+
+    Response:
+    {
+        "success": true,
+        "outfits": [
+            {
+                "items": {"top": {...product, "distance": 0.63}, "bottom": {...}, ...},
+                "score": -3.2,
+                "query_cost": 2.1,
+                "compatibility_cost": 1.1
+            },
+            ...
+        ],
+        "slots": {"top": ["Shirts", ...], ...},
+        "skipped_slots": []
+    }
+    """
+    try:
+        data = request.get_json()
+
+        if 'image' not in data:
+            return jsonify({'success': False, 'error': 'No image provided'}), 400
+
+        num_outfits = int(data.get('num_outfits', NUM_OUTFITS))
+        candidates_per_slot = int(data.get('candidates_per_slot', CANDIDATES_PER_SLOT))
+        if not 1 <= num_outfits <= MAX_OUTFITS or not 1 <= candidates_per_slot <= MAX_CANDIDATES_PER_SLOT:
+            return jsonify({
+                'success': False,
+                'error': f'num_outfits must be 1-{MAX_OUTFITS} and candidates_per_slot 1-{MAX_CANDIDATES_PER_SLOT}'
+            }), 400
+
+        snapshot = catalog.current()
+        metadata = snapshot.metadata
+        timer = request_timer('outfit')
+
+        with timer('decode_base64'):
+            image_data = base64.b64decode(data['image'])
+        with timer('decode_image'):
+            image = Image.open(io.BytesIO(image_data)).convert("RGB")
+        g.profile_params = {
+            'num_outfits': num_outfits,
+            'candidates_per_slot': candidates_per_slot,
+            'slots': data.get('slots')
+        }
+
+        query = embed_image(image, timer)
+        with timer('assemble'):
+            try:
+                result = build_outfits(
+                    snapshot, query, data.get('slots'), num_outfits, candidates_per_slot,
+                    compatibility_weight=float(data.get('compatibility_weight', COMPATIBILITY_WEIGHT)),
+                    unique_items=bool(data.get('unique_items', True))
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+
+        with timer('build_response'):
+            outfits = []
+            for outfit_result in result['outfits']:
+                items = {}
+                for slot, (product_name, distance) in outfit_result['items'].items():
+                    if product_name in metadata:
+                        items[slot] = dict(product_payload(product_name, metadata[product_name]), distance=distance)
+                outfits.append({
+                    'items': items,
+                    'score': -outfit_result['cost'],
+                    'query_cost': outfit_result['query_cost'],
+                    'compatibility_cost': outfit_result['compatibility_cost']
+                })
+            response = jsonify({
+                'success': True,
+                'outfits': outfits,
+                'slots': result['slots'],
+                'skipped_slots': result['skipped_slots']
+            })
+
+        return response
 
     except Exception as e:
         return jsonify({
@@ -241,22 +800,82 @@ def get_product_image(image_id):
 @app.route('/product/<product_name>', methods=['GET'])
 def get_product_details(product_name):
     """Get detailed information about a specific product"""
+    snapshot = catalog.current()
+    metadata = snapshot.metadata
+    # Before the conditional check: a validator must not turn a missing product into a 304
     if product_name not in metadata:
         return jsonify({'error': 'Product not found'}), 404
 
-    product_info = metadata[product_name]
+    def build():
+        return {
+            'success': True,
+            'product': product_payload(product_name, metadata[product_name])
+        }
+
+    return catalog_responses.respond(request, snapshot.version, snapshot.modified_at, build)
+
+
+@app.route('/similar/<product_name>', methods=['GET'])
+def get_similar_products(product_name):
+    """
+    "More like this" for a catalog product, from the precomputed neighbour graph
+
+    No model inference: the neighbours were computed offline by
+    similarity_graph.py, so this is a table lookup. "graph_stale" is true
+    when the catalog has changed since the graph was built: products added
+    since are 404, deleted neighbours are skipped, and neighbours of
+    re-ingested products are outdated until the graph is rebuilt.
+
+    Query parameters:
+    - k: Neighbours per list (default 20, at most the k the graph was built with)
+    - kind: "same", "other" or "both" (default): same-category and/or other-category lists
+
+    Response:
+    {
+        "success": true,
+        "product": {...},
+        "graph_stale": false,
+        "similar": {
+            "same_category": [{...product, "distance": 0.18}, ...],
+            "other_categories": [{...product, "distance": 0.52}, ...]
+        }
+    }
+    """
+    graph = similarity_graph
+    if graph is None:
+        return jsonify({'success': False, 'error': 'Similarity graph not built'}), 503
+
+    snapshot = catalog.current()
+    metadata = snapshot.metadata
+    if product_name not in metadata:
+        return jsonify({'error': 'Product not found'}), 404
+    if product_name not in graph:
+        return jsonify({'success': False, 'error': 'Product was added after the similarity graph was built'}), 404
+
+    kind = request.args.get('kind', 'both')
+    if kind != 'both' and kind not in KINDS:
+        return jsonify({'success': False, 'error': f"kind must be one of {sorted(KINDS) + ['both']}"}), 400
+    try:
+        k = int(request.args.get('k', NUM_NEIGHBORS))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'k must be an integer'}), 400
+    g.profile_params = {'k': k, 'kind': kind}
+
+    similar = {}
+    for name, key in (('same', 'same_category'), ('other', 'other_categories')):
+        if kind in (name, 'both'):
+            # Neighbours deleted since the graph was built are skipped
+            similar[key] = [
+                dict(product_payload(neighbour, metadata[neighbour], category), distance=distance)
+                for neighbour, category, distance in graph.neighbours(product_name, name, max(k, 0))
+                if neighbour in metadata
+            ]
+
     return jsonify({
         'success': True,
-        'product': {
-            'name': product_name,
-            'category': product_info.get('category', ''),
-            'price': product_info.get('price', 'N/A'),
-            'description': product_info.get('desc', ''),
-            'image_id': product_info.get('image', ''),
-            'gender': product_info.get('gender', 'unisex'),
-            'url': product_info.get('href', ''),
-            'style_type': product_info.get('style_type', 'casual')
-        }
+        'product': product_payload(product_name, metadata[product_name]),
+        'graph_stale': graph.is_stale(snapshot),
+        'similar': similar
     })
 
 
@@ -271,38 +890,35 @@ def get_all_products():
     - offset: Number of products to skip (default: 0)
     """
     try:
+        snapshot = catalog.current()
+        metadata = snapshot.metadata
         category_filter = request.args.get('category')
         limit = int(request.args.get('limit', 100))
         offset = int(request.args.get('offset', 0))
 
-        products = []
-        for product_name, product_info in metadata.items():
-            # Apply category filter if specified
-            if category_filter and product_info.get('category') != category_filter:
-                continue
-
-            products.append({
-                'name': product_name,
-                'category': product_info.get('category', ''),
-                'price': product_info.get('price', 'N/A'),
-                'description': product_info.get('desc', ''),
-                'image_id': product_info.get('image', ''),
-                'gender': product_info.get('gender', 'unisex'),
-                'url': product_info.get('href', ''),
-                'style_type': product_info.get('style_type', 'casual')
-            })
-
-        # Apply pagination
-        total = len(products)
-        products = products[offset:offset + limit]
+        def build():
+            products = []
+            for product_name, product_info in metadata.items():
+                # Apply category filter if specified
+                if category_filter and product_info.get('category') != category_filter:
+                    continue
+
+                products.append(product_payload(product_name, product_info))
+
+            # Apply pagination
+            total = len(products)
+            products = products[offset:offset + limit]
+
+            return {
+                'success': True,
+                'products': products,
+                'total': total,
+                'limit': limit,
+                'offset': offset
+            }
 
-        return jsonify({
-            'success': True,
-            'products': products,
-            'total': total,
-            'limit': limit,
-            'offset': offset
-        })
+        return catalog_responses.respond(request, snapshot.version, snapshot.modified_at, build,
+                                         params=(category_filter, limit, offset))
 
     except Exception as e:
         return jsonify({
@@ -326,6 +942,7 @@ def shuffle_recommendations():
     """
     try:
         data = request.get_json()
+        metadata = catalog.current().metadata
 
         category = data.get('category')
         all_items = data.get('all_items', [])
@@ -373,6 +990,7 @@ def shuffle_recommendations():
 
 
 @app.route('/classify-upload', methods=['POST'])
+@admission_controlled('classify')
 def classify_user_upload():
     """
     Classify a user-uploaded clothing image into casual/formal/semi-formal
@@ -386,11 +1004,15 @@ def classify_user_upload():
         if 'image' not in data:
             return jsonify({'success': False, 'error': 'No image provided'}), 400
 
+        timer = request_timer('classify')
+
         # Decode base64 image
-        image_data = base64.b64decode(data['image'])
+        with timer('decode_base64'):
+            image_data = base64.b64decode(data['image'])
+        g.profile_params = {'image_bytes': len(image_data)}
 
         # Classify the image
-        style_type, confidence = style_classifier.classify_from_bytes(image_data)
+        style_type, confidence = style_classifier.classify_from_bytes(image_data, timer)
 
         return jsonify({
             'success': True,
@@ -411,37 +1033,230 @@ def get_classification_stats():
     Response: {"success": true, "total_products": 1982, "distribution": {...}, "percentages": {...}}
     """
     try:
-        total = len(metadata)
-        distribution = {'casual': 0, 'formal': 0, 'semi_formal': 0}
+        snapshot = catalog.current()
+        metadata = snapshot.metadata
+
+        def build():
+            total = len(metadata)
+            distribution = {'casual': 0, 'formal': 0, 'semi_formal': 0}
+
+            for product_data in metadata.values():
+                style_type = product_data.get('style_type', 'casual')
+
+                # Map to display names
+                if style_type == 'uniform':
+                    distribution['formal'] += 1
+                elif style_type == 'semi_uniform':
+                    distribution['semi_formal'] += 1
+                else:
+                    distribution['casual'] += 1
+
+            # Calculate percentages
+            percentages = {
+                key: round((count / total * 100), 1) if total > 0 else 0
+                for key, count in distribution.items()
+            }
 
-        for product_data in metadata.values():
-            style_type = product_data.get('style_type', 'casual')
+            return {
+                'success': True,
+                'total_products': total,
+                'distribution': distribution,
+                'percentages': percentages
+            }
 
-            # Map to display names
-            if style_type == 'uniform':
-                distribution['formal'] += 1
-            elif style_type == 'semi_uniform':
-                distribution['semi_formal'] += 1
-            else:
-                distribution['casual'] += 1
+        return catalog_responses.respond(request, snapshot.version, snapshot.modified_at, build)
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, pipeline stage, search and catalog metrics in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/slow-requests', methods=['GET', 'DELETE'])
+@require_admin
+def slow_requests():
+    """
+    Dump captured slow and profiled requests (newest first)
+
+    DELETE clears the buffer after returning it.
+    """
+    entries = profiler.dump(clear=request.method == 'DELETE')
+    return jsonify({
+        'success': True,
+        'profiler': profiler.status(),
+        'requests': entries
+    })
+
+
+@app.route('/debug/memory', methods=['GET'])
+@require_admin
+def debug_memory():
+    """
+    Memory attributed to each component (models, indices, metadata, caches),
+    with budgets and the process RSS
+    """
+    return jsonify(memory_report())
+
+
+@app.route('/admin/catalog', methods=['GET'])
+@require_admin
+def catalog_status():
+    """Get the current catalog snapshot generation and reload status"""
+    return jsonify({'success': True, 'catalog': catalog.status()})
 
-        # Calculate percentages
-        percentages = {
-            key: round((count / total * 100), 1) if total > 0 else 0
-            for key, count in distribution.items()
+
+@app.route('/admin/reload', methods=['POST'])
+@require_admin
+def reload_catalog():
+    """
+    Rebuild the catalog snapshot from disk in the background
+
+    Requests keep using the current snapshot until the new one is ready.
+    Poll GET /admin/catalog to see when the generation changes. The
+    similarity graph is re-read as well, after an offline rebuild.
+    """
+    started = catalog.reload_async()
+    load_similarity_graph()
+    return jsonify({
+        'success': True,
+        'started': started,
+        'catalog': catalog.status()
+    }), 202
+
+
+@app.route('/admin/products', methods=['POST'])
+@require_admin
+@admission_controlled('ingest')
+def admin_ingest_products():
+    """
+    Embed and add (or replace) products without rebuilding the indices
+
+    Request body:
+    {
+        "products": {
+            "RELAXED JEANS": {"category": "Jeans", "image": "data/1234.jpg", "price": "$40.50", ...}
         }
+    }
 
-        return jsonify({
-            'success': True,
-            'total_products': total,
-            'distribution': distribution,
-            'percentages': percentages
-        })
+    'image' is a member of ZIP_PATH (what GET /image serves); the new
+    embeddings are also recorded in the siamese feature store.
+    """
+    try:
+        data = request.get_json()
+        products = data.get('products') if data else None
+        if not products:
+            return jsonify({'success': False, 'error': 'No products provided'}), 400
+
+        # Images are read from the archive /image serves, so the new products' links work
+        result = ingest_products(products, model, processor, device, FAISS_DIR, METADATA_PATH,
+                                 feature_store=siamese_feature_store(), image_archive=ZIP_PATH)
+        catalog.reload_async()
+
+        return jsonify({'success': True, **result})
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/admin/products', methods=['DELETE'])
+@require_admin
+def admin_delete_products():
+    """
+    Tombstone products so they stop appearing in results
+
+    Request body: {"names": ["RELAXED JEANS", ...]}
+    """
+    try:
+        data = request.get_json()
+        names = data.get('names') if data else None
+        if not names:
+            return jsonify({'success': False, 'error': 'No product names provided'}), 400
+
+        result = delete_products(names, FAISS_DIR, METADATA_PATH)
+        catalog.reload_async()
+
+        return jsonify({'success': True, **result})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/admin/compact', methods=['POST'])
+@require_admin
+def admin_compact():
+    """Drop tombstoned rows from the category indices"""
+    try:
+        removed = compact_categories(FAISS_DIR)
+        if removed:
+            catalog.reload_async()
+        return jsonify({'success': True, 'compacted': removed})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/admin/reclassify', methods=['GET', 'POST'])
+@require_admin
+def admin_reclassify():
+    """
+    Start a background style reclassification of the catalog (POST), or list jobs (GET)
+
+    Request body (optional):
+    {
+        "min_confidence": 0.6,  // only predictions above this replace a label
+        "chunk_size": 256       // products per progress/persistence step
+    }
+
+    Returns 202 with the job status; poll GET /admin/reclassify/<job_id>.
+    If a job is already running, returns 409 with that job.
+    """
+    if request.method == 'GET':
+        return jsonify({'success': True, 'jobs': [job.status() for job in reclassify_jobs.jobs()]})
+
+    try:
+        if style_classifier is None:
+            return jsonify({'success': False, 'error': 'Style classifier not loaded'}), 503
+
+        data = request.get_json(silent=True) or {}
+        job, started = reclassify_jobs.start(
+            style_classifier,
+            min_confidence=float(data.get('min_confidence', MIN_CONFIDENCE)),
+            chunk_size=int(data.get('chunk_size', CHUNK_SIZE))
+        )
+        if not started:
+            return jsonify({'success': False, 'error': 'A reclassify job is already running',
+                            'job': job.status()}), 409
+        return jsonify({'success': True, 'job': job.status()}), 202
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/admin/reclassify/<job_id>', methods=['GET'])
+@require_admin
+def admin_reclassify_status(job_id):
+    """Progress, throughput and result counts of a reclassify job"""
+    job = reclassify_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.status()})
+
+
+@app.route('/admin/reclassify/<job_id>/cancel', methods=['POST'])
+@require_admin
+def admin_reclassify_cancel(job_id):
+    """Stop a reclassify job after its current chunk; nothing is published"""
+    job = reclassify_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    cancelled = reclassify_jobs.cancel(job_id)
+    return jsonify({'success': cancelled, 'job': job.status()}), 202 if cancelled else 409
+
+
 if __name__ == '__main__':
     print("=" * 70)
     print("OUTFIT RECOMMENDATION API SERVER")
@@ -449,12 +1264,15 @@ if __name__ == '__main__':
 
     # Load model and data
     load_model()
-    load_metadata()
-    load_faiss_indices()
+    catalog.load()
+    if CATALOG_WATCH_INTERVAL > 0:
+        print(f"Watching catalog files every {CATALOG_WATCH_INTERVAL:.0f}s")
+        catalog.start_watcher(CATALOG_WATCH_INTERVAL)
 
     # Load style classifier
-    print("\nLoading clothing style classifier...")
-    style_classifier = ClothingStyleClassifier()
+    load_style_classifier()
+    load_similarity_graph()
+    print_report(memory_report())
 
     print("\n" + "=" * 70)
     print("Server is ready!")
@@ -463,12 +1281,26 @@ if __name__ == '__main__':
     print("  - GET  /health                - Health check")
     print("  - GET  /categories            - List available categories")
     print("  - POST /recommend             - Get recommendations for image")
+    print("  - POST /recommend/batch       - Recommendations for several images")
+    print("  - POST /outfit                - Assemble complete outfits for image")
+    print("  - GET  /similar/<name>        - Precomputed similar products")
     print("  - GET  /image/<image_id>      - Get product image")
     print("  - GET  /product/<name>        - Get product details")
     print("  - POST /shuffle               - Shuffle recommendations")
     print("  - POST /classify-upload       - Classify clothing style (NEW)")
     print("  - GET  /classification-stats  - Get classification statistics (NEW)")
+    print("  - GET  /metrics               - Prometheus metrics")
+    print("  - GET  /admin/slow-requests   - Slow/profiled request buffer")
+    print("  - GET  /admin/catalog         - Catalog snapshot status")
+    print("  - GET  /debug/memory          - Memory by component and budgets")
+    print("  - POST /admin/reload          - Hot-reload indices and metadata")
+    print("  - POST /admin/products        - Ingest new products incrementally")
+    print("  - DELETE /admin/products      - Delete (tombstone) products")
+    print("  - POST /admin/compact         - Compact tombstoned index rows")
+    print("  - POST /admin/reclassify      - Start background style reclassification")
+    print("  - GET  /admin/reclassify/<id> - Reclassify job progress")
+    print("  - POST /admin/reclassify/<id>/cancel - Cancel a reclassify job")
     print("\n" + "=" * 70)
 
     # Start server
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    app.run(host='0.0.0.0', port=PORT, debug=False)
@@ -0,0 +1,136 @@
+"""
+Batch recommendations for the /recommend/batch endpoint
+Serves several query images (e.g. a user's whole wardrobe upload) in one
+request instead of one /recommend round trip per photo:
+- Base64 payloads are decoded on a shared thread pool (PIL releases the GIL
+  while decoding)
+- The server embeds all images in one forward pass (see api_server.embed_images)
+- Each category index is searched once with the (N, d) query matrix, which
+  FAISS handles as a single multi-query search
+- The merged "for all these items" ranking pools the per-image candidates of
+  a category, computes the full N x M query->candidate distance matrix with
+  one matrix product and reduces it per candidate (mean, min or max)
+"""
+
+import base64
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from outfit_builder import pairwise_distances
+
+MAX_BATCH_IMAGES = int(os.environ.get("MAX_BATCH_IMAGES", "16"))
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+# How per-image distances combine into one merged score per candidate:
+# mean = close to the set overall, min = close to any image, max = close to every image
+MERGE_MODES = {
+    'mean': lambda distances: distances.mean(axis=0),
+    'min': lambda distances: distances.min(axis=0),
+    'max': lambda distances: distances.max(axis=0),
+}
+DEFAULT_MERGE = 'mean'
+
+_decode_pool = None
+
+
+def _decode_one(encoded):
+    try:
+        image_data = base64.b64decode(encoded)
+        image = Image.open(io.BytesIO(image_data)).convert("RGB")
+        return image, len(image_data), None
+    except Exception as e:
+        return None, 0, f"Could not decode image: {e}"
+
+
+def decode_images(encoded_images):
+    """
+    Decode base64 images in parallel
+
+    Args:
+        encoded_images: List of base64 strings
+
+    Returns:
+        List (same order) of (PIL image or None, payload bytes, error or None)
+    """
+    global _decode_pool
+    if len(encoded_images) <= 1:
+        return [_decode_one(encoded) for encoded in encoded_images]
+    if _decode_pool is None:
+        _decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='batch-decode')
+    return list(_decode_pool.map(_decode_one, encoded_images))
+
+
+def search_batch(snapshot, queries, categories, k, observe=None):
+    """
+    One multi-query search per category
+
+    Args:
+        snapshot: catalog_store.CatalogSnapshot
+        queries: float32 (n, d) query embeddings
+        categories: Categories to search
+        k: Results per query and category
+        observe: Optional callable (seconds, category) for per-category latency
+
+    Returns:
+        Dict of category -> list (one per query) of (rows, distances) arrays
+    """
+    results = {}
+    for category in categories:
+        start = time.perf_counter()
+        results[category] = snapshot.search_rows(category, queries, k)
+        if observe is not None:
+            observe(time.perf_counter() - start, category)
+    return results
+
+
+def per_image_rankings(snapshot, hits, num_queries):
+    """
+    Split search_batch results into one recommendations dict per query
+
+    Returns:
+        List (one per query) of {category: [(name, distance), ...]}
+    """
+    rankings = [{} for _ in range(num_queries)]
+    for category, per_query in hits.items():
+        id_map = snapshot.id_maps[category]
+        for ranking, (rows, distances) in zip(rankings, per_query):
+            ranking[category] = [(id_map[row], float(distance))
+                                 for row, distance in zip(rows.tolist(), distances.tolist())]
+    return rankings
+
+
+def merged_ranking(snapshot, queries, hits, k, merge=DEFAULT_MERGE):
+    """
+    One ranking per category for the whole set of query images
+
+    Candidates are every item any query retrieved in the category; each is
+    scored against all queries at once.
+
+    Args:
+        snapshot: catalog_store.CatalogSnapshot
+        queries: float32 (n, d) query embeddings
+        hits: search_batch results
+        k: Results per category
+        merge: Key of MERGE_MODES
+
+    Returns:
+        Dict of category -> [(name, merged distance, per-query distances), ...]
+    """
+    reduce = MERGE_MODES[merge]
+    merged = {}
+    for category, per_query in hits.items():
+        rows = np.unique(np.concatenate([rows for rows, _ in per_query])) if per_query else np.zeros(0, np.int64)
+        if not len(rows):
+            merged[category] = []
+            continue
+        # (n, m) distances from every query to every pooled candidate
+        distances = pairwise_distances(queries, snapshot.vectors(category, rows))
+        scores = reduce(distances)
+        order = np.argsort(scores, kind='stable')[:k]
+        id_map = snapshot.id_maps[category]
+        merged[category] = [(id_map[int(rows[i])], float(scores[i]), distances[:, i].tolist()) for i in order]
+    return merged
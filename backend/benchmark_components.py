@@ -0,0 +1,409 @@
+"""
+Micro-benchmarks for the recommendation and classification hot paths
+Times each component on its own so performance changes can be measured
+instead of argued about:
+- decode:        PIL open + RGB convert of catalog JPEGs vs reading an image pack
+- preprocess:    transformers CLIPImageProcessor vs the OpenAI clip preprocess
+- siamese:       SiameseWithProjection forward at batch sizes 1-64
+- classify:      ClothingStyleClassifier.classify_batch and classify_stream
+- faiss:         per-category vs fused search at several catalog sizes
+- payload:       building the /recommend response payload
+- rules:         improved_classify.classify_clothing_item serial vs style_rules.classify_catalog
+
+Usage:
+    python benchmark_components.py --output benchmark_results.json
+    python benchmark_components.py --only faiss,payload --baseline benchmark_baseline.json
+    python benchmark_components.py --save-baseline benchmark_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import faiss
+import numpy as np
+import torch
+from PIL import Image
+
+from catalog_store import load_faiss_indices, load_metadata, stored_vectors
+from image_pack import IMAGE_PACK_PATH, ImagePack
+
+# Configuration
+MODEL_PATH = "best_model.pt"
+FAISS_DIR = "faiss_indices"
+METADATA_PATH = "product_metadata.json"
+IMAGE_DIR = "data"
+NUM_IMAGES = 64
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+CATALOG_SIZES = (2000, 20000, 200000)
+SEARCH_K = 15
+NUM_QUERIES = 32
+# A benchmark is flagged when its median is this much slower than the baseline
+DEFAULT_TOLERANCE = 0.10
+
+BENCHMARKS = {}
+
+
+def benchmark(group):
+    """Register a benchmark group"""
+    def register(fn):
+        BENCHMARKS[group] = fn
+        return fn
+    return register
+
+
+def time_call(fn, repeat=10, warmup=2, items=1):
+    """
+    Time a zero-argument callable
+
+    Args:
+        repeat: Timed calls
+        warmup: Untimed calls first (JIT/caches/allocator)
+        items: Work items per call, for throughput
+
+    Returns:
+        Dict with median/p90/min/mean milliseconds and items per second
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    ms = np.array(samples) * 1000
+    median = float(np.median(ms))
+    return {
+        'median_ms': round(median, 4),
+        'p90_ms': round(float(np.percentile(ms, 90)), 4),
+        'min_ms': round(float(ms.min()), 4),
+        'mean_ms': round(float(ms.mean()), 4),
+        'repeat': repeat,
+        'items': items,
+        'items_per_sec': round(items / (median / 1000), 2) if median > 0 else None
+    }
+
+
+class BenchContext:
+    """Lazily loads the shared inputs so each group only pays for what it uses"""
+
+    def __init__(self, device, seed=0):
+        self.device = device
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, key, loader):
+        if key not in self._cache:
+            self._cache[key] = loader()
+        return self._cache[key]
+
+    @property
+    def image_paths(self):
+        def load():
+            files = sorted(f for f in os.listdir(IMAGE_DIR) if f.lower().endswith('.jpg'))
+            rng = random.Random(self.seed)
+            return [os.path.join(IMAGE_DIR, f) for f in rng.sample(files, min(NUM_IMAGES, len(files)))]
+        return self._get('image_paths', load)
+
+    @property
+    def images(self):
+        return self._get('images', lambda: [Image.open(p).convert('RGB') for p in self.image_paths])
+
+    @property
+    def siamese(self):
+        def load():
+            from transformers import CLIPImageProcessor, CLIPVisionModel
+            from train_siamese_resnet50 import SiameseWithProjection
+
+            clip = CLIPVisionModel.from_pretrained("openai/clip-vit-base-patch32", use_safetensors=True)
+            processor = CLIPImageProcessor.from_pretrained("openai/clip-vit-base-patch32")
+            model = SiameseWithProjection(clip_model=clip)
+            if os.path.exists(MODEL_PATH):
+                model.load_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
+            else:
+                print(f"⚠ {MODEL_PATH} not found, timing base CLIP weights", file=sys.stderr)
+            model.to(self.device).eval()
+            return model, processor
+        return self._get('siamese', load)
+
+    @property
+    def style_classifier(self):
+        def load():
+            from clothing_classifier import ClothingStyleClassifier
+            return ClothingStyleClassifier(device=self.device)
+        return self._get('style_classifier', load)
+
+    @property
+    def metadata(self):
+        return self._get('metadata', lambda: load_metadata(METADATA_PATH))
+
+    @property
+    def category_vectors(self):
+        """Real catalog vectors per category, reconstructed from the indices"""
+        def load():
+            indices, _, _ = load_faiss_indices(FAISS_DIR)
+            return {cat: stored_vectors(index)[1] for cat, index in indices.items()}
+        return self._get('category_vectors', load)
+
+
+@benchmark('decode')
+def bench_decode(ctx):
+    paths = ctx.image_paths
+
+    def decode():
+        for path in paths:
+            Image.open(path).convert('RGB')
+
+    results = {'decode/pil_open_convert': time_call(decode, items=len(paths))}
+    if os.path.exists(IMAGE_PACK_PATH):
+        pack = ImagePack(IMAGE_PACK_PATH)
+        packed = [path for path in paths if path in pack]
+        results['decode/image_pack'] = time_call(lambda: [pack.image(path) for path in packed], items=len(packed))
+    return results
+
+
+@benchmark('preprocess')
+def bench_preprocess(ctx):
+    images = ctx.images
+    _, processor = ctx.siamese
+    clip_preprocess = ctx.style_classifier.preprocess
+
+    return {
+        'preprocess/clip_image_processor_batched': time_call(
+            lambda: processor(images=images, return_tensors="pt"), items=len(images)),
+        'preprocess/clip_image_processor_single': time_call(
+            lambda: [processor(images=image, return_tensors="pt") for image in images], items=len(images)),
+        'preprocess/openai_clip': time_call(
+            lambda: torch.stack([clip_preprocess(image) for image in images]), items=len(images)),
+    }
+
+
+@benchmark('siamese')
+def bench_siamese(ctx):
+    model, processor = ctx.siamese
+    pixel_values = processor(images=ctx.images, return_tensors="pt")['pixel_values'].to(ctx.device)
+
+    results = {}
+    for batch_size in BATCH_SIZES:
+        if batch_size > len(pixel_values):
+            break
+        batch = pixel_values[:batch_size]
+
+        def forward():
+            with torch.no_grad():
+                emb = model.clip(pixel_values=batch).last_hidden_state[:, 0, :]
+                model.projector(emb).cpu()
+
+        repeat = 10 if batch_size <= 16 else 5
+        results[f'siamese/forward_batch_{batch_size}'] = time_call(forward, repeat=repeat, items=batch_size)
+    return results
+
+
+@benchmark('classify')
+def bench_classify(ctx):
+    classifier = ctx.style_classifier
+    paths = ctx.image_paths
+    return {
+        f'classify/classify_batch_{len(paths)}': time_call(
+            lambda: classifier.classify_batch(paths), repeat=5, warmup=1, items=len(paths)),
+        f'classify/classify_stream_{len(paths)}': time_call(
+            lambda: list(classifier.classify_stream(paths)), repeat=5, warmup=1, items=len(paths))
+    }
+
+
+def synthetic_catalog(category_vectors, size, rng):
+    """Scale real vectors up to `size` rows, keeping the category mix"""
+    total = sum(len(v) for v in category_vectors.values())
+    catalog = {}
+    for category, vectors in category_vectors.items():
+        count = max(1, round(size * len(vectors) / total))
+        rows = rng.integers(0, len(vectors), count)
+        noise = rng.normal(0, 0.01, (count, vectors.shape[1])).astype('float32')
+        catalog[category] = vectors[rows] + noise
+    return catalog
+
+
+@benchmark('faiss')
+def bench_faiss(ctx):
+    rng = np.random.default_rng(ctx.seed)
+    real = ctx.category_vectors
+    all_real = np.vstack(list(real.values()))
+    queries = all_real[rng.integers(0, len(all_real), NUM_QUERIES)]
+
+    results = {}
+    for size in CATALOG_SIZES:
+        catalog = synthetic_catalog(real, size, rng)
+        dimension = all_real.shape[1]
+
+        per_category = {}
+        for category, vectors in catalog.items():
+            index = faiss.IndexFlatL2(dimension)
+            index.add(vectors)
+            per_category[category] = index
+
+        fused = faiss.IndexFlatL2(dimension)
+        labels = []
+        for category, vectors in catalog.items():
+            fused.add(vectors)
+            labels.extend([category] * len(vectors))
+        labels = np.array(labels)
+        num_categories = len(catalog)
+
+        def search_per_category(q):
+            for index in per_category.values():
+                index.search(q, SEARCH_K)
+
+        def search_fused(q):
+            # One scan, then split the merged top hits by category. Unlike the
+            # per-category search this can return fewer than k for a category.
+            _, I = fused.search(q, SEARCH_K * num_categories)
+            for rows in I:
+                rows = rows[rows >= 0]
+                hit_labels = labels[rows]
+                for category in catalog:
+                    rows[hit_labels == category][:SEARCH_K]
+
+        actual = sum(len(v) for v in catalog.values())
+        single = queries[:1]
+        results[f'faiss/per_category_{actual}_q1'] = time_call(lambda: search_per_category(single))
+        results[f'faiss/fused_{actual}_q1'] = time_call(lambda: search_fused(single))
+        results[f'faiss/per_category_{actual}_q{NUM_QUERIES}'] = time_call(
+            lambda: search_per_category(queries), repeat=5, items=NUM_QUERIES)
+        results[f'faiss/fused_{actual}_q{NUM_QUERIES}'] = time_call(
+            lambda: search_fused(queries), repeat=5, items=NUM_QUERIES)
+    return results
+
+
+@benchmark('payload')
+def bench_payload(ctx):
+    from api_server import build_recommendation_payload
+
+    metadata = ctx.metadata
+    by_category = {}
+    for name, info in metadata.items():
+        if info.get('category'):
+            by_category.setdefault(info['category'], []).append(name)
+    recommendations = {cat: names[:SEARCH_K] for cat, names in by_category.items()}
+    items = sum(len(v) for v in recommendations.values())
+
+    return {
+        'payload/recommendation_response': time_call(
+            lambda: build_recommendation_payload(recommendations, metadata), repeat=50, items=items),
+        'payload/recommendation_response_json': time_call(
+            lambda: json.dumps(build_recommendation_payload(recommendations, metadata)), repeat=50, items=items)
+    }
+
+
+@benchmark('rules')
+def bench_rules(ctx):
+    from style_rules import catalog_products, classify_catalog, classify_many
+
+    products = catalog_products(ctx.metadata)
+
+    return {
+        'rules/improved_classify_catalog': time_call(
+            lambda: classify_many(products, 'improved'), repeat=5, items=len(products)),
+        'rules/parallel_catalog': time_call(
+            lambda: classify_catalog(ctx.metadata, 'improved'), repeat=5, items=len(products))
+    }
+
+
+def environment_info(device):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'faiss': faiss.__version__,
+        'device': device
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare median timings against a saved baseline run
+
+    Returns:
+        Dict of benchmark name -> {baseline_ms, current_ms, ratio, regression}
+    """
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else float('inf')
+        comparison[name] = {
+            'baseline_ms': previous['median_ms'],
+            'current_ms': current['median_ms'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + tolerance
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation and classification components")
+    parser.add_argument("--only", help=f"Comma-separated groups to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write results")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before flagging a regression (0.10 = 10%%)")
+    parser.add_argument("--save-baseline", help="Also write the results here as the new baseline")
+    args = parser.parse_args()
+
+    groups = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [g for g in groups if g not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark groups: {', '.join(unknown)}")
+
+    torch.manual_seed(args.seed)
+    ctx = BenchContext(args.device, args.seed)
+
+    results = {}
+    for group in groups:
+        print(f"Running {group}...", file=sys.stderr)
+        for name, result in BENCHMARKS[group](ctx).items():
+            results[name] = result
+            print(f"  {name:50s} {result['median_ms']:10.3f} ms  ({result['items_per_sec']} items/s)",
+                  file=sys.stderr)
+
+    report = {'environment': environment_info(args.device), 'results': results}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare_to_baseline(results, baseline, args.tolerance)
+        report['baseline_environment'] = baseline.get('environment')
+
+        print(f"\nCompared to {args.baseline}:", file=sys.stderr)
+        for name, comp in report['comparison'].items():
+            flag = "REGRESSION" if comp['regression'] else ""
+            print(f"  {name:50s} {comp['baseline_ms']:10.3f} -> {comp['current_ms']:10.3f} ms "
+                  f"(x{comp['ratio']:.2f}) {flag}", file=sys.stderr)
+            if comp['regression']:
+                regressions.append(name)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {path}", file=sys.stderr)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
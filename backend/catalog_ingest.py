@@ -0,0 +1,374 @@
+"""
+Incremental catalog ingest and deletion
+Adds or removes products without rebuilding the category indices:
+- New products are embedded and appended to their category's index
+- Deleted products are tombstoned and skipped at search time
+- Categories are compacted once enough of their rows are tombstoned
+
+Categories are stored as IndexIDMap2, so every row keeps its id across
+compaction: a row id is the product's slot in the category's ID list, and
+compacted rows leave a null slot that is never reused.
+
+Usage:
+    python catalog_ingest.py add new_products.json
+    python catalog_ingest.py delete "RELAXED JEANS" "OVERSIZED T-SHIRT"
+    python catalog_ingest.py compact [--category Jeans]
+"""
+
+import argparse
+import json
+import os
+import posixpath
+
+import faiss
+import numpy as np
+import torch
+from transformers import CLIPImageProcessor, CLIPVisionModel
+
+from catalog_store import (
+    CatalogTransaction, catalog_write_lock, category_paths, load_metadata, load_tombstones, stored_vectors
+)
+from embedding_jobs import model_version
+from embedding_pipeline import siamese_pipeline
+from feature_store import FEATURES_DIR, FeatureStore
+from train_siamese_resnet50 import SiameseWithProjection
+
+# Configuration
+MODEL_PATH = "best_model.pt"
+FAISS_DIR = "faiss_indices"
+METADATA_PATH = "product_metadata.json"
+BATCH_SIZE = 32
+# Compact a category once this fraction of its rows are tombstoned
+COMPACT_RATIO = 0.2
+
+
+def load_model():
+    """Load the siamese CLIP model used to embed catalog images"""
+    print("Loading CLIP model...")
+    clip = CLIPVisionModel.from_pretrained("openai/clip-vit-base-patch32", use_safetensors=True)
+    processor = CLIPImageProcessor.from_pretrained("openai/clip-vit-base-patch32")
+
+    model = SiameseWithProjection(clip_model=clip)
+    state_dict = torch.load(MODEL_PATH, map_location="cpu")
+    model.load_state_dict(state_dict)
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model.to(device).eval()
+    print(f"Model loaded on {device}")
+
+    return model, processor, device
+
+
+def embed_images(image_paths, model, processor, device, batch_size=BATCH_SIZE):
+    """
+    Embed images with the siamese projector through the batched pipeline
+
+    Returns:
+        Tuple of (embeddings, failed) where embeddings maps path -> float32 vector
+        and failed maps path -> error message
+    """
+    result = siamese_pipeline(model, processor, device, batch_size=batch_size).run(image_paths)
+    return result.as_dict(), result.failed
+
+
+def _id_mapped(index):
+    """
+    A category index as IndexIDMap2
+
+    Flat indices from the build scripts use positions as row ids; they are
+    wrapped with those same ids, so existing rows keep their numbers.
+    """
+    if hasattr(index, 'id_map'):
+        return index
+    rows, vectors = stored_vectors(index)
+    mapped = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    if len(rows):
+        mapped.add_with_ids(vectors, rows)
+    return mapped
+
+
+def _load_category(faiss_dir, category, dimension=None):
+    """Load (index, ids, tombstones) for a category, creating it if missing"""
+    index_path, ids_path, deleted_path = category_paths(faiss_dir, category)
+
+    if not os.path.exists(index_path):
+        if dimension is None:
+            raise KeyError(f"Unknown category: {category}")
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dimension)), [], set()
+
+    index = _id_mapped(faiss.read_index(index_path))
+    with open(ids_path, 'r') as f:
+        ids = json.load(f)
+    return index, ids, load_tombstones(deleted_path)
+
+
+def _append(index, ids, name, vector):
+    """Add a product under the next unused row id"""
+    index.add_with_ids(vector[None], np.array([len(ids)], dtype=np.int64))
+    ids.append(name)
+
+
+def _stage_category(txn, faiss_dir, category, index, ids, tombstones):
+    """Stage a category's index, ID list and tombstones for writing"""
+    index_path, ids_path, deleted_path = category_paths(faiss_dir, category)
+    txn.write_index(index_path, index)
+    txn.write_json(ids_path, ids)
+    if tombstones:
+        txn.write_json(deleted_path, sorted(tombstones))
+    else:
+        txn.remove(deleted_path)
+
+
+def image_path_error(image):
+    """
+    Reason an 'image' path is unsafe, or None
+
+    Paths must stay inside the image root or archive: no absolute paths,
+    drive letters or '..' components.
+    """
+    if not isinstance(image, str):
+        return "'image' must be a string"
+    normalized = image.replace('\\', '/')
+    if posixpath.isabs(normalized) or (len(normalized) > 1 and normalized[1] == ':'):
+        return f"image path must be relative: {image}"
+    if '..' in normalized.split('/'):
+        return f"image path must not contain '..': {image}"
+    return None
+
+
+def _find_live_rows(ids, tombstones, product_name):
+    return [row for row, name in enumerate(ids) if name == product_name and row not in tombstones]
+
+
+def _compact(index, ids, tombstones):
+    """
+    Remove a category's tombstoned rows from its index
+
+    Surviving rows keep their ids; the removed rows' slots in the ID list are
+    set to None so they are never handed out again.
+    """
+    if tombstones:
+        index.remove_ids(np.array(sorted(tombstones), dtype=np.int64))
+    ids = [None if row in tombstones else name for row, name in enumerate(ids)]
+    return index, ids, set()
+
+
+def _needs_compaction(index, tombstones, ratio=COMPACT_RATIO):
+    return index.ntotal > 0 and len(tombstones) / index.ntotal >= ratio
+
+
+def ingest_products(products, model, processor, device, faiss_dir=FAISS_DIR,
+                    metadata_path=METADATA_PATH, image_root=".", feature_store=None, image_archive=None):
+    """
+    Embed and append new products to their category indices
+
+    Existing products with the same name are replaced: the old row is tombstoned
+    and the new embedding appended. Only the given products are embedded.
+
+    Args:
+        products: Dict of product name -> product info (needs 'category' and 'image')
+        image_root: Directory that product 'image' paths are relative to
+        feature_store: Optional siamese feature store to record the new embeddings in
+        image_archive: Zip archive the 'image' paths are members of (e.g. the one
+                       /image serves from); used instead of image_root
+
+    Returns:
+        Summary dict with added, replaced and failed products
+    """
+    valid = {}
+    failed = {}
+    for name, info in products.items():
+        if not info.get('category') or not info.get('image'):
+            failed[name] = "missing 'category' or 'image'"
+        elif image_path_error(info['image']):
+            failed[name] = image_path_error(info['image'])
+        else:
+            valid[name] = info
+
+    # Embed outside the write lock, it is by far the slowest step
+    if image_archive is not None:
+        paths = {name: (image_archive, info['image']) for name, info in valid.items()}
+    else:
+        paths = {name: os.path.join(image_root, info['image']) for name, info in valid.items()}
+    embeddings, embed_failures = embed_images(list(paths.values()), model, processor, device)
+    for name, path in paths.items():
+        if path in embed_failures:
+            failed[name] = embed_failures[path]
+            del valid[name]
+
+    added = []
+    replaced = []
+    with catalog_write_lock(faiss_dir):
+        metadata = load_metadata(metadata_path)
+        categories = {}
+
+        def category_state(category, dimension=None):
+            if category not in categories:
+                categories[category] = _load_category(faiss_dir, category, dimension)
+            return categories[category]
+
+        for name, info in valid.items():
+            vector = embeddings[paths[name]]
+
+            # Tombstone the previous version of this product
+            old_category = metadata.get(name, {}).get('category')
+            if old_category:
+                try:
+                    _, old_ids, old_tombstones = category_state(old_category)
+                    rows = _find_live_rows(old_ids, old_tombstones, name)
+                    old_tombstones.update(rows)
+                    if rows:
+                        replaced.append(name)
+                except KeyError:
+                    pass
+
+            index, ids, _ = category_state(info['category'], dimension=vector.shape[0])
+            _append(index, ids, name, vector)
+            metadata[name] = info
+            if name not in replaced:
+                added.append(name)
+
+        compacted = []
+        with CatalogTransaction(faiss_dir) as txn:
+            for category, (index, ids, tombstones) in categories.items():
+                if _needs_compaction(index, tombstones):
+                    index, ids, tombstones = _compact(index, ids, tombstones)
+                    compacted.append(category)
+                _stage_category(txn, faiss_dir, category, index, ids, tombstones)
+            txn.write_json(metadata_path, metadata, indent=4)
+
+        # Only once the catalog references them, and before another writer can
+        # replace the same images: always freshly embedded, an image may have
+        # been replaced under the same id
+        if feature_store is not None and valid:
+            feature_store.put_many([info['image'] for info in valid.values()],
+                                   np.stack([embeddings[paths[name]] for name in valid]))
+
+    return {'added': added, 'replaced': replaced, 'failed': failed, 'compacted': compacted}
+
+
+def delete_products(product_names, faiss_dir=FAISS_DIR, metadata_path=METADATA_PATH):
+    """
+    Tombstone products in their category indices and drop them from metadata
+
+    Returns:
+        Summary dict with deleted and missing products
+    """
+    deleted = []
+    missing = []
+
+    with catalog_write_lock(faiss_dir):
+        metadata = load_metadata(metadata_path)
+        categories = {}
+
+        for name in product_names:
+            if name not in metadata:
+                missing.append(name)
+                continue
+
+            category = metadata[name].get('category')
+            if category:
+                if category not in categories:
+                    try:
+                        categories[category] = _load_category(faiss_dir, category)
+                    except KeyError:
+                        categories[category] = None
+                if categories[category] is not None:
+                    _, ids, tombstones = categories[category]
+                    tombstones.update(_find_live_rows(ids, tombstones, name))
+
+            del metadata[name]
+            deleted.append(name)
+
+        compacted = []
+        with CatalogTransaction(faiss_dir) as txn:
+            for category, state in categories.items():
+                if state is None:
+                    continue
+                index, ids, tombstones = state
+                if _needs_compaction(index, tombstones):
+                    index, ids, tombstones = _compact(index, ids, tombstones)
+                    compacted.append(category)
+                _stage_category(txn, faiss_dir, category, index, ids, tombstones)
+            txn.write_json(metadata_path, metadata, indent=4)
+
+    return {'deleted': deleted, 'missing': missing, 'compacted': compacted}
+
+
+def compact_categories(faiss_dir=FAISS_DIR, categories=None, ratio=0.0):
+    """
+    Drop tombstoned rows from category indices
+
+    Args:
+        categories: Categories to compact (all if None)
+        ratio: Only compact categories with at least this fraction tombstoned
+
+    Returns:
+        Dict of category -> number of rows removed
+    """
+    removed = {}
+
+    with catalog_write_lock(faiss_dir):
+        if categories is None:
+            categories = [f.replace(".index", "") for f in os.listdir(faiss_dir) if f.endswith(".index")]
+
+        with CatalogTransaction(faiss_dir) as txn:
+            for category in categories:
+                index, ids, tombstones = _load_category(faiss_dir, category)
+                if not tombstones or len(tombstones) / max(index.ntotal, 1) < ratio:
+                    continue
+                removed[category] = len(tombstones)
+                index, ids, tombstones = _compact(index, ids, tombstones)
+                _stage_category(txn, faiss_dir, category, index, ids, tombstones)
+
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update the product catalog")
+    parser.add_argument("--faiss-dir", default=FAISS_DIR)
+    parser.add_argument("--metadata", default=METADATA_PATH)
+    parser.add_argument("--feature-dir", default=FEATURES_DIR, help="Feature store for new embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Embed and add products from a JSON file")
+    add_parser.add_argument("products_file", help="JSON object of product name -> product info")
+    add_parser.add_argument("--image-root", default=".", help="Directory image paths are relative to")
+    add_parser.add_argument("--image-archive", help="Zip archive image paths are members of (overrides --image-root)")
+
+    delete_parser = subparsers.add_parser("delete", help="Delete products by name")
+    delete_parser.add_argument("names", nargs="+")
+
+    compact_parser = subparsers.add_parser("compact", help="Drop tombstoned rows from indices")
+    compact_parser.add_argument("--category", action="append", help="Category to compact (repeatable)")
+
+    args = parser.parse_args()
+
+    if args.command == "add":
+        with open(args.products_file, 'r') as f:
+            products = json.load(f)
+        model, processor, device = load_model()
+        store = FeatureStore('siamese', model_version(MODEL_PATH), root=args.feature_dir)
+        result = ingest_products(products, model, processor, device, args.faiss_dir,
+                                 args.metadata, args.image_root, store, args.image_archive)
+        print(f"Added {len(result['added'])}, replaced {len(result['replaced'])}, "
+              f"failed {len(result['failed'])}")
+        for name, error in result['failed'].items():
+            print(f"  ✗ {name}: {error}")
+    elif args.command == "delete":
+        result = delete_products(args.names, args.faiss_dir, args.metadata)
+        print(f"Deleted {len(result['deleted'])} products")
+        for name in result['missing']:
+            print(f"  ⚠ Not found: {name}")
+    else:
+        result = {'compacted': compact_categories(args.faiss_dir, args.category)}
+        for category, count in result['compacted'].items():
+            print(f"  {category}: removed {count} rows")
+
+    if result.get('compacted'):
+        print(f"Compacted: {', '.join(result['compacted'])}")
+    print("Running servers pick this up via POST /admin/reload (or CATALOG_WATCH_INTERVAL)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""
+Catalog storage and versioned snapshots
+Bundles the FAISS indices, ID maps and product metadata into immutable
+snapshots so the API server can pick up a rebuilt catalog without restarting
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import MappingProxyType
+
+import faiss
+import numpy as np
+
+# Written next to the indices while a multi-file update is being published
+JOURNAL_NAME = ".catalog_txn.json"
+LOCK_NAME = ".catalog.lock"
+TMP_SUFFIX = ".txn-tmp"
+# Lock files older than this are assumed to belong to a crashed writer
+STALE_LOCK_SECONDS = 600
+
+_write_lock = threading.Lock()
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the catalog at one point in time
+
+    Requests grab the current snapshot once and use it until they finish, so a
+    reload never changes the data under a request. Once the last request holding
+    an old snapshot returns, its indices and metadata are freed.
+
+    Index rows are stable ids: a product keeps its row until it is deleted or
+    replaced, compaction included (category indices written by catalog_ingest
+    are IndexIDMap2, so row ids are independent of storage position). Rows of
+    deleted products are never reused.
+    """
+
+    def __init__(self, metadata, faiss_indices, id_maps, tombstones, generation, version=None, modified_at=None):
+        """
+        Args:
+            metadata: Dict of product name -> product info
+            faiss_indices: Dict of category -> FAISS index
+            id_maps: Dict of category -> list of product names indexed by row id
+                     (None for rows removed by compaction)
+            tombstones: Dict of category -> deleted row ids still in the index
+            generation: Monotonic counter, incremented on every load
+            version: Content hash of the catalog (see catalog_version); unlike
+                     generation it is unchanged by reloading identical files
+            modified_at: Newest mtime of the catalog files (epoch seconds)
+        """
+        self.metadata = MappingProxyType(metadata)
+        self.faiss_indices = MappingProxyType(faiss_indices)
+        self.id_maps = MappingProxyType({cat: tuple(ids) for cat, ids in id_maps.items()})
+        self.tombstones = MappingProxyType({cat: frozenset(rows) for cat, rows in tombstones.items()})
+        self.generation = generation
+        self.version = version
+        self.modified_at = modified_at
+        self.loaded_at = time.time()
+
+    @property
+    def categories(self):
+        """Sorted list of category names"""
+        return sorted(self.faiss_indices.keys())
+
+    def search(self, category, queries, k):
+        """
+        Search one category index, skipping deleted rows
+
+        Args:
+            category: Category name
+            queries: float32 array of shape (n, d)
+            k: Number of results per query
+
+        Returns:
+            List (one per query) of [(product_name, distance), ...]
+        """
+        id_map = self.id_maps[category]
+        return [
+            [(id_map[row], float(dist)) for row, dist in zip(rows.tolist(), distances.tolist())]
+            for rows, distances in self.search_rows(category, queries, k)
+        ]
+
+    def search_rows(self, category, queries, k):
+        """
+        Like search, but returns index rows instead of product names
+
+        Rows are only valid for this snapshot's vectors() and id_maps.
+
+        Returns:
+            List (one per query) of (rows, distances) arrays, at most k long
+        """
+        index = self.faiss_indices[category]
+        deleted = self.tombstones.get(category, frozenset())
+
+        # Over-fetch so deleted rows don't eat into the k results
+        k_search = min(k + len(deleted), index.ntotal)
+        if k_search <= 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in range(len(queries))]
+
+        D, I = index.search(queries, k_search)
+
+        results = []
+        for distances, rows in zip(D, I):
+            keep = rows >= 0
+            if deleted:
+                keep &= ~np.isin(rows, list(deleted))
+            results.append((rows[keep][:k], distances[keep][:k]))
+        return results
+
+    def live_rows(self, category):
+        """Row ids of a category's stored vectors, without deleted rows"""
+        rows = index_rows(self.faiss_indices[category])
+        deleted = self.tombstones.get(category)
+        if deleted:
+            rows = rows[~np.isin(rows, list(deleted))]
+        return rows
+
+    def vectors(self, category, rows):
+        """Stored vectors of index rows, reconstructed from the category index"""
+        rows = np.asarray(rows, dtype=np.int64)
+        index = self.faiss_indices[category]
+        if not len(rows):
+            return np.zeros((0, index.d), dtype=np.float32)
+        return index.reconstruct_batch(rows)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, 'loaded_at'):
+            raise AttributeError("CatalogSnapshot is immutable")
+        super().__setattr__(name, value)
+
+
+def load_metadata(metadata_path):
+    """Load product metadata from JSON"""
+    with open(metadata_path, 'r') as f:
+        return json.load(f)
+
+
+def load_metadata_versioned(metadata_path):
+    """
+    Load product metadata and hash the exact bytes it was parsed from
+
+    Returns:
+        Tuple of (metadata, sha256 hex digest of the file)
+    """
+    with open(metadata_path, 'rb') as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
+
+
+def catalog_version(metadata_digest, faiss_indices, id_maps, tombstones):
+    """
+    Short content hash of a loaded catalog
+
+    Covers the metadata file and each category's rows, IDs and tombstones,
+    which is everything the read-only endpoints serve. Identical catalogs give
+    the same version across reloads, restarts and workers.
+    """
+    digest = hashlib.sha256(metadata_digest.encode('ascii'))
+    for category in sorted(faiss_indices):
+        digest.update(json.dumps([
+            category, faiss_indices[category].ntotal, id_maps[category], sorted(tombstones.get(category, ()))
+        ]).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def index_rows(index):
+    """
+    Row ids of every vector in a category index, in storage order
+
+    Plain flat indices (as written by the build scripts) use positions as ids.
+    """
+    if hasattr(index, 'id_map'):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    return np.arange(index.ntotal, dtype=np.int64)
+
+
+def stored_vectors(index):
+    """
+    All vectors in a category index, deleted rows included
+
+    Returns:
+        Tuple of (row ids, float32 vectors), in storage order
+    """
+    storage = index.index if hasattr(index, 'id_map') else index
+    return index_rows(index), storage.reconstruct_n(0, storage.ntotal)
+
+
+def category_filename(category):
+    """File-system safe base name for a category's index files"""
+    return category.replace('/', '_').replace('\\', '_')
+
+
+def category_paths(faiss_dir, category):
+    """
+    Paths of a category's index, ID list and tombstone files
+
+    Returns:
+        Tuple of (index_path, ids_path, deleted_path)
+    """
+    base = os.path.join(faiss_dir, category_filename(category))
+    return f"{base}.index", f"{base}_ids.json", f"{base}_deleted.json"
+
+
+def load_tombstones(deleted_path):
+    """Load deleted row ids for a category (empty set if none)"""
+    if not os.path.exists(deleted_path):
+        return set()
+    with open(deleted_path, 'r') as f:
+        return set(json.load(f))
+
+
+def load_faiss_indices(faiss_dir):
+    """
+    Load all category indices, their ID maps and tombstones
+
+    Returns:
+        Tuple of (faiss_indices, id_maps, tombstones) dicts keyed by category
+    """
+    faiss_indices = {}
+    id_maps = {}
+    tombstones = {}
+
+    for file in os.listdir(faiss_dir):
+        if file.endswith(".index"):
+            category = file.replace(".index", "")
+            index_path, ids_path, deleted_path = category_paths(faiss_dir, category)
+
+            faiss_indices[category] = faiss.read_index(index_path)
+            with open(ids_path, 'r') as f:
+                id_maps[category] = json.load(f)
+            tombstones[category] = load_tombstones(deleted_path)
+
+    return faiss_indices, id_maps, tombstones
+
+
+class CatalogTransaction:
+    """
+    Stage catalog file writes and publish them all-or-nothing
+
+    Files are first written to temporary names. On commit, a journal listing the
+    pending renames is written, then each file is moved into place. If the process
+    dies half-way, recover_transaction() replays the journal on the next load so
+    an index never ends up paired with the wrong ID list or metadata.
+    """
+
+    def __init__(self, faiss_dir):
+        self.faiss_dir = faiss_dir
+        self._staged = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    def _stage_path(self, path):
+        tmp_path = path + TMP_SUFFIX
+        self._staged.append((tmp_path, path))
+        return tmp_path
+
+    def write_json(self, path, data, indent=None):
+        """Stage a JSON file"""
+        tmp_path = self._stage_path(path)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_index(self, path, index):
+        """Stage a FAISS index file"""
+        faiss.write_index(index, self._stage_path(path))
+
+    def remove(self, path):
+        """Stage removal of a file (e.g. an emptied tombstone list)"""
+        self._staged.append((None, path))
+
+    def commit(self):
+        """Publish all staged files"""
+        if not self._staged:
+            return
+        journal_path = os.path.join(self.faiss_dir, JOURNAL_NAME)
+        _write_json_atomic(journal_path, self._staged)
+        _apply_journal(self._staged)
+        os.remove(journal_path)
+        self._staged = []
+
+    def abort(self):
+        """Discard all staged files"""
+        for tmp_path, _ in self._staged:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._staged = []
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + TMP_SUFFIX
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _apply_journal(entries):
+    for tmp_path, path in entries:
+        if tmp_path is None:
+            if os.path.exists(path):
+                os.remove(path)
+        elif os.path.exists(tmp_path):
+            os.replace(tmp_path, path)
+
+
+def recover_transaction(faiss_dir):
+    """
+    Finish a commit that was interrupted part-way, if any
+
+    Returns:
+        True if a journal was replayed
+    """
+    journal_path = os.path.join(faiss_dir, JOURNAL_NAME)
+    if not os.path.exists(journal_path):
+        return False
+    with open(journal_path, 'r') as f:
+        entries = json.load(f)
+    _apply_journal(entries)
+    os.remove(journal_path)
+    print(f"Recovered interrupted catalog update ({len(entries)} files)")
+    return True
+
+
+@contextmanager
+def catalog_write_lock(faiss_dir, timeout=60.0):
+    """
+    Serialize catalog writers within and across processes
+
+    Uses an in-process lock plus an exclusive lock file in the index directory,
+    so the ingest CLI and the API server's admin endpoints don't interleave.
+    """
+    lock_path = os.path.join(faiss_dir, LOCK_NAME)
+    if not _write_lock.acquire(timeout=timeout):
+        raise TimeoutError("Timed out waiting for the catalog write lock")
+
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Catalog is locked by another writer ({lock_path})")
+                time.sleep(0.1)
+
+        try:
+            yield
+        finally:
+            os.remove(lock_path)
+    finally:
+        _write_lock.release()
+
+
+def catalog_fingerprint(faiss_dir, metadata_path):
+    """
+    Cheap fingerprint of the on-disk catalog (file names, sizes, mtimes)
+    Used by the file watcher to notice a rebuilt catalog
+    """
+    entries = []
+    paths = [metadata_path] + [
+        os.path.join(faiss_dir, f) for f in sorted(os.listdir(faiss_dir))
+        if f.endswith(".index") or f.endswith("_ids.json") or f.endswith("_deleted.json")
+    ]
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            entries.append((path, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            continue
+    return tuple(entries)
+
+
+class CatalogManager:
+    """
+    Holds the current catalog snapshot and swaps in new ones
+
+    Reloads build a complete snapshot on a background thread and publish it with
+    a single reference assignment, so readers never see a half-loaded catalog.
+    """
+
+    def __init__(self, faiss_dir, metadata_path, check_memory=None):
+        """
+        Args:
+            faiss_dir: Directory of category indices
+            metadata_path: Product metadata JSON
+            check_memory: Optional callable (faiss_dir, metadata_path) run before each
+                          load; raising from it keeps the current snapshot
+        """
+        self.faiss_dir = faiss_dir
+        self.metadata_path = metadata_path
+        self.check_memory = check_memory
+
+        self._snapshot = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._reload_thread = None
+        self._reload_pending = False
+        self._watcher_thread = None
+
+        self.last_reload_error = None
+        self.last_reload_seconds = None
+
+    def current(self):
+        """Return the snapshot requests should use (None until first load)"""
+        return self._snapshot
+
+    def load(self):
+        """Build a snapshot from disk and publish it (blocking)"""
+        start = time.perf_counter()
+
+        # Writers hold this lock while publishing, so the files read here all
+        # belong to one committed state, and no journal is replayed under a writer
+        with catalog_write_lock(self.faiss_dir):
+            recover_transaction(self.faiss_dir)
+            if self.check_memory is not None:
+                self.check_memory(self.faiss_dir, self.metadata_path)
+            metadata, metadata_digest = load_metadata_versioned(self.metadata_path)
+            faiss_indices, id_maps, tombstones = load_faiss_indices(self.faiss_dir)
+            # Read after the files, so Last-Modified is never older than what was loaded
+            modified_at = max((mtime for _, _, mtime in catalog_fingerprint(self.faiss_dir, self.metadata_path)),
+                              default=0) / 1e9
+        version = catalog_version(metadata_digest, faiss_indices, id_maps, tombstones)
+
+        with self._lock:
+            self._generation += 1
+            snapshot = CatalogSnapshot(metadata, faiss_indices, id_maps, tombstones, self._generation,
+                                       version, modified_at)
+            self._snapshot = snapshot
+
+        self.last_reload_seconds = time.perf_counter() - start
+        self.last_reload_error = None
+
+        print(f"Loaded catalog generation {snapshot.generation} (version {snapshot.version}): "
+              f"{len(snapshot.metadata)} products, {len(snapshot.faiss_indices)} indices "
+              f"in {self.last_reload_seconds:.2f}s")
+        return snapshot
+
+    def reload_async(self):
+        """
+        Start a background reload
+
+        If a reload is already running it runs once more when it finishes, so
+        a change written while it was reading is still picked up.
+
+        Returns:
+            False if a reload was already running (and is now queued), True otherwise
+        """
+        with self._lock:
+            if self._reload_thread is not None:
+                self._reload_pending = True
+                return False
+            self._reload_thread = threading.Thread(target=self._reload, name="catalog-reload", daemon=True)
+            self._reload_thread.start()
+        return True
+
+    def _reload(self):
+        while True:
+            with self._lock:
+                self._reload_pending = False
+            try:
+                self.load()
+            except Exception as e:
+                # Keep serving the previous snapshot
+                self.last_reload_error = str(e)
+                print(f"Catalog reload failed, keeping generation {self._generation}: {e}")
+            with self._lock:
+                if not self._reload_pending:
+                    self._reload_thread = None
+                    return
+
+    def start_watcher(self, interval=30.0):
+        """
+        Poll the catalog files and reload when they change
+
+        A change must be stable across two polls before reloading, so a catalog
+        that is still being written is not picked up half-way.
+        """
+        if self._watcher_thread is not None:
+            return
+
+        def watch():
+            seen = catalog_fingerprint(self.faiss_dir, self.metadata_path)
+            pending = None
+            while True:
+                time.sleep(interval)
+                try:
+                    current = catalog_fingerprint(self.faiss_dir, self.metadata_path)
+                except OSError as e:
+                    print(f"Catalog watcher error: {e}")
+                    continue
+
+                if current == seen:
+                    pending = None
+                elif current == pending:
+                    print("Catalog files changed, reloading...")
+                    seen = current
+                    pending = None
+                    self.reload_async()
+                else:
+                    pending = current
+
+        self._watcher_thread = threading.Thread(target=watch, name="catalog-watcher", daemon=True)
+        self._watcher_thread.start()
+
+    def status(self):
+        """Status dict for the admin endpoints"""
+        snapshot = self._snapshot
+        reloading = self._reload_thread is not None
+        return {
+            'generation': snapshot.generation if snapshot else None,
+            'version': snapshot.version if snapshot else None,
+            'loaded_at': snapshot.loaded_at if snapshot else None,
+            'products': len(snapshot.metadata) if snapshot else 0,
+            'categories': len(snapshot.faiss_indices) if snapshot else 0,
+            'reloading': reloading,
+            'watching': self._watcher_thread is not None,
+            'last_reload_seconds': self.last_reload_seconds,
+            'last_reload_error': self.last_reload_error
+        }
@@ -60,78 +60,39 @@ def classify_user_upload():
 '''
 
 # Endpoint 2: Reclassify all products using ML model
+# Runs as a background job (reclassify_jobs.py) instead of inside the request:
+# the catalog is processed in chunks with progress, cancellation and per-chunk
+# result files, and the new labels are published atomically when it finishes.
 RECLASSIFY_PRODUCTS_ENDPOINT = '''
-@app.route('/reclassify-products', methods=['POST'])
-def reclassify_all_products():
+from reclassify_jobs import ReclassifyJobRunner, MIN_CONFIDENCE
+
+reclassify_jobs = ReclassifyJobRunner(catalog, FAISS_DIR, METADATA_PATH)
+
+@app.route('/admin/reclassify', methods=['POST'])
+@require_admin
+def admin_reclassify():
     """
-    Reclassify all products in the database using the ML model
-    Only updates classifications with confidence > 0.6
+    Start reclassifying all products with the ML model in the background
+    Only updates classifications with confidence > min_confidence (default 0.6)
 
-    Request body (JSON): {} (empty)
+    Request body (JSON): {"min_confidence": 0.6} (optional)
 
-    Response:
+    Response (202):
     {
         "success": true,
-        "message": "Products reclassified",
-        "results": {
-            "casual": 1500,
-            "uniform": 150,
-            "semi_uniform": 332
-        },
-        "total_updated": 1982
+        "job": {"id": "3f2a9c1d04be", "state": "running", "total": 1982, "processed": 0, ...}
     }
-    """
-    try:
-        results = {'casual': 0, 'uniform': 0, 'semi_uniform': 0}
-        total_updated = 0
-
-        print("Starting product reclassification...")
-
-        # Get all product image paths
-        product_paths = []
-        product_names = []
-
-        for product_name, product_data in metadata.items():
-            image_id = product_data.get('image', '')
-            if image_id:
-                product_paths.append(image_id)
-                product_names.append(product_name)
-
-        # Batch classify all products
-        print(f"Classifying {len(product_paths)} products...")
-        classifications = style_classifier.classify_batch(product_paths)
-
-        # Update metadata with new classifications
-        for i, (product_name, (style_type, confidence)) in enumerate(zip(product_names, classifications)):
-            # Only update if confidence is high enough
-            if confidence > 0.6:
-                metadata[product_name]['style_type'] = style_type
-                metadata[product_name]['classification_confidence'] = float(confidence)
-                results[style_type] += 1
-                total_updated += 1
-
-            # Progress update every 100 products
-            if (i + 1) % 100 == 0:
-                print(f"Processed {i + 1}/{len(product_paths)} products...")
 
-        # Save updated metadata
-        with open(METADATA_PATH, 'w') as f:
-            json.dump(metadata, f, indent=4)
-
-        print("Reclassification complete!")
-
-        return jsonify({
-            'success': True,
-            'message': f'Successfully reclassified {total_updated} products',
-            'results': results,
-            'total_updated': total_updated
-        })
-
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    Poll GET /admin/reclassify/<job_id> for progress and throughput, and
+    POST /admin/reclassify/<job_id>/cancel to stop it.
+    """
+    data = request.get_json(silent=True) or {}
+    job, started = reclassify_jobs.start(
+        style_classifier, min_confidence=float(data.get('min_confidence', MIN_CONFIDENCE)))
+    if not started:
+        return jsonify({'success': False, 'error': 'A reclassify job is already running',
+                        'job': job.status()}), 409
+    return jsonify({'success': True, 'job': job.status()}), 202
 '''
 
 # Endpoint 3: Get classification statistics
@@ -204,7 +165,7 @@ print("   style_classifier = ClothingStyleClassifier()")
 print("\n4. Add these three endpoints:")
 print("\nEndpoint 1: Classify User Upload")
 print(CLASSIFY_UPLOAD_ENDPOINT)
-print("\nEndpoint 2: Reclassify All Products")
+print("\nEndpoint 2: Reclassify All Products (background job)")
 print(RECLASSIFY_PRODUCTS_ENDPOINT)
 print("\nEndpoint 3: Classification Statistics")
 print(CLASSIFICATION_STATS_ENDPOINT)
@@ -5,6 +5,29 @@ Script to classify products into casual, uniform, and semi_uniform categories
 import json
 
 # Classification rules based on category and product name
+# Uniform (Formal) keywords
+UNIFORM_KEYWORDS = [
+    'suit', 'blazer', 'dress shirt', 'formal', 'business', 'tie',
+    'dress pants', 'dress shoes', 'tuxedo', 'evening dress',
+    'formal dress', 'oxford', 'loafer', 'cocktail dress'
+]
+
+# Semi-uniform (Smart Casual / Business Casual) keywords
+SEMI_UNIFORM_KEYWORDS = [
+    'polo', 'chino', 'khaki', 'button-down', 'blouse', 'cardigan',
+    'dress casual', 'smart', 'vest', 'trench', 'peacoat',
+    'ankle boot', 'derby', 'professional'
+]
+
+# Casual keywords
+CASUAL_KEYWORDS = [
+    't-shirt', 'tee', 'jeans', 'shorts', 'hoodie', 'sweatshirt',
+    'sweatpants', 'sneaker', 'sandal', 'flip-flop', 'tank top',
+    'athletic', 'sporty', 'jogger', 'legging', 'crop top',
+    'casual', 'relaxed', 'oversized', 'boxy'
+]
+
+
 def classify_product(name, category, desc):
     """
     Classify a product as casual, uniform, or semi_uniform
@@ -18,43 +41,21 @@ def classify_product(name, category, desc):
     category_lower = category.lower()
     desc_lower = desc.lower() if desc else ""
 
-    # Uniform (Formal) keywords
-    uniform_keywords = [
-        'suit', 'blazer', 'dress shirt', 'formal', 'business', 'tie',
-        'dress pants', 'dress shoes', 'tuxedo', 'evening dress',
-        'formal dress', 'oxford', 'loafer', 'cocktail dress'
-    ]
-
-    # Semi-uniform (Smart Casual / Business Casual) keywords
-    semi_uniform_keywords = [
-        'polo', 'chino', 'khaki', 'button-down', 'blouse', 'cardigan',
-        'dress casual', 'smart', 'vest', 'trench', 'peacoat',
-        'ankle boot', 'derby', 'professional'
-    ]
-
-    # Casual keywords
-    casual_keywords = [
-        't-shirt', 'tee', 'jeans', 'shorts', 'hoodie', 'sweatshirt',
-        'sweatpants', 'sneaker', 'sandal', 'flip-flop', 'tank top',
-        'athletic', 'sporty', 'jogger', 'legging', 'crop top',
-        'casual', 'relaxed', 'oversized', 'boxy'
-    ]
-
     combined_text = f"{name_lower} {category_lower} {desc_lower}"
 
     # Check for uniform (highest priority)
-    if any(keyword in combined_text for keyword in uniform_keywords):
+    if any(keyword in combined_text for keyword in UNIFORM_KEYWORDS):
         # Special case: if it's explicitly casual despite having suit/blazer in name
         if 'casual' in combined_text and 'suit' not in category_lower:
             return 'semi_uniform'
         return 'uniform'
 
     # Check for semi-uniform
-    if any(keyword in combined_text for keyword in semi_uniform_keywords):
+    if any(keyword in combined_text for keyword in SEMI_UNIFORM_KEYWORDS):
         return 'semi_uniform'
 
     # Check for casual
-    if any(keyword in combined_text for keyword in casual_keywords):
+    if any(keyword in combined_text for keyword in CASUAL_KEYWORDS):
         return 'casual'
 
     # Category-based classification for items that don't match keywords
@@ -77,12 +78,11 @@ def main():
     # Classify each product
     classified_count = {'casual': 0, 'uniform': 0, 'semi_uniform': 0}
 
-    for product_name, product_data in metadata.items():
-        category = product_data.get('category', '')
-        desc = product_data.get('desc', '')
+    # Same rules, applied in parallel chunks for large catalogs
+    from style_rules import classify_catalog
 
-        style_type = classify_product(product_name, category, desc)
-        product_data['style_type'] = style_type
+    for product_name, style_type in classify_catalog(metadata, 'basic').items():
+        metadata[product_name]['style_type'] = style_type
         classified_count[style_type] += 1
 
     # Save updated metadata
@@ -4,12 +4,35 @@ Classifies clothing images into: casual, uniform (formal), semi_uniform (semi-fo
 """
 
 import torch
+import torch.nn as nn
 import clip
 from PIL import Image
 import numpy as np
 from typing import Tuple, Union
+from contextlib import nullcontext
 import io
 
+from embedding_jobs import model_version
+from embedding_pipeline import NUM_WORKERS, AdaptiveBatchSize, EmbeddingPipeline, clip_pipeline, load_image_source
+from feature_store import pipeline_compute
+
+
+# Enhanced text prompts for zero-shot classification, in class order
+DEFAULT_PROMPTS = [
+    "a photo of casual everyday clothing including t-shirts, jeans, hoodies, sneakers, and relaxed comfortable wear",
+    "a photo of formal business professional attire including suits, blazers, dress shirts, ties, dress pants, and formal shoes",
+    "a photo of smart casual semi-formal clothing including polo shirts, button-downs, chinos, cardigans, and loafers"
+]
+
+# Streaming classification: forward passes aim for this latency, and a partial
+# batch is classified once no image has arrived for STREAM_FLUSH_SECONDS
+STREAM_TARGET_SECONDS = 0.5
+STREAM_FLUSH_SECONDS = 0.05
+
+
+def _no_timer(stage):
+    return nullcontext()
+
 
 class ClothingStyleClassifier:
     """
@@ -35,20 +58,27 @@ class ClothingStyleClassifier:
         # Load CLIP model
         self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
 
-        # Load fine-tuned weights if provided
+        # Load fine-tuned weights if provided. Checkpoints may hold fine-tuned
+        # CLIP weights, a trained classifier head, or both.
+        self.classifier_head = None
+        backbone_path = None
         if model_path:
             print(f"Loading fine-tuned weights from {model_path}")
             checkpoint = torch.load(model_path, map_location=self.device)
-            self.model.load_state_dict(checkpoint['model_state_dict'])
+            if 'model_state_dict' in checkpoint:
+                self.model.load_state_dict(checkpoint['model_state_dict'])
+                backbone_path = model_path
+            self.classifier_head = self.load_head(checkpoint)
+            if self.classifier_head is not None:
+                print(f"Using trained classifier head (val acc {checkpoint.get('val_acc', 0):.1f}%)")
+
+        # Identifies these image features in the feature store
+        self.model_version = model_version(backbone_path, base_model="ViT-B-32")
 
         self.model.eval()
 
-        # Enhanced text prompts for zero-shot classification
-        self.text_prompts = [
-            "a photo of casual everyday clothing including t-shirts, jeans, hoodies, sneakers, and relaxed comfortable wear",
-            "a photo of formal business professional attire including suits, blazers, dress shirts, ties, dress pants, and formal shoes",
-            "a photo of smart casual semi-formal clothing including polo shirts, button-downs, chinos, cardigans, and loafers"
-        ]
+        # Loader used by the batch pipelines (see use_image_pack)
+        self.load_image = load_image_source
 
         # Class names mapping
         self.class_names = ['casual', 'uniform', 'semi_uniform']
@@ -60,13 +90,52 @@ class ClothingStyleClassifier:
 
         # Encode text prompts once for efficiency
         print("Encoding text prompts...")
+        self.set_text_prompts(DEFAULT_PROMPTS)
+
+        print("Classifier ready!")
+
+    def load_head(self, checkpoint):
+        """
+        Build the trained classifier head stored in a checkpoint
+
+        Only the head is loaded, so a head can be scored on features from this
+        classifier's CLIP without loading a second model.
+
+        Args:
+            checkpoint: Checkpoint path or already loaded checkpoint dict
+
+        Returns:
+            nn.Linear in eval mode on this classifier's device, or None if the
+            checkpoint has no head
+        """
+        if isinstance(checkpoint, str):
+            checkpoint = torch.load(checkpoint, map_location=self.device)
+        head_state = checkpoint.get('classifier_state_dict')
+        if head_state is None:
+            return None
+        out_features, in_features = head_state['weight'].shape
+        head = nn.Linear(in_features, out_features).to(self.device)
+        head.load_state_dict(head_state)
+        return head.eval()
+
+    def set_text_prompts(self, prompts: list):
+        """
+        Replace the zero-shot text prompts and encode them
+
+        Only the text tower runs, so prompts can be iterated on quickly
+        together with classify_features over stored image features.
+
+        Args:
+            prompts: One prompt per class, in class_names order
+        """
+        if len(prompts) != len(self.class_names):
+            raise ValueError(f"Expected {len(self.class_names)} prompts, got {len(prompts)}")
+        self.text_prompts = list(prompts)
         text_tokens = clip.tokenize(self.text_prompts).to(self.device)
         with torch.no_grad():
             self.text_features = self.model.encode_text(text_tokens)
             self.text_features /= self.text_features.norm(dim=-1, keepdim=True)
 
-        print("Classifier ready!")
-
     def classify_image(self, image_path: str) -> Tuple[str, float]:
         """
         Classify clothing image from file path
@@ -87,103 +156,214 @@ class ClothingStyleClassifier:
             print(f"Error classifying image {image_path}: {e}")
             return 'casual', 0.0
 
-    def classify_from_bytes(self, image_bytes: bytes) -> Tuple[str, float]:
+    def classify_from_bytes(self, image_bytes: bytes, timer=None) -> Tuple[str, float]:
         """
         Classify clothing image from bytes (for user uploads)
 
         Args:
             image_bytes: Image data as bytes
+            timer: Optional callable returning a context manager per stage name,
+                   used by the API server to time decode/preprocess/forward
 
         Returns:
             Tuple of (class_name, confidence_score)
         """
+        timer = timer or _no_timer
         try:
-            image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-            return self._classify_pil_image(image)
+            with timer('decode_image'):
+                image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+            return self._classify_pil_image(image, timer)
         except Exception as e:
             print(f"Error classifying image from bytes: {e}")
             return 'casual', 0.0
 
-    def _classify_pil_image(self, image: Image.Image) -> Tuple[str, float]:
+    def _classify_pil_image(self, image: Image.Image, timer=None) -> Tuple[str, float]:
         """
         Internal method to classify PIL Image
 
         Args:
             image: PIL Image object
+            timer: Optional stage timer (see classify_from_bytes)
 
         Returns:
             Tuple of (class_name, confidence_score)
         """
+        timer = timer or _no_timer
+
         # Preprocess image
-        image_input = self.preprocess(image).unsqueeze(0).to(self.device)
+        with timer('preprocess'):
+            image_input = self.preprocess(image).unsqueeze(0).to(self.device)
 
         # Get image features
         with torch.no_grad():
-            image_features = self.model.encode_image(image_input)
-            image_features /= image_features.norm(dim=-1, keepdim=True)
+            with timer('clip_forward'):
+                image_features = self.model.encode_image(image_input)
 
-            # Calculate similarity with text prompts
-            similarity = (100.0 * image_features @ self.text_features.T).softmax(dim=-1)
+            with timer('score'):
+                similarity = self._probabilities(image_features)
 
-            # Get top prediction
-            confidence, predicted_idx = similarity[0].topk(1)
+                # Get top prediction
+                confidence, predicted_idx = similarity[0].topk(1)
 
-            predicted_class = self.class_names[predicted_idx.item()]
-            confidence_score = confidence.item()
+                predicted_class = self.class_names[predicted_idx.item()]
+                confidence_score = confidence.item()
 
         return predicted_class, confidence_score
 
-    def classify_batch(self, image_paths: list) -> list:
+    def use_image_pack(self, pack):
+        """
+        Read images from an image_pack.ImagePack in the batch pipelines
+
+        Packed image ids skip the JPEG decode; other items load as before.
+        """
+        self.load_image = pack.load_image if pack is not None else load_image_source
+
+    def feature_pipeline(self, **kwargs):
+        """Batched pipeline producing this model's CLIP image features"""
+        kwargs.setdefault('load_image', self.load_image)
+        return clip_pipeline(self.model, self.preprocess, self.device, **kwargs)
+
+    def image_features(self, image_paths: list, feature_store=None):
+        """
+        CLIP image features for many images
+
+        Args:
+            image_paths: List of image file paths (catalog image ids when using a store)
+            feature_store: Optional feature_store.FeatureStore of kind 'clip' for
+                           this model version; missing features are computed and stored
+
+        Returns:
+            Tuple of (features, found, failed): float32 array (len(image_paths), 512),
+            bool mask of rows that have features, and dict of path -> error
+        """
+        if feature_store is not None:
+            return feature_store.ensure(image_paths, pipeline_compute(self.feature_pipeline()))
+
+        result = self.feature_pipeline().run(image_paths)
+        vectors = result.as_dict()
+        features = np.zeros((len(image_paths), 512), dtype='float32')
+        found = np.zeros(len(image_paths), dtype=bool)
+        for i, path in enumerate(image_paths):
+            if path in vectors:
+                features[i] = vectors[path]
+                found[i] = True
+        return features, found, result.failed
+
+    def _probabilities(self, image_features: torch.Tensor) -> torch.Tensor:
+        """
+        Class probabilities for raw (unnormalized) CLIP image features
+
+        Uses the trained classifier head when one was loaded, otherwise
+        zero-shot similarity with the text prompts.
+        """
+        image_features = image_features.float()
+        if self.classifier_head is not None:
+            return self.classifier_head(image_features).softmax(dim=-1)
+
+        image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        return (100.0 * image_features @ self.text_features.float().T).softmax(dim=-1)
+
+    def feature_probabilities(self, features: Union[np.ndarray, torch.Tensor]) -> np.ndarray:
+        """
+        Class probabilities for precomputed CLIP image features
+
+        Args:
+            features: encode_image output as a numpy array or tensor, (512,) or (n, 512).
+                      L2-normalized features score the same zero-shot; a trained head
+                      expects raw features, as kept in the feature store
+
+        Returns:
+            float32 array (n, num_classes)
+        """
+        if isinstance(features, np.ndarray):
+            features = torch.from_numpy(np.ascontiguousarray(features, dtype=np.float32))
+        with torch.no_grad():
+            return self._probabilities(features.reshape(-1, features.shape[-1]).to(self.device)).cpu().numpy()
+
+    def classify_features(self, features: Union[np.ndarray, torch.Tensor]) -> Union[Tuple[str, float], list]:
+        """
+        Classify precomputed CLIP image features, without the image encoder
+
+        A whole catalog is scored with one matrix multiply against the text
+        prompt features (or one pass through the trained head).
+
+        Args:
+            features: See feature_probabilities
+
+        Returns:
+            (class_name, confidence) for a single vector, or a list of them for a batch
+        """
+        probabilities = self.feature_probabilities(features)
+        predicted_idx = probabilities.argmax(axis=-1)
+        confidence = probabilities[np.arange(len(probabilities)), predicted_idx]
+        results = [(self.class_names[idx], score) for idx, score in zip(predicted_idx.tolist(), confidence.tolist())]
+        return results[0] if features.ndim == 1 else results
+
+    def classify_batch(self, image_paths: list, feature_store=None) -> list:
         """
         Classify multiple images in batch (more efficient)
 
         Args:
             image_paths: List of image file paths
+            feature_store: Optional CLIP feature store, see image_features
 
         Returns:
-            List of tuples (class_name, confidence_score)
-        """
-        results = []
-
-        # Process in batches of 32
-        batch_size = 32
-        for i in range(0, len(image_paths), batch_size):
-            batch_paths = image_paths[i:i + batch_size]
-
-            # Load and preprocess images
-            images = []
-            valid_indices = []
-            for idx, path in enumerate(batch_paths):
-                try:
-                    image = Image.open(path).convert('RGB')
-                    images.append(self.preprocess(image))
-                    valid_indices.append(idx)
-                except Exception as e:
-                    print(f"Error loading {path}: {e}")
-                    results.append(('casual', 0.0))
-
-            if not images:
-                continue
+            List of tuples (class_name, confidence_score), one per path in order
+        """
+        features, found, failed = self.image_features(image_paths, feature_store)
+        for path, error in failed.items():
+            print(f"Error loading {path}: {error}")
+
+        results = [('casual', 0.0)] * len(image_paths)
+        rows = np.flatnonzero(found)
+        if len(rows):
+            for row, prediction in zip(rows, self.classify_features(features[rows])):
+                results[row] = prediction
+        return results
 
-            # Stack images into batch
-            image_batch = torch.stack(images).to(self.device)
+    def classify_stream(self, items, batch_size: int = 32, max_batch_size: int = 256,
+                        num_workers: int = NUM_WORKERS, target_seconds: float = STREAM_TARGET_SECONDS,
+                        memory_budget: int = None, flush_after: float = STREAM_FLUSH_SECONDS):
+        """
+        Classify images lazily, yielding results in input order
 
-            # Get predictions
-            with torch.no_grad():
-                image_features = self.model.encode_image(image_batch)
-                image_features /= image_features.norm(dim=-1, keepdim=True)
+        Worker threads decode and preprocess ahead of the model, so a long run
+        is bounded by the CLIP forward pass rather than by file loading.
 
-                # Calculate similarity
-                similarity = (100.0 * image_features @ self.text_features.T).softmax(dim=-1)
+        Args:
+            items: Iterable of image paths, image bytes or (zip path, member name) pairs
+            batch_size: Starting batch size
+            max_batch_size: Largest batch size
+            num_workers: Decode/preprocess threads
+            target_seconds: Wanted time per forward pass (None keeps batch_size fixed)
+            memory_budget: Bytes of preprocessed images allowed in one batch
+            flush_after: Classify a partial batch when no image arrives for this many seconds
+
+        Yields:
+            Dicts with 'index', 'style_type', 'confidence' and 'error'; images that
+            fail to load have style_type None and the error message
+        """
+        def forward(images):
+            with torch.no_grad():
+                image_features = self.model.encode_image(images.to(self.device))
+                return self._probabilities(image_features).cpu().numpy()
 
-                # Get predictions for each image
-                for j, sim in enumerate(similarity):
-                    confidence, predicted_idx = sim.topk(1)
-                    predicted_class = self.class_names[predicted_idx.item()]
-                    confidence_score = confidence.item()
-                    results.append((predicted_class, confidence_score))
+        pipeline = EmbeddingPipeline(self.preprocess, forward, batch_size=batch_size, num_workers=num_workers,
+                                     load_image=self.load_image)
+        batcher = AdaptiveBatchSize(batch_size, maximum=max_batch_size,
+                                    target_seconds=target_seconds, memory_budget=memory_budget)
 
-        return results
+        for index, _, probabilities, error in pipeline.stream(items, batcher, flush_after):
+            if error is not None:
+                yield {'index': index, 'style_type': None, 'confidence': 0.0, 'error': error}
+                continue
+            predicted_idx = int(probabilities.argmax())
+            yield {
+                'index': index,
+                'style_type': self.class_names[predicted_idx],
+                'confidence': float(probabilities[predicted_idx]),
+                'error': None
+            }
 
     def get_display_name(self, class_name: str) -> str:
         """
@@ -199,46 +379,23 @@ class ClothingStyleClassifier:
 
 
 def test_classifier():
-    """Test the classifier on sample images"""
+    """Evaluate the classifier on every labeled catalog image"""
     print("=" * 50)
     print("Testing Clothing Style Classifier")
     print("=" * 50)
 
+    from feature_store import FeatureStore
+    from style_evaluation import evaluate_catalog, format_report
+
     classifier = ClothingStyleClassifier()
 
-    # Test on a few sample images
-    import os
-    import json
-
-    # Load product metadata
-    with open('product_metadata.json', 'r') as f:
-        products = json.load(f)
-
-    # Test on 10 random products from each category
-    test_samples = []
-    for product_name, product_data in list(products.items())[:30]:
-        image_id = product_data.get('image', '')
-        if image_id:
-            image_path = image_id  # Already includes data/ prefix
-            if os.path.exists(image_path):
-                actual_class = product_data.get('style_type', 'unknown')
-                test_samples.append((image_path, product_name, actual_class))
-
-    print(f"\nTesting on {len(test_samples)} sample images...\n")
-
-    correct = 0
-    for image_path, product_name, actual_class in test_samples:
-        predicted_class, confidence = classifier.classify_image(image_path)
-        is_correct = predicted_class == actual_class
-        if is_correct:
-            correct += 1
-
-        status = "[CORRECT]" if is_correct else "[WRONG]  "
-        print(f"{status} {product_name[:50]:50s} | Actual: {actual_class:12s} | Predicted: {predicted_class:12s} | Confidence: {confidence:.2%}")
-
-    accuracy = correct / len(test_samples) if test_samples else 0
+    # Features come from the feature store, so reruns skip the images already seen
+    store = FeatureStore('clip', classifier.model_version)
+    reports = evaluate_catalog(feature_store=store, classifier=classifier)
+
+    print(format_report("Zero-shot CLIP", reports['zero_shot']))
     print(f"\n{'=' * 50}")
-    print(f"Accuracy: {accuracy:.2%} ({correct}/{len(test_samples)})")
+    print(f"Accuracy: {reports['zero_shot']['accuracy']:.2f}% ({reports['zero_shot']['samples']} images)")
     print(f"{'=' * 50}")
 
 
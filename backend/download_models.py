@@ -1,56 +1,343 @@
 """
 Download large model files from external storage
-This script downloads best_model.pt and all_product_images.zip from cloud storage
+This script downloads best_model.pt and all_product_images.zip from cloud storage:
+- The artifacts download concurrently over one pooled requests session
+- Large files are split into HTTP Range segments fetched in parallel
+- Data goes to <file>.part and progress to <file>.part.json, so an interrupted
+  deploy resumes where it stopped instead of starting over
+- Each file is checked against its SHA-256 and only renamed into place once
+  complete and verified, so an existing file is always a whole one
+
+URLs and checksums come from a JSON manifest (ARTIFACT_MANIFEST or --manifest):
+
+    {"best_model.pt": {"url": "https://...", "sha256": "..."},
+     "all_product_images.zip": {"url": "https://...", "sha256": "..."}}
+
+or from MODEL_URL / IMAGES_URL with optional MODEL_SHA256 / IMAGES_SHA256.
+
+Usage:
+    python download_models.py
+    python download_models.py --manifest artifacts.json --connections 8
 """
 
+import argparse
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+# (file name, url env var, sha256 env var, description)
+ARTIFACTS = [
+    ('best_model.pt', 'MODEL_URL', 'MODEL_SHA256', 'Model'),
+    ('all_product_images.zip', 'IMAGES_URL', 'IMAGES_SHA256', 'Images'),
+]
+# Parallel Range requests per file
+MAX_CONNECTIONS = 8
+# Bytes per Range segment; smaller files download in one request
+SEGMENT_SIZE = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+# Attempts per segment before the download fails (progress is kept between attempts)
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+# (connect, read) timeouts
+TIMEOUT = (10, 60)
+# How often segment progress is written to the .part.json file
+CHECKPOINT_SECONDS = 1.0
+
+
+class DownloadError(Exception):
+    """A file could not be downloaded or failed verification"""
+
+
+def load_manifest(path=None):
+    """
+    Artifacts to download
+
+    Args:
+        path: JSON manifest; None falls back to the *_URL / *_SHA256 env vars
+
+    Returns:
+        List of dicts with 'name', 'url', 'sha256' (or None) and 'description'
+    """
+    if path:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        return [
+            {'name': name, 'url': entry['url'], 'sha256': entry.get('sha256'),
+             'description': entry.get('description', name)}
+            for name, entry in manifest.items()
+        ]
+
+    artifacts = []
+    for name, url_var, sha_var, description in ARTIFACTS:
+        if os.environ.get(url_var):
+            artifacts.append({'name': name, 'url': os.environ[url_var],
+                              'sha256': os.environ.get(sha_var) or None, 'description': description})
+    return artifacts
+
+
+def make_session(connections):
+    """Session whose connection pool fits every parallel segment request"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['HEAD', 'GET'])
+    adapter = HTTPAdapter(pool_connections=connections, pool_maxsize=connections, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def probe(session, url):
+    """
+    Size, Range support and validator of a remote file
+
+    Uses a one-byte Range request rather than HEAD, which some storage hosts
+    answer differently from GET.
+
+    Returns:
+        Dict with 'url' (after redirects), 'size' (or None), 'ranges' and 'validator'
+    """
+    with session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code == 206 and '/' in content_range and not content_range.endswith('/*'):
+            return {'url': response.url, 'size': int(content_range.rsplit('/', 1)[1]),
+                    'ranges': True, 'validator': validator}
+        size = response.headers.get('Content-Length')
+        return {'url': response.url, 'size': int(size) if size else None,
+                'ranges': False, 'validator': validator}
+
+
+def plan_segments(size, segment_size=SEGMENT_SIZE):
+    """[start, end, bytes done] for each Range segment (end inclusive)"""
+    return [[start, min(start + segment_size, size) - 1, 0] for start in range(0, size, segment_size)]
 
 
-def download_file(url, destination, description="Downloading"):
-    """Download a file from URL with progress bar"""
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
+class _Checkpoint:
+    """Segment progress of one partial file, saved atomically and at most every CHECKPOINT_SECONDS"""
 
-    total_size = int(response.headers.get('content-length', 0))
-    block_size = 8192
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
 
-    with open(destination, 'wb') as f:
-        with tqdm(total=total_size, unit='B', unit_scale=True, desc=description) as pbar:
-            for chunk in response.iter_content(block_size):
-                f.write(chunk)
-                pbar.update(len(chunk))
+    def save(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._saved_at < CHECKPOINT_SECONDS:
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+            self._saved_at = now
 
-    print(f"✓ Downloaded {destination}")
+
+def _load_state(state_path, part_path, remote):
+    """Saved progress if it belongs to the same remote file, else None"""
+    if not (os.path.exists(state_path) and os.path.exists(part_path)):
+        return None
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (state.get('size') != remote['size'] or state.get('validator') != remote['validator']
+            or os.path.getsize(part_path) != remote['size']):
+        return None
+    return state
+
+
+def _write_all(f, data):
+    view = memoryview(data)
+    while view:
+        view = view[f.write(view):]
+
+
+def _fetch_segment(session, url, part_path, segment, checkpoint, progress):
+    """Download one segment, resuming from its recorded progress on each retry"""
+    for attempt in range(MAX_RETRIES):
+        start, end, done = segment
+        if start + done > end:
+            return
+        try:
+            headers = {'Range': f'bytes={start + done}-{end}'}
+            with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                if response.status_code != 206:
+                    raise DownloadError(f"expected 206 for a Range request, got {response.status_code}")
+                # Unbuffered, so progress never counts bytes still held in memory
+                with open(part_path, 'r+b', buffering=0) as f:
+                    f.seek(start + done)
+                    for chunk in response.iter_content(READ_SIZE):
+                        chunk = chunk[:end + 1 - start - segment[2]]
+                        _write_all(f, chunk)
+                        segment[2] += len(chunk)
+                        progress.update(len(chunk))
+                        checkpoint.save()
+            if start + segment[2] > end:
+                return
+        except (requests.RequestException, DownloadError) as e:
+            if attempt == MAX_RETRIES - 1:
+                raise DownloadError(f"bytes {start}-{end}: {e}") from e
+        if attempt < MAX_RETRIES - 1:
+            time.sleep(BACKOFF_SECONDS * 2 ** attempt)
+    raise DownloadError(f"bytes {segment[0]}-{segment[1]}: incomplete after {MAX_RETRIES} attempts")
+
+
+def _fetch_whole(session, url, part_path, progress):
+    """Single-stream download for servers without Range support (no resume)"""
+    with session.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        with open(part_path, 'wb', buffering=0) as f:
+            for chunk in response.iter_content(READ_SIZE):
+                _write_all(f, chunk)
+                progress.update(len(chunk))
+
+
+def download_artifact(session, artifact, dest_dir='.', connections=MAX_CONNECTIONS,
+                      segment_size=SEGMENT_SIZE, position=0):
+    """
+    Download one artifact, resuming a previous partial download when possible
+
+    Args:
+        session: Pooled requests.Session
+        artifact: Dict from load_manifest
+        dest_dir: Directory the file is written to
+        connections: Parallel Range requests
+        segment_size: Bytes per Range segment
+        position: tqdm bar position
+
+    Returns:
+        Path of the verified file
+    """
+    destination = os.path.join(dest_dir, artifact['name'])
+    part_path = destination + '.part'
+    state_path = part_path + '.json'
+    expected = artifact['sha256'].lower() if artifact['sha256'] else None
+
+    if os.path.exists(destination):
+        if expected is None:
+            print(f"✓ {artifact['name']} already exists")
+            return destination
+        if sha256_file(destination) == expected:
+            print(f"✓ {artifact['name']} already exists (checksum verified)")
+            return destination
+        print(f"⚠ {artifact['name']} does not match its checksum, downloading again")
+
+    remote = probe(session, artifact['url'])
+    url = remote['url']
+
+    state = _load_state(state_path, part_path, remote) if remote['ranges'] else None
+    if state is None and remote['ranges'] and remote['size']:
+        state = {'size': remote['size'], 'validator': remote['validator'],
+                 'segments': plan_segments(remote['size'], segment_size)}
+        with open(part_path, 'wb') as f:
+            f.truncate(remote['size'])
+    resumed = sum(segment[2] for segment in state['segments']) if state else 0
+    if resumed:
+        print(f"Resuming {artifact['name']} at {resumed / 1e6:.1f} MB")
+
+    with tqdm(total=remote['size'], initial=resumed, unit='B', unit_scale=True,
+              desc=artifact['description'], position=position, leave=True) as progress:
+        if state is None:
+            _fetch_whole(session, url, part_path, progress)
+        else:
+            checkpoint = _Checkpoint(state_path, state)
+            checkpoint.save(force=True)
+            pending = [segment for segment in state['segments'] if segment[0] + segment[2] <= segment[1]]
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+                    futures = [pool.submit(_fetch_segment, session, url, part_path, segment, checkpoint, progress)
+                               for segment in pending]
+                    for future in futures:
+                        future.result()
+            finally:
+                checkpoint.save(force=True)
+
+    actual = sha256_file(part_path)
+    if expected is not None and actual != expected:
+        for path in (part_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise DownloadError(f"SHA-256 {actual} does not match manifest {expected}")
+
+    with open(part_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(part_path, destination)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    print(f"✓ Downloaded {destination} (sha256 {actual[:12]}…{'' if expected else ', no checksum in manifest'})")
+    return destination
+
+
+def download_all(artifacts, dest_dir='.', connections=MAX_CONNECTIONS, segment_size=SEGMENT_SIZE):
+    """
+    Download every artifact concurrently
+
+    Returns:
+        Dict of artifact name -> error message for the ones that failed
+    """
+    session = make_session(connections * max(1, len(artifacts)))
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(artifacts))) as pool:
+        futures = {
+            artifact['name']: pool.submit(download_artifact, session, artifact, dest_dir,
+                                          connections, segment_size, position)
+            for position, artifact in enumerate(artifacts)
+        }
+        for name, future in futures.items():
+            try:
+                future.result()
+            except (requests.RequestException, DownloadError, OSError) as e:
+                failed[name] = str(e)
+    return failed
 
 
 def main():
     """Download all required model files"""
+    parser = argparse.ArgumentParser(description="Download model and image artifacts")
+    parser.add_argument("--manifest", default=os.environ.get('ARTIFACT_MANIFEST'),
+                        help="JSON manifest of file name -> {url, sha256}")
+    parser.add_argument("--dest-dir", default=".")
+    parser.add_argument("--connections", type=int, default=MAX_CONNECTIONS, help="Parallel requests per file")
+    parser.add_argument("--segment-mb", type=int, default=SEGMENT_SIZE // (1024 * 1024))
+    args = parser.parse_args()
 
-    # Get URLs from environment variables (set in Render dashboard)
-    model_url = os.environ.get('MODEL_URL')
-    images_url = os.environ.get('IMAGES_URL')
-
-    if not model_url or not images_url:
+    artifacts = load_manifest(args.manifest)
+    if not artifacts:
         print("⚠️  MODEL_URL or IMAGES_URL not set. Skipping download.")
         print("Set these environment variables in Render dashboard with direct download links.")
         return
+    missing_checksums = [artifact['name'] for artifact in artifacts if not artifact['sha256']]
+    if missing_checksums:
+        print(f"⚠ No SHA-256 for {', '.join(missing_checksums)}; those files are not verified")
 
-    # Download files
-    if not os.path.exists('best_model.pt'):
-        print("Downloading model file (334 MB)...")
-        download_file(model_url, 'best_model.pt', 'Model')
-    else:
-        print("✓ Model file already exists")
-
-    if not os.path.exists('all_product_images.zip'):
-        print("Downloading product images (104 MB)...")
-        download_file(images_url, 'all_product_images.zip', 'Images')
-    else:
-        print("✓ Images file already exists")
+    start = time.perf_counter()
+    failed = download_all(artifacts, args.dest_dir, args.connections, args.segment_mb * 1024 * 1024)
+    if failed:
+        for name, error in failed.items():
+            print(f"⚠ {name}: {error}")
+        print("Interrupted downloads are kept and resume on the next run")
+        raise SystemExit(1)
 
-    print("\n✓ All files ready!")
+    print(f"\n✓ All files ready! ({time.perf_counter() - start:.1f}s)")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,197 @@
+"""
+Resumable, incremental embedding jobs
+Embeddings are stored in shards keyed by image content hash, under a
+directory per model version:
+
+    embeddings/<model_version>/manifest.json
+    embeddings/<model_version>/shard_00000.npz   (hashes, embeddings)
+
+A shard is only listed in the manifest once it is completely written, so a
+job that dies halfway resumes after the last complete shard. Rerunning a job
+after adding or changing images only embeds images whose content hash has no
+embedding yet; unchanged and duplicate images are never embedded twice.
+
+Example:
+    job = EmbeddingJob("embeddings", model_version(MODEL_PATH))
+    vectors, failed = job.run(image_paths, pipeline)
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+EMBEDDINGS_DIR = "embeddings"
+# Images per shard (one checkpoint per shard)
+SHARD_SIZE = 4096
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+BASE_MODEL = "openai/clip-vit-base-patch32"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=16)
+def _checkpoint_hash(path, size, mtime):
+    return file_hash(path)[:12]
+
+
+def model_version(model_path, base_model=BASE_MODEL):
+    """
+    Identify the weights that produce the embeddings
+
+    Returns:
+        e.g. 'clip-vit-base-patch32-3f2a9c1d04be' (base model + checkpoint hash),
+        or 'clip-vit-base-patch32-base' without a fine-tuned checkpoint
+    """
+    base = base_model.split('/')[-1]
+    if model_path and os.path.exists(model_path):
+        # Hashing a checkpoint takes a while, so only redo it when the file changes
+        stat = os.stat(model_path)
+        return f"{base}-{_checkpoint_hash(model_path, stat.st_size, stat.st_mtime)}"
+    return f"{base}-base"
+
+
+def hash_files(paths, workers=HASH_WORKERS):
+    """
+    Content-hash files in parallel
+
+    Returns:
+        Tuple of (hashes, failed): path -> hash for readable files and
+        path -> error message for the rest
+    """
+    def _hash(path):
+        try:
+            return path, file_hash(path), None
+        except OSError as e:
+            return path, None, f"{type(e).__name__}: {e}"
+
+    hashes = {}
+    failed = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, digest, error in pool.map(_hash, paths):
+            if error is None:
+                hashes[path] = digest
+            else:
+                failed[path] = error
+    return hashes, failed
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class EmbeddingJob:
+    """Sharded, checkpointed embedding store for one model version"""
+
+    def __init__(self, output_dir=EMBEDDINGS_DIR, version="base", shard_size=SHARD_SIZE):
+        self.version = version
+        self.shard_size = shard_size
+        self.directory = os.path.join(output_dir, version.replace('/', '_'))
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.manifest = self._load_manifest()
+        self._rows = {}
+        self._shards = []
+        for shard in self.manifest['shards']:
+            self._add_shard(shard['file'])
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        return {'model_version': self.version, 'shards': []}
+
+    def _add_shard(self, filename):
+        with np.load(os.path.join(self.directory, filename)) as data:
+            hashes = data['hashes']
+            embeddings = data['embeddings']
+        shard_number = len(self._shards)
+        self._shards.append(embeddings)
+        for row, digest in enumerate(hashes):
+            self._rows[str(digest)] = (shard_number, row)
+
+    def _write_shard(self, hashes, embeddings):
+        filename = f"shard_{len(self.manifest['shards']):05d}.npz"
+        path = os.path.join(self.directory, filename)
+        _write_atomic(path, lambda f: np.savez(f, hashes=np.array(hashes), embeddings=embeddings))
+
+        # The checkpoint: a shard counts as done only once it is in the manifest
+        self.manifest['shards'].append({'file': filename, 'count': len(hashes)})
+        manifest = json.dumps(self.manifest, indent=2).encode()
+        _write_atomic(self.manifest_path, lambda f: f.write(manifest))
+        self._add_shard(filename)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, digest):
+        return digest in self._rows
+
+    def get(self, digest):
+        """Embedding for a content hash, or None"""
+        location = self._rows.get(digest)
+        if location is None:
+            return None
+        shard, row = location
+        return self._shards[shard][row]
+
+    def run(self, image_paths, pipeline):
+        """
+        Embed every image that has no stored embedding yet
+
+        Args:
+            image_paths: Images to cover
+            pipeline: embedding_pipeline.EmbeddingPipeline used for missing images
+
+        Returns:
+            Tuple of (embeddings, failed): path -> float32 vector for every
+            path that has an embedding, and path -> error message
+        """
+        hashes, failed = hash_files(image_paths)
+
+        # One representative path per missing hash, so duplicates are embedded once
+        missing = {}
+        for path, digest in hashes.items():
+            if digest not in self._rows and digest not in missing:
+                missing[digest] = path
+
+        stored = sum(1 for digest in hashes.values() if digest in self._rows)
+        print(f"  {stored} of {len(hashes)} images already embedded ({self.version}), "
+              f"{len(missing)} unique images to embed")
+
+        todo = list(missing.items())
+        for start in range(0, len(todo), self.shard_size):
+            chunk = todo[start:start + self.shard_size]
+            result = pipeline.run([path for _, path in chunk],
+                                  desc=f"Shard {len(self.manifest['shards'])}")
+            failed.update(result.failed)
+
+            path_hashes = {path: digest for digest, path in chunk}
+            if result.paths:
+                self._write_shard([path_hashes[path] for path in result.paths], result.embeddings)
+
+        embeddings = {}
+        for path, digest in hashes.items():
+            vector = self.get(digest)
+            if vector is not None:
+                embeddings[path] = vector
+            elif path not in failed:
+                # A duplicate of an image that failed to embed
+                failed[path] = failed.get(missing.get(digest), "not embedded")
+        return embeddings, failed
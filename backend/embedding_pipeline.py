@@ -0,0 +1,395 @@
+"""
+Batched, pipelined image embedding
+Keeps the model busy while images are decoded:
+- A pool of worker threads opens and preprocesses images into a bounded queue
+- The calling thread groups ready images into batches and runs one forward
+  pass per batch
+- Images that fail to load or embed are left out of the results and reported
+  with their error, instead of being padded with placeholder vectors
+- stream() yields results in input order as batches finish, optionally with a
+  batch size that adapts to a latency target and memory budget
+
+Images can be file paths, encoded bytes or members of a zip archive.
+Used for both the siamese catalog vectors and OpenAI CLIP image features.
+
+Example:
+    pipeline = siamese_pipeline(model, processor, device, batch_size=64)
+    result = pipeline.run(image_paths)
+    index.add(result.embeddings)
+    result.write_failure_report("embedding_failures.json")
+
+    for position, path, vector, error in pipeline.stream(image_paths):
+        ...
+"""
+
+import io
+import json
+import os
+import queue
+import threading
+import time
+import zipfile
+
+import numpy as np
+import torch
+from PIL import Image
+from tqdm import tqdm
+
+BATCH_SIZE = 32
+NUM_WORKERS = min(8, os.cpu_count() or 1)
+# Preprocessed batches allowed to wait for the model before workers block
+PREFETCH_BATCHES = 2
+
+# Largest batch the adaptive batch size may grow to
+MAX_BATCH_SIZE = 256
+# How often waiting threads re-check for shutdown and partial batches
+POLL_SECONDS = 0.05
+
+_DONE = object()
+_archives = threading.local()
+
+
+def load_rgb_image(path):
+    """Load an image file as RGB"""
+    with Image.open(path) as image:
+        return image.convert("RGB")
+
+
+def _archive(path):
+    # ZipFile objects aren't safe to share between threads, so one per worker
+    if not hasattr(_archives, 'open'):
+        _archives.open = {}
+    if path not in _archives.open:
+        _archives.open[path] = zipfile.ZipFile(path)
+    return _archives.open[path]
+
+
+def load_image_source(item):
+    """
+    Default image loader
+
+    Args:
+        item: Image file path, encoded image bytes, an (archive path, member name)
+              pair for images inside a zip such as all_product_images.zip, or a PIL image
+
+    Returns:
+        RGB PIL image
+    """
+    if isinstance(item, Image.Image):
+        return item.convert("RGB")
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return load_rgb_image(io.BytesIO(item))
+    if isinstance(item, tuple):
+        archive_path, member = item
+        return load_rgb_image(io.BytesIO(_archive(archive_path).read(member)))
+    return load_rgb_image(item)
+
+
+def _out_of_memory(error):
+    return isinstance(error, RuntimeError) and 'out of memory' in str(error)
+
+
+class AdaptiveBatchSize:
+    """
+    Forward batch size that follows a latency target and a memory budget
+
+    Args:
+        initial: Starting batch size
+        minimum: Smallest batch size
+        maximum: Largest batch size (also sizes the prefetch queue)
+        target_seconds: Wanted time per forward pass; the size follows the
+                        measured time per image (fixed size if None)
+        memory_budget: Bytes of preprocessed input allowed in one batch
+    """
+
+    def __init__(self, initial=BATCH_SIZE, minimum=1, maximum=MAX_BATCH_SIZE,
+                 target_seconds=None, memory_budget=None):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.size = min(max(initial, minimum), self.maximum)
+        self.target_seconds = target_seconds
+        self.memory_budget = memory_budget
+        self.limit = self.maximum
+        self._seconds_per_item = None
+
+    def observe(self, tensor):
+        """Cap the size by the memory budget, given one preprocessed image"""
+        if self.memory_budget and self.limit == self.maximum:
+            item_bytes = tensor.element_size() * tensor.nelement()
+            self.limit = max(self.minimum, min(self.maximum, self.memory_budget // item_bytes))
+            self.size = min(self.size, self.limit)
+
+    def record(self, size, seconds):
+        """Adjust the size after a forward pass of `size` images took `seconds`"""
+        if not self.target_seconds or size == 0:
+            return
+        per_item = seconds / size
+        if self._seconds_per_item is None:
+            self._seconds_per_item = per_item
+        else:
+            self._seconds_per_item = 0.7 * self._seconds_per_item + 0.3 * per_item
+        wanted = int(self.target_seconds / max(self._seconds_per_item, 1e-6))
+        # Grow at most 2x per step, since per-image cost drops with batch size
+        self.size = max(self.minimum, min(wanted, self.size * 2, self.limit))
+
+    def shrink(self, failed_size):
+        """A batch of failed_size ran out of memory"""
+        self.limit = max(self.minimum, failed_size // 2)
+        self.size = min(self.size, self.limit)
+
+
+class EmbeddingResult:
+    """
+    Output of one pipeline run
+
+    Attributes:
+        paths: Successfully embedded items, in input order
+        embeddings: float32 array of shape (len(paths), dim), row-aligned with paths
+        failed: Dict of item -> error message
+        seconds: Wall time of the run
+    """
+
+    def __init__(self, paths, embeddings, failed, seconds):
+        self.paths = paths
+        self.embeddings = embeddings
+        self.failed = failed
+        self.seconds = seconds
+
+    def as_dict(self):
+        """Map item -> embedding"""
+        return dict(zip(self.paths, self.embeddings))
+
+    def write_failure_report(self, path):
+        """Write failed items and their errors as JSON (nothing is written if all succeeded)"""
+        if not self.failed:
+            return False
+        with open(path, 'w') as f:
+            json.dump([{'image': str(item), 'error': error} for item, error in self.failed.items()], f, indent=2)
+        return True
+
+
+class EmbeddingPipeline:
+    """
+    Decode/preprocess workers feeding batched forward passes
+
+    Args:
+        preprocess: Callable PIL.Image -> tensor for one image (run in workers)
+        forward: Callable stacked tensor batch -> (batch, dim) numpy array
+        batch_size: Images per forward pass
+        num_workers: Decode/preprocess threads
+        prefetch_batches: Bound on preprocessed images waiting for the model, in batches
+        load_image: Callable item -> PIL.Image (run in workers)
+    """
+
+    def __init__(self, preprocess, forward, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS,
+                 prefetch_batches=PREFETCH_BATCHES, load_image=load_image_source):
+        self.preprocess = preprocess
+        self.forward = forward
+        self.batch_size = batch_size
+        self.num_workers = max(1, num_workers)
+        self.prefetch_batches = prefetch_batches
+        self.load_image = load_image
+
+    @staticmethod
+    def _put(ready, output, stop):
+        # Timed puts, so workers can't stay blocked on a full queue after the run stops
+        while not stop.is_set():
+            try:
+                ready.put(output, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _worker(self, tasks, ready, stop):
+        while not stop.is_set():
+            task = tasks.get()
+            if task is _DONE:
+                break
+            position, item = task
+            try:
+                output = (position, self.preprocess(self.load_image(item)), None)
+            except Exception as e:
+                output = (position, None, f"{type(e).__name__}: {e}")
+            self._put(ready, output, stop)
+        self._put(ready, _DONE, stop)
+
+    def _forward_batch(self, batch, finished, batcher):
+        start = time.perf_counter()
+        try:
+            output = self.forward(torch.stack([tensor for _, tensor in batch]))
+        except Exception as e:
+            if _out_of_memory(e) and len(batch) > 1:
+                # Retry in halves and keep future batches below the size that failed
+                batcher.shrink(len(batch))
+                middle = len(batch) // 2
+                self._forward_batch(batch[:middle], finished, batcher)
+                self._forward_batch(batch[middle:], finished, batcher)
+                return
+            for position, _ in batch:
+                finished[position] = (None, f"{type(e).__name__}: {e}")
+            return
+        batcher.record(len(batch), time.perf_counter() - start)
+        for (position, _), vector in zip(batch, output):
+            finished[position] = (vector, None)
+
+    def stream(self, items, batcher=None, flush_after=None):
+        """
+        Embed items lazily, yielding results in input order
+
+        Items are read from the iterable only as far as the prefetch window, so
+        an unbounded generator of images can be streamed.
+
+        Args:
+            items: Iterable of image paths (or anything load_image accepts)
+            batcher: AdaptiveBatchSize controlling the forward batch size
+                     (fixed at batch_size if None)
+            flush_after: Run a partial batch once no image has arrived for this
+                         many seconds (None waits for full batches)
+
+        Yields:
+            Tuples of (position, item, vector, error); vector is None when error is set
+        """
+        batcher = batcher or AdaptiveBatchSize(self.batch_size, maximum=self.batch_size)
+        # Items fed to the workers but not yielded yet
+        window = batcher.maximum * (self.prefetch_batches + 1) + self.num_workers
+        slots = threading.Semaphore(window)
+        tasks = queue.Queue()
+        ready = queue.Queue(maxsize=batcher.maximum * self.prefetch_batches)
+        stop = threading.Event()
+        pending = {}
+        feed = {'count': 0, 'done': False, 'error': None}
+
+        def feeder():
+            try:
+                for position, item in enumerate(items):
+                    while not slots.acquire(timeout=POLL_SECONDS):
+                        if stop.is_set():
+                            return
+                    pending[position] = item
+                    tasks.put((position, item))
+                    feed['count'] = position + 1
+            except Exception as e:
+                feed['error'] = e
+            finally:
+                feed['done'] = True
+                for _ in range(self.num_workers):
+                    tasks.put(_DONE)
+
+        threading.Thread(target=feeder, daemon=True).start()
+        for _ in range(self.num_workers):
+            threading.Thread(target=self._worker, args=(tasks, ready, stop), daemon=True).start()
+        running = self.num_workers
+
+        finished = {}
+        batch = []
+        next_position = 0
+        last_arrival = time.perf_counter()
+        try:
+            while True:
+                while next_position in finished:
+                    vector, error = finished.pop(next_position)
+                    yield next_position, pending.pop(next_position), vector, error
+                    next_position += 1
+                    slots.release()
+
+                if batch:
+                    # Images still being decoded, and whether more can be fed
+                    elsewhere = feed['count'] - next_position - len(batch) - len(finished)
+                    starved = elsewhere <= 0 and (feed['done'] or feed['count'] - next_position >= window)
+                    idle = flush_after is not None and time.perf_counter() - last_arrival >= flush_after
+                    if len(batch) >= batcher.size or not running or starved or idle:
+                        self._forward_batch(batch, finished, batcher)
+                        batch = []
+                        continue
+                elif not running:
+                    break
+
+                try:
+                    output = ready.get(timeout=min(POLL_SECONDS, flush_after or POLL_SECONDS))
+                except queue.Empty:
+                    continue
+                if output is _DONE:
+                    running -= 1
+                    continue
+                position, tensor, error = output
+                last_arrival = time.perf_counter()
+                if error is not None:
+                    finished[position] = (None, error)
+                else:
+                    batcher.observe(tensor)
+                    batch.append((position, tensor))
+        finally:
+            stop.set()
+
+        if feed['error'] is not None:
+            raise feed['error']
+
+    def run(self, items, desc=None):
+        """
+        Embed all items
+
+        Args:
+            items: Image paths (or anything load_image accepts)
+            desc: Show a progress bar with this label
+
+        Returns:
+            EmbeddingResult
+        """
+        start = time.perf_counter()
+        items = list(items)
+
+        paths = []
+        vectors = []
+        failed = {}
+        with tqdm(total=len(items), desc=desc, disable=desc is None) as progress:
+            for _, item, vector, error in self.stream(items):
+                if error is None:
+                    paths.append(item)
+                    vectors.append(vector)
+                else:
+                    failed[item] = error
+                progress.update(1)
+
+        if vectors:
+            embeddings = np.stack(vectors).astype('float32')
+        else:
+            embeddings = np.zeros((0, 0), dtype='float32')
+        return EmbeddingResult(paths, embeddings, failed, time.perf_counter() - start)
+
+
+def siamese_pipeline(model, processor, device, **kwargs):
+    """
+    Pipeline producing SiameseWithProjection embeddings (the catalog's FAISS vectors)
+
+    Args:
+        model: SiameseWithProjection in eval mode
+        processor: CLIPImageProcessor
+        device: Torch device the model is on
+        **kwargs: Passed to EmbeddingPipeline (batch_size, num_workers, ...)
+    """
+    def preprocess(image):
+        return processor(images=image, return_tensors="pt")['pixel_values'][0]
+
+    def forward(pixel_values):
+        with torch.no_grad():
+            emb = model.clip(pixel_values=pixel_values.to(device)).last_hidden_state[:, 0, :]
+            return model.projector(emb).cpu().numpy().astype("float32")
+
+    return EmbeddingPipeline(preprocess, forward, **kwargs)
+
+
+def clip_pipeline(model, preprocess, device, **kwargs):
+    """
+    Pipeline producing OpenAI CLIP encode_image features (unnormalized, float32)
+
+    Args:
+        model: CLIP model from clip.load
+        preprocess: The matching preprocess transform
+        device: Torch device the model is on
+        **kwargs: Passed to EmbeddingPipeline (batch_size, num_workers, ...)
+    """
+    def forward(images):
+        with torch.no_grad():
+            return model.encode_image(images.to(device)).float().cpu().numpy()
+
+    return EmbeddingPipeline(preprocess, forward, **kwargs)
@@ -0,0 +1,314 @@
+"""
+Feature store for catalog images
+Keeps per-image model outputs on disk as memory-mapped float32 arrays, keyed
+by image id (the catalog 'image' path, e.g. 'data/12_0.jpg') and model version:
+
+    features/<kind>/<model_version>/vectors.f32   (count x dim, row-major)
+    features/<kind>/<model_version>/keys.jsonl    (image id of each row)
+    features/<kind>/<model_version>/meta.json     (dim, count)
+
+Kinds in use:
+- siamese: SiameseWithProjection outputs (128-d, the catalog FAISS vectors)
+- clip:    OpenAI CLIP ViT-B/32 encode_image outputs (512-d, unnormalized)
+
+Rows are only ever appended; meta.json is rewritten last, so rows past its
+count are uncommitted. Writers in any process take an exclusive flock on
+.lock in the store directory, re-read meta.json and keys.jsonl under it
+before assigning rows, and drop uncommitted rows (left by an interrupted
+write) only while holding it. Readers pick up other writers' rows through
+refresh(), which ensure() calls before computing anything.
+
+Usage:
+    python feature_store.py status
+    python feature_store.py fill --kind clip
+    python feature_store.py fill --kind siamese
+    python feature_store.py fill --kind clip --image-pack catalog_images.pack
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+FEATURES_DIR = "features"
+METADATA_PATH = "product_metadata.json"
+KIND_DIMENSIONS = {'siamese': 128, 'clip': 512}
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class FeatureStore:
+    """Memory-mapped feature vectors for one (kind, model version)"""
+
+    def __init__(self, kind, model_version, dimension=None, root=FEATURES_DIR):
+        self.kind = kind
+        self.model_version = model_version
+        self.dimension = dimension or KIND_DIMENSIONS[kind]
+        self.directory = os.path.join(root, kind, model_version.replace('/', '_'))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.keys_path = os.path.join(self.directory, "keys.jsonl")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, ".lock")
+        self._lock = threading.Lock()
+        self._keys = []
+        self._rows = {}
+        self._keys_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, self._file_lock(blocking=False) as locked:
+            # Rows past the committed count may be another process's append in progress
+            self._load(truncate=locked)
+
+    @contextmanager
+    def _file_lock(self, blocking=True):
+        """
+        Exclusive cross-process writer lock on .lock in the store directory
+
+        Yields:
+            True if held; with blocking=False, False when another process holds it
+        """
+        with open(self.lock_path, 'a') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _committed_count(self):
+        if not os.path.exists(self.meta_path):
+            return 0
+        with open(self.meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta['dim'] != self.dimension:
+            raise ValueError(f"{self.directory} holds {meta['dim']}-d features, expected {self.dimension}")
+        return meta['count']
+
+    def _load(self, truncate=False):
+        """
+        Bring the in-memory keys up to the committed rows on disk
+
+        Args:
+            truncate: Also drop uncommitted rows past meta.json's count; only
+                      safe while holding the writer lock
+        """
+        count = self._committed_count()
+        if count != len(self._keys):
+            lines = []
+            if os.path.exists(self.keys_path):
+                with open(self.keys_path, 'rb') as f:
+                    lines = f.readlines()
+            if len(lines) < count:
+                raise ValueError(f"{self.keys_path} has {len(lines)} keys, meta.json says {count}")
+            self._keys = [json.loads(line) for line in lines[:count]]
+            self._rows = {key: row for row, key in enumerate(self._keys)}
+            self._keys_bytes = sum(len(line) for line in lines[:count])
+
+        row_bytes = self.dimension * 4
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if vectors_size < count * row_bytes:
+            raise ValueError(f"{self.vectors_path} is shorter than {count} rows")
+        if truncate:
+            # Drop anything an interrupted write left past the committed rows
+            if vectors_size > count * row_bytes:
+                os.truncate(self.vectors_path, count * row_bytes)
+            if os.path.exists(self.keys_path) and os.path.getsize(self.keys_path) > self._keys_bytes:
+                os.truncate(self.keys_path, self._keys_bytes)
+        self._map()
+
+    def refresh(self):
+        """Pick up rows committed by other writers since this store was opened"""
+        with self._lock:
+            if self._committed_count() != len(self._keys):
+                self._load()
+
+    def _map(self):
+        count = len(self._keys)
+        if count:
+            self._vectors = np.memmap(self.vectors_path, dtype='float32', mode='r+',
+                                      shape=(count, self.dimension))
+        else:
+            self._vectors = np.zeros((0, self.dimension), dtype='float32')
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, image_id):
+        return image_id in self._rows
+
+    def missing(self, image_ids):
+        """Image ids (deduplicated, in order) that have no stored features"""
+        return list(dict.fromkeys(image_id for image_id in image_ids if image_id not in self._rows))
+
+    def get_many(self, image_ids):
+        """
+        Read features in bulk
+
+        Returns:
+            Tuple of (vectors, found): float32 array (len(image_ids), dim) with
+            zero rows where missing, and a bool mask of which ids were found
+        """
+        rows = np.array([self._rows.get(image_id, -1) for image_id in image_ids], dtype=np.int64)
+        found = rows >= 0
+        vectors = np.zeros((len(rows), self.dimension), dtype='float32')
+        if found.any():
+            vectors[found] = self._vectors[rows[found]]
+        return vectors, found
+
+    def put_many(self, image_ids, vectors):
+        """Store features, overwriting rows for ids that already exist"""
+        vectors = np.ascontiguousarray(vectors, dtype='float32').reshape(-1, self.dimension)
+        if len(vectors) != len(image_ids):
+            raise ValueError("image_ids and vectors must have the same length")
+
+        with self._lock, self._file_lock():
+            # Another process may have appended since: assign rows after its
+            self._load(truncate=True)
+            new = {}
+            for image_id, vector in zip(image_ids, vectors):
+                row = self._rows.get(image_id)
+                if row is not None:
+                    self._vectors[row] = vector
+                else:
+                    new[image_id] = vector
+
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+            if not new:
+                return
+
+            new_ids = list(new)
+            key_lines = [(json.dumps(image_id) + '\n').encode('utf-8') for image_id in new_ids]
+            with open(self.vectors_path, 'ab') as f:
+                f.write(np.stack(list(new.values())).tobytes())
+            with open(self.keys_path, 'ab') as f:
+                f.writelines(key_lines)
+            self._keys_bytes += sum(len(line) for line in key_lines)
+
+            for image_id in new_ids:
+                self._rows[image_id] = len(self._keys)
+                self._keys.append(image_id)
+            _write_json_atomic(self.meta_path, {
+                'kind': self.kind,
+                'model_version': self.model_version,
+                'dim': self.dimension,
+                'count': len(self._keys)
+            })
+            self._map()
+
+    def ensure(self, image_ids, compute):
+        """
+        Read features, computing and storing any that are missing
+
+        Args:
+            image_ids: Image ids to read
+            compute: Callable list of missing ids -> (dict id -> vector, dict id -> error)
+
+        Returns:
+            Tuple of (vectors, found, failed) - see get_many; failed maps id -> error
+        """
+        failed = {}
+        self.refresh()
+        missing = self.missing(image_ids)
+        if missing:
+            computed, failed = compute(missing)
+            if computed:
+                self.put_many(list(computed), np.stack(list(computed.values())))
+        vectors, found = self.get_many(image_ids)
+        return vectors, found, failed
+
+
+def pipeline_compute(pipeline):
+    """Adapt an embedding_pipeline.EmbeddingPipeline to FeatureStore.ensure"""
+    def compute(image_ids):
+        result = pipeline.run(image_ids, desc="Computing features")
+        return result.as_dict(), result.failed
+    return compute
+
+
+def catalog_image_ids(metadata_path=METADATA_PATH):
+    """Distinct image ids referenced by the catalog"""
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    return list(dict.fromkeys(info['image'] for info in metadata.values() if info.get('image')))
+
+
+def open_store(kind, root=FEATURES_DIR, image_pack=None):
+    """
+    Load the model for a kind and open its store
+
+    Args:
+        image_pack: Optional image_pack.ImagePack to read images from instead of decoding JPEGs
+
+    Returns:
+        Tuple of (store, compute) where compute fills missing ids with the model
+    """
+    if kind == 'siamese':
+        from catalog_ingest import MODEL_PATH, load_model
+        from embedding_jobs import model_version
+        from embedding_pipeline import siamese_pipeline
+        model, processor, device = load_model()
+        store = FeatureStore('siamese', model_version(MODEL_PATH), root=root)
+        kwargs = {'load_image': image_pack.load_image} if image_pack is not None else {}
+        return store, pipeline_compute(siamese_pipeline(model, processor, device, **kwargs))
+
+    from clothing_classifier import ClothingStyleClassifier
+    classifier = ClothingStyleClassifier()
+    classifier.use_image_pack(image_pack)
+    store = FeatureStore('clip', classifier.model_version, root=root)
+    return store, pipeline_compute(classifier.feature_pipeline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog image feature store")
+    parser.add_argument("--root", default=FEATURES_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Show stored feature sets")
+
+    fill_parser = subparsers.add_parser("fill", help="Compute features missing for catalog images")
+    fill_parser.add_argument("--kind", choices=sorted(KIND_DIMENSIONS), required=True)
+    fill_parser.add_argument("--metadata", default=METADATA_PATH)
+    fill_parser.add_argument("--image-pack", help="Read images from this image_pack.py file instead of decoding JPEGs")
+
+    args = parser.parse_args()
+
+    if args.command == "status":
+        if not os.path.isdir(args.root):
+            print(f"No feature store at {args.root}/")
+            return
+        for kind in sorted(os.listdir(args.root)):
+            for version in sorted(os.listdir(os.path.join(args.root, kind))):
+                meta_path = os.path.join(args.root, kind, version, "meta.json")
+                if os.path.exists(meta_path):
+                    with open(meta_path, 'r') as f:
+                        meta = json.load(f)
+                    print(f"  {kind:8s} {version:40s} {meta['count']:>8} x {meta['dim']}")
+    else:
+        image_ids = catalog_image_ids(args.metadata)
+        from image_pack import open_pack
+        store, compute = open_store(args.kind, args.root, open_pack(args.image_pack))
+        missing = store.missing(image_ids)
+        print(f"{len(image_ids) - len(missing)} of {len(image_ids)} catalog images have "
+              f"{args.kind} features ({store.model_version})")
+        _, found, failed = store.ensure(image_ids, compute)
+        print(f"✓ {int(found.sum())} stored, {len(failed)} failed")
+        for image_id, error in list(failed.items())[:10]:
+            print(f"  ⚠ {image_id}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Synthetic catalog generator for load testing at scale
+Streams out catalogs of 100k to 10M products in the same on-disk formats the
+API server loads (per-category IndexFlatL2 files, *_ids.json, product
+metadata), without holding the catalog in memory.
+
+- Deterministic: the same --seed and --products always give the same catalog
+- Realistic: category sizes follow the real catalog's mix; each synthetic
+  product is derived from a real product of the same category (style, gender,
+  price band) and its vector interpolates towards a second real product with
+  added noise
+- Bounded memory: vectors are generated and written in chunks
+
+Unlike scale_database.py this never modifies the real catalog and needs no
+confirmation prompt.
+
+Usage:
+    python generate_synthetic_catalog.py --products 1000000 --output-dir synthetic_1m
+    python api_server.py  # with FAISS_DIR=synthetic_1m/faiss_indices METADATA_PATH=synthetic_1m/product_metadata.json
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from catalog_store import category_filename, load_faiss_indices, load_metadata, stored_vectors
+
+# Configuration
+FAISS_DIR = "faiss_indices"
+METADATA_PATH = "product_metadata.json"
+CHUNK_SIZE = 50000
+# Noise added to each synthetic vector, as a fraction of the category's per-dimension std
+NOISE_SCALE = 0.25
+# Synthetic vectors move up to this far from their base product towards another one
+MAX_INTERPOLATION = 0.5
+# Synthetic prices vary by up to +/- this fraction of the base price
+PRICE_VARIATION = 0.1
+
+FAISS_METRIC_L2 = 1
+
+
+class FlatIndexWriter:
+    """
+    Write a faiss IndexFlatL2 file incrementally
+
+    Writes the same bytes as faiss.write_index(IndexFlatL2) - header, then the
+    raw float32 vectors - so faiss.read_index loads the result directly, but
+    vectors are appended chunk by chunk instead of built up in memory first.
+    """
+
+    def __init__(self, path, dimension, ntotal):
+        self.path = path
+        self.dimension = dimension
+        self.ntotal = ntotal
+        self.written = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(b'IxF2')
+        self._file.write(struct.pack('<i', dimension))
+        self._file.write(struct.pack('<q', ntotal))
+        self._file.write(struct.pack('<q', 1 << 20))  # unused header fields
+        self._file.write(struct.pack('<q', 1 << 20))
+        self._file.write(struct.pack('<B', 1))  # is_trained
+        self._file.write(struct.pack('<i', FAISS_METRIC_L2))
+        self._file.write(struct.pack('<Q', ntotal * dimension))
+
+    def add(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype='<f4')
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected dimension {self.dimension}, got {vectors.shape[1]}")
+        if self.written + len(vectors) > self.ntotal:
+            raise ValueError("More vectors than declared in the index header")
+        self._file.write(vectors.tobytes())
+        self.written += len(vectors)
+
+    def close(self):
+        self._file.close()
+        if self.written != self.ntotal:
+            raise ValueError(f"{self.path}: wrote {self.written} of {self.ntotal} vectors")
+
+
+class JsonStreamWriter:
+    """Write a JSON list or object one entry at a time"""
+
+    def __init__(self, path, kind='list'):
+        self._file = open(path, 'w')
+        self._kind = kind
+        self._first = True
+        self._file.write('[' if kind == 'list' else '{\n')
+
+    def _separator(self):
+        if not self._first:
+            self._file.write(',\n' if self._kind == 'object' else ', ')
+        self._first = False
+
+    def append(self, value):
+        self._separator()
+        self._file.write(json.dumps(value))
+
+    def put(self, key, value):
+        self._separator()
+        self._file.write(f"{json.dumps(key)}: {json.dumps(value)}")
+
+    def close(self):
+        self._file.write(']' if self._kind == 'list' else '\n}')
+        self._file.close()
+
+
+def parse_price(price):
+    """'$ 14.99' -> 14.99 (None if not a dollar price)"""
+    try:
+        return float(str(price).replace('$', '').strip())
+    except ValueError:
+        return None
+
+
+def plan_category_sizes(real_sizes, total):
+    """
+    Split `total` products across categories in the real catalog's proportions
+
+    Returns:
+        Dict of category -> product count (sums exactly to total)
+    """
+    categories = sorted(real_sizes)
+    weights = np.array([real_sizes[c] for c in categories], dtype=np.float64)
+    exact = weights / weights.sum() * total
+    counts = np.floor(exact).astype(np.int64)
+    # Hand the remainder to the categories with the largest fractional parts
+    for i in np.argsort(-(exact - counts))[:total - counts.sum()]:
+        counts[i] += 1
+    return dict(zip(categories, counts.tolist()))
+
+
+def generate_category(category, count, base_vectors, base_names, metadata, rng,
+                      index_writer, ids_writer, metadata_writer, start_number,
+                      include_originals, chunk_size=CHUNK_SIZE):
+    """Stream one category's synthetic products to the index, id and metadata writers"""
+    written = 0
+    if include_originals:
+        index_writer.add(base_vectors)
+        for name in base_names:
+            ids_writer.append(name)
+        written = len(base_names)
+
+    scale = base_vectors.std(axis=0) * NOISE_SCALE
+    number = start_number
+
+    while written < count:
+        n = min(chunk_size, count - written)
+        base = rng.integers(0, len(base_vectors), n)
+        other = rng.integers(0, len(base_vectors), n)
+        t = rng.uniform(0, MAX_INTERPOLATION, (n, 1)).astype('float32')
+        noise = rng.normal(0, 1, (n, base_vectors.shape[1])).astype('float32') * scale
+        vectors = base_vectors[base] + t * (base_vectors[other] - base_vectors[base]) + noise
+        index_writer.add(vectors)
+
+        variations = rng.uniform(-PRICE_VARIATION, PRICE_VARIATION, n)
+        for row, variation in zip(base, variations):
+            base_name = base_names[row]
+            info = dict(metadata.get(base_name, {'category': category}))
+            price = parse_price(info.get('price', ''))
+            if price is not None:
+                info['price'] = f"${price * (1 + variation):.2f}"
+
+            name = f"{base_name} - Synthetic {number}"
+            number += 1
+            ids_writer.append(name)
+            metadata_writer.put(name, info)
+
+        written += n
+
+    return number
+
+
+def generate_catalog(total_products, output_dir, seed=0, source_faiss_dir=FAISS_DIR,
+                     source_metadata=METADATA_PATH, include_originals=True, chunk_size=CHUNK_SIZE):
+    """
+    Generate a synthetic catalog under output_dir
+
+    Returns:
+        Dict of category -> product count
+    """
+    metadata = load_metadata(source_metadata)
+    indices, id_maps, tombstones = load_faiss_indices(source_faiss_dir)
+
+    # Real vectors per category are the only thing kept in memory
+    base = {}
+    for category, index in indices.items():
+        deleted = tombstones.get(category, set())
+        rows, vectors = stored_vectors(index)
+        keep = [position for position, row in enumerate(rows.tolist()) if row not in deleted]
+        if keep:
+            base[category] = (vectors[keep], [id_maps[category][row] for row in rows[keep].tolist()])
+
+    sizes = plan_category_sizes({c: len(names) for c, (_, names) in base.items()}, total_products)
+    if include_originals:
+        sizes = {c: max(n, len(base[c][1])) for c, n in sizes.items()}
+
+    faiss_dir = os.path.join(output_dir, "faiss_indices")
+    os.makedirs(faiss_dir, exist_ok=True)
+    metadata_writer = JsonStreamWriter(os.path.join(output_dir, "product_metadata.json"), kind='object')
+
+    if include_originals:
+        for name, info in metadata.items():
+            metadata_writer.put(name, info)
+
+    # Each category gets its own child seed so the output doesn't depend on
+    # which categories exist before it
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    number = 1
+    for (category, count), child_seed in zip(sorted(sizes.items()), seeds):
+        start = time.perf_counter()
+        vectors, names = base[category]
+        safe_name = category_filename(category)
+
+        index_writer = FlatIndexWriter(os.path.join(faiss_dir, f"{safe_name}.index"), vectors.shape[1], count)
+        ids_writer = JsonStreamWriter(os.path.join(faiss_dir, f"{safe_name}_ids.json"))
+        number = generate_category(
+            category, count, vectors, names, metadata, np.random.default_rng(child_seed),
+            index_writer, ids_writer, metadata_writer, number, include_originals, chunk_size
+        )
+        index_writer.close()
+        ids_writer.close()
+        print(f"  {category}: {count:,} products in {time.perf_counter() - start:.1f}s")
+
+    metadata_writer.close()
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic catalog for load testing")
+    parser.add_argument("--products", type=int, required=True, help="Total indexed products (e.g. 1000000)")
+    parser.add_argument("--output-dir", required=True, help="Directory for faiss_indices/ and product_metadata.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--source-faiss-dir", default=FAISS_DIR)
+    parser.add_argument("--source-metadata", default=METADATA_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Vectors generated per chunk")
+    parser.add_argument("--no-originals", action="store_true", help="Only write synthetic products")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("SYNTHETIC CATALOG GENERATOR")
+    print("=" * 60)
+    print(f"Generating {args.products:,} products (seed {args.seed}) into {args.output_dir}/")
+
+    start = time.perf_counter()
+    sizes = generate_catalog(args.products, args.output_dir, args.seed, args.source_faiss_dir,
+                             args.source_metadata, not args.no_originals, args.chunk_size)
+
+    print(f"\n✓ {sum(sizes.values()):,} products in {len(sizes)} categories "
+          f"({time.perf_counter() - start:.1f}s)")
+    print("\nServe it with:")
+    print(f"  FAISS_DIR={args.output_dir}/faiss_indices METADATA_PATH={args.output_dir}/product_metadata.json "
+          f"python api_server.py")
+
+
+if __name__ == "__main__":
+    main()
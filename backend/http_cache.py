@@ -0,0 +1,188 @@
+"""
+Conditional, compressed responses for catalog read endpoints
+/categories, /products, /product/<name> and /classification-stats only
+change when the catalog does, so their responses are keyed on the catalog
+version (catalog_store.catalog_version):
+
+- ETag is the version (weak, so it holds across encodings) and Last-Modified
+  the newest catalog file mtime. If-None-Match / If-Modified-Since are
+  answered with 304 before the endpoint builds anything
+- Bodies are built once per (version, endpoint, parameters) and kept with
+  their gzip and brotli encodings, so repeated polls are a dict lookup and a
+  write. The key holds only the parameters the endpoint reads, so extra
+  query strings can't add entries. Total cached bytes are bounded (LRU), and
+  a new catalog version drops everything cached for the old one
+- Encodings are negotiated from Accept-Encoding; bodies under
+  MIN_COMPRESS_BYTES are sent as is
+
+brotli is optional; without it only gzip is offered.
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+from flask import jsonify, make_response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Cached entries and their total bytes (all encodings), least recently used evicted first
+MAX_ENTRIES = 512
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+# Larger bodies (e.g. /products with a huge limit) are served but not kept
+MAX_CACHED_BODY_BYTES = 2 * 1024 * 1024
+# Clients may keep responses but must revalidate them (a cheap 304)
+CACHE_CONTROL = 'no-cache'
+
+
+def _encoders():
+    encoders = {'gzip': lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        encoders['br'] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    return encoders
+
+
+ENCODERS = _encoders()
+# Preferred first when the client accepts several with equal quality
+ENCODING_PREFERENCE = ('br', 'gzip')
+
+
+class VersionedResponseCache:
+    """
+    Per-catalog-version cache of JSON response bodies and their encodings
+
+    Args:
+        max_entries: Cached responses kept (LRU)
+        max_bytes: Total bytes of cached bodies, all encodings (LRU)
+        observe: Optional callable (result) with result in not_modified, hit, miss
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_CACHE_BYTES, observe=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.observe = observe
+        self._entries = OrderedDict()
+        self._version = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _record(self, result):
+        if self.observe is not None:
+            self.observe(result)
+
+    def memory_bytes(self):
+        """Bytes of cached bodies, all encodings"""
+        with self._lock:
+            return self._bytes
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= sum(len(body) for body in entry['bodies'].values())
+
+    def respond(self, request, version, modified_at, build, params=()):
+        """
+        Response for a catalog read endpoint
+
+        Args:
+            request: Current flask request
+            version: Catalog version the response is derived from
+            modified_at: Catalog modification time (epoch seconds)
+            build: Callable returning the payload dict, or a finished response
+                   (e.g. an error) that is returned uncached
+            params: Hashable values of the query parameters the response depends on
+
+        Returns:
+            Flask response (200 or 304)
+        """
+        etag = f'v-{version}'
+        last_modified = int(modified_at or 0)
+
+        if request.if_none_match:
+            if request.if_none_match.contains_weak(etag):
+                return self._not_modified(etag, last_modified)
+        elif request.if_modified_since is not None and last_modified \
+                and request.if_modified_since.timestamp() >= last_modified:
+            return self._not_modified(etag, last_modified)
+
+        key = (request.path, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['version'] == version:
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+
+        if entry is None:
+            payload = build()
+            if not isinstance(payload, dict):
+                return payload
+            self._record('miss')
+            entry = {'key': key, 'version': version, 'bodies': {'identity': jsonify(payload).get_data()}}
+            if len(entry['bodies']['identity']) > MAX_CACHED_BODY_BYTES:
+                return self._send(request, entry, etag, last_modified)
+            with self._lock:
+                if version != self._version:
+                    # Responses for older catalog versions will never be served again
+                    self._entries.clear()
+                    self._bytes = 0
+                    self._version = version
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._bytes -= sum(len(body) for body in previous['bodies'].values())
+                self._entries[key] = entry
+                self._bytes += len(entry['bodies']['identity'])
+                self._evict()
+        else:
+            self._record('hit')
+        return self._send(request, entry, etag, last_modified)
+
+    def _send(self, request, entry, etag, last_modified):
+        encoding = self._negotiate(request, len(entry['bodies']['identity']))
+        body = entry['bodies'].get(encoding)
+        if body is None:
+            # Racing threads may both compress; the result is identical
+            body = ENCODERS[encoding](entry['bodies']['identity'])
+            with self._lock:
+                if encoding not in entry['bodies']:
+                    entry['bodies'][encoding] = body
+                    # Only entries still in the cache count toward its size
+                    if self._entries.get(entry.get('key')) is entry:
+                        self._bytes += len(body)
+                        self._evict()
+
+        response = make_response(body)
+        response.mimetype = 'application/json'
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        self._validators(response, etag, last_modified)
+        return response
+
+    def _negotiate(self, request, size):
+        if size < MIN_COMPRESS_BYTES:
+            return 'identity'
+        accepted = [(request.accept_encodings[name], -rank, name)
+                    for rank, name in enumerate(ENCODING_PREFERENCE) if name in ENCODERS]
+        quality, _, name = max(accepted)
+        return name if quality > 0 else 'identity'
+
+    def _not_modified(self, etag, last_modified):
+        self._record('not_modified')
+        response = make_response('', 304)
+        self._validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def _validators(response, etag, last_modified):
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
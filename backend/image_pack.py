@@ -0,0 +1,319 @@
+"""
+Packed, pre-resized catalog images for batch jobs
+Training, batch classification and feature extraction decode the same full-size
+JPEGs from data/ on every pass. A pack decodes them once into one
+memory-mappable file:
+
+    [magic][pixels: count x size x size x 3 uint8][original JPEGs][JSON index][index length][magic]
+
+- Pixels are resized on the shorter side and center-cropped to size x size,
+  which is what CLIP ViT-B/32's preprocess does at 224, so reading an image is
+  a memmap slice instead of a JPEG decode
+- The JSON index maps image id (the catalog 'image' path, e.g. 'data/12_0.jpg')
+  to its row, and with --with-jpeg to the offset and length of the original
+  file bytes
+- The pack is written to a temporary file and renamed, so readers never see a
+  partial one
+
+Example:
+    pack = ImagePack("catalog_images.pack")
+    pipeline = clip_pipeline(model, preprocess, device, load_image=pack.load_image)
+    dataset = PackedImageDataset(pack, image_ids, labels, transform=preprocess)
+    augmented = ClothingStyleDataset(image_ids, labels, preprocess, augment=True, load_image=pack.load_original)
+
+Augmented views are cropped and rotated from the full image, so they read
+pack.load_original (the stored JPEGs with --with-jpeg, else the files).
+
+Usage:
+    python image_pack.py build
+    python image_pack.py build --size 256 --with-jpeg --images-dir data
+    python image_pack.py info
+"""
+
+import argparse
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from torch.utils.data import Dataset
+from tqdm import tqdm
+
+from embedding_pipeline import load_image_source
+
+IMAGE_PACK_PATH = "catalog_images.pack"
+METADATA_PATH = "product_metadata.json"
+# Side of the stored square images (CLIP ViT-B/32 input size)
+IMAGE_SIZE = 224
+BUILD_WORKERS = min(8, os.cpu_count() or 1)
+# Images decoded ahead of the writer
+BUILD_CHUNK = 256
+
+MAGIC = b"IMGPACK1"
+# Pixel rows start here, so the memmap is page aligned
+DATA_OFFSET = 4096
+_TRAILER = struct.Struct("<Q8s")
+
+
+def resize_center_crop(image, size=IMAGE_SIZE):
+    """Resize the shorter side to size (bicubic) and center-crop to size x size"""
+    width, height = image.size
+    scale = size / min(width, height)
+    resized_size = (max(size, round(width * scale)), max(size, round(height * scale)))
+    image = image.resize(resized_size, Image.BICUBIC)
+    left = int(round((resized_size[0] - size) / 2.0))
+    top = int(round((resized_size[1] - size) / 2.0))
+    return image.crop((left, top, left + size, top + size))
+
+
+def _decode(path, size, keep_jpeg):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEGs can decode at a reduced scale that is still at least size x size
+        image.draft('RGB', (size, size))
+        pixels = np.asarray(resize_center_crop(image.convert('RGB'), size), dtype=np.uint8)
+    return pixels, data if keep_jpeg else None
+
+
+def build_pack(image_ids, output_path=IMAGE_PACK_PATH, size=IMAGE_SIZE, with_jpeg=False,
+               workers=BUILD_WORKERS, path_for=None):
+    """
+    Decode, resize and pack images into one file
+
+    Args:
+        image_ids: Ids to pack (duplicates are packed once)
+        output_path: Pack file to write
+        size: Side of the stored square images
+        with_jpeg: Also store the original file bytes
+        workers: Decode threads (PIL releases the GIL while decoding and resizing)
+        path_for: Callable image id -> file path (default: the id is the path)
+
+    Returns:
+        Dict of image id -> error for images that could not be packed
+    """
+    image_ids = list(dict.fromkeys(image_ids))
+    path_for = path_for or (lambda image_id: image_id)
+    row_bytes = size * size * 3
+    keys, failed, jpeg_lengths = [], {}, []
+    tmp_path = output_path + ".tmp"
+
+    def decode(image_id):
+        try:
+            return image_id, _decode(path_for(image_id), size, with_jpeg), None
+        except Exception as e:
+            return image_id, None, f"{type(e).__name__}: {e}"
+
+    # Originals are spooled to a temporary file and appended after the pixel rows
+    with open(tmp_path, 'wb') as out, tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output_path))) as jpegs:
+        out.write(MAGIC.ljust(DATA_OFFSET, b'\0'))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, \
+                tqdm(total=len(image_ids), desc="Packing images") as progress:
+            for start in range(0, len(image_ids), BUILD_CHUNK):
+                for image_id, decoded, error in pool.map(decode, image_ids[start:start + BUILD_CHUNK]):
+                    progress.update(1)
+                    if error is not None:
+                        failed[image_id] = error
+                        continue
+                    pixels, data = decoded
+                    out.write(pixels.tobytes())
+                    keys.append(image_id)
+                    if with_jpeg:
+                        jpegs.write(data)
+                        jpeg_lengths.append(len(data))
+
+        index = {'size': size, 'count': len(keys), 'data_offset': DATA_OFFSET, 'keys': keys}
+        if with_jpeg:
+            jpeg_offset = DATA_OFFSET + len(keys) * row_bytes
+            jpegs.seek(0)
+            shutil.copyfileobj(jpegs, out, 1 << 20)
+            offsets = np.concatenate([[0], np.cumsum(jpeg_lengths, dtype=np.int64)]) + jpeg_offset
+            index['jpeg_offsets'] = offsets.tolist()
+
+        encoded = json.dumps(index).encode('utf-8')
+        out.write(encoded)
+        out.write(_TRAILER.pack(len(encoded), MAGIC))
+        out.flush()
+        os.fsync(out.fileno())
+
+    os.replace(tmp_path, output_path)
+    return failed
+
+
+class ImagePack:
+    """
+    Read-only view of a pack file
+
+    The file is memory-mapped on first use, so a pack can be handed to
+    DataLoader worker processes and each maps it itself.
+    """
+
+    def __init__(self, path=IMAGE_PACK_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            index_length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an image pack")
+            f.seek(-_TRAILER.size - index_length, os.SEEK_END)
+            index = json.loads(f.read(index_length))
+
+        self.size = index['size']
+        self.keys = index['keys']
+        self._data_offset = index['data_offset']
+        self._jpeg_offsets = index.get('jpeg_offsets')
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._pixels = None
+        self._mmap = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pixels'] = None
+        state['_mmap'] = None
+        return state
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, image_id):
+        return image_id in self._rows
+
+    @property
+    def has_jpeg(self):
+        return self._jpeg_offsets is not None
+
+    def _open(self):
+        if self._mmap is None:
+            with open(self.path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._pixels = np.frombuffer(self._mmap, dtype=np.uint8, count=len(self.keys) * self.size * self.size * 3,
+                                         offset=self._data_offset).reshape(len(self.keys), self.size, self.size, 3)
+        return self._pixels
+
+    def array(self, image_id):
+        """(size, size, 3) uint8 view of one image"""
+        return self._open()[self._rows[image_id]]
+
+    def batch(self, image_ids):
+        """(n, size, size, 3) uint8 array for several images (one gather from the map)"""
+        return self._open()[[self._rows[image_id] for image_id in image_ids]]
+
+    def image(self, image_id):
+        """One image as a PIL RGB image"""
+        return Image.fromarray(self.array(image_id))
+
+    def jpeg(self, image_id):
+        """Original file bytes, when the pack was built with them"""
+        if self._jpeg_offsets is None:
+            raise KeyError(f"{self.path} was built without original images")
+        self._open()
+        row = self._rows[image_id]
+        return self._mmap[self._jpeg_offsets[row]:self._jpeg_offsets[row + 1]]
+
+    def load_image(self, item):
+        """
+        Image loader for EmbeddingPipeline / ClothingStyleDataset
+
+        Packed image ids are read from the pack; anything else (paths not in the
+        pack, bytes, zip members) goes through embedding_pipeline.load_image_source.
+        """
+        if isinstance(item, str) and item in self._rows:
+            return self.image(item)
+        return load_image_source(item)
+
+    def load_original(self, item):
+        """
+        Full-size image loader, for random augmentations (crops, rotations) that
+        must see the whole image rather than the stored center crop
+
+        Decodes the original JPEG from the pack when it was built with them,
+        otherwise reads the item itself (e.g. the file at the image path).
+        """
+        if self.has_jpeg and isinstance(item, str) and item in self._rows:
+            return load_image_source(self.jpeg(item))
+        return load_image_source(item)
+
+
+class PackedImageDataset(Dataset):
+    """
+    torch Dataset over packed images
+
+    Args:
+        pack: ImagePack
+        image_ids: Ids to serve, in order
+        labels: Optional labels; items are (image, label) when given, else image
+        transform: Callable PIL image -> tensor (e.g. the CLIP preprocess)
+    """
+
+    def __init__(self, pack, image_ids, labels=None, transform=None):
+        self.pack = pack
+        self.image_ids = list(image_ids)
+        self.labels = labels
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.image_ids)
+
+    def __getitem__(self, idx):
+        image = self.pack.load_image(self.image_ids[idx])
+        if self.transform is not None:
+            image = self.transform(image)
+        if self.labels is None:
+            return image
+        return image, self.labels[idx]
+
+
+def open_pack(path):
+    """ImagePack at path, or None when no path is given or the file doesn't exist"""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"⚠ Image pack {path} not found, decoding images from their files")
+        return None
+    pack = ImagePack(path)
+    print(f"✓ Using image pack {path} ({len(pack)} images at {pack.size}px)")
+    return pack
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed, pre-resized catalog images")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("--pack", default=IMAGE_PACK_PATH)
+    parser.add_argument("--metadata", default=METADATA_PATH, help="Pack the images this catalog references")
+    parser.add_argument("--images-dir", help="Pack every image in this directory instead")
+    parser.add_argument("--size", type=int, default=IMAGE_SIZE)
+    parser.add_argument("--with-jpeg", action="store_true", help="Also store the original files")
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        pack = ImagePack(args.pack)
+        print(f"{args.pack}: {len(pack)} images, {pack.size}x{pack.size}, "
+              f"{'with' if pack.has_jpeg else 'without'} originals, "
+              f"{os.path.getsize(args.pack) / 1e6:.1f} MB")
+        return
+
+    if args.images_dir:
+        image_ids = [os.path.join(args.images_dir, name) for name in sorted(os.listdir(args.images_dir))
+                     if name.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    else:
+        from feature_store import catalog_image_ids
+        image_ids = catalog_image_ids(args.metadata)
+
+    start = time.perf_counter()
+    failed = build_pack(image_ids, args.pack, args.size, args.with_jpeg, args.workers)
+    print(f"✓ Packed {len(image_ids) - len(failed)} images into {args.pack} "
+          f"({os.path.getsize(args.pack) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    for image_id, error in list(failed.items())[:10]:
+        print(f"  ⚠ {image_id}: {error}")
+
+
+if __name__ == "__main__":
+    main()
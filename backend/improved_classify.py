@@ -7,6 +7,123 @@ to classify items into: casual, uniform (formal), and semi_uniform (semi-formal)
 import json
 import re
 
+# Explicit formal keywords
+FORMAL_KEYWORDS = [
+    'suit jacket', 'suit vest', 'blazer', 'tuxedo',
+    'dress shirt', 'oxford shirt', 'formal shirt',
+    'dress pants', 'suit pants', 'tailored pants',
+    'evening dress', 'formal dress', 'cocktail dress', 'gown',
+    'bow tie', 'necktie', 'cufflinks',
+    'dress shoes', 'oxford shoes', 'loafers', 'heels',
+    'tailored', 'business suit', 'three-piece'
+]
+
+# Category-based formal classification
+FORMAL_CATEGORIES = [
+    'suits & blazers',
+    'blazers & vests'
+]
+
+FORMAL_DRESS_INDICATORS = [
+    'evening', 'cocktail', 'formal', 'gown', 'party',
+    'satin', 'silk', 'lace', 'sequin', 'velvet',
+    'maxi', 'midi', 'a-line', 'sheath', 'bodycon'
+]
+
+CASUAL_DRESS_INDICATORS = [
+    'jersey', 't-shirt', 'tank', 'cami', 'smock',
+    'sweat', 'hoodie', 'denim', 'oversized'
+]
+
+SEMI_FORMAL_KEYWORDS = [
+    'polo', 'polo shirt',
+    'chino', 'khaki',
+    'button-down', 'button-up', 'collared shirt',
+    'blouse', 'dress blouse',
+    'cardigan', 'sweater cardigan',
+    'smart casual', 'business casual',
+    'trench coat', 'peacoat', 'wool coat',
+    'ankle boots', 'chelsea boots', 'loafers',
+    'pencil skirt', 'midi skirt', 'a-line skirt'
+]
+
+# Casual shirts
+CASUAL_SHIRT_INDICATORS = [
+    't-shirt', 'tee', 'tank', 'cami', 'crop',
+    'oversized', 'relaxed', 'loose',
+    'jersey', 'cotton jersey',
+    'graphic', 'printed', 'slogan'
+]
+
+# Semi-formal shirts
+SEMI_FORMAL_SHIRT_INDICATORS = [
+    'button', 'collar', 'oxford', 'poplin',
+    'blouse', 'tunic', 'peplum',
+    'wrap', 'tie-front', 'bow'
+]
+
+CASUAL_PANTS_INDICATORS = [
+    'sweat', 'jogger', 'track', 'cargo',
+    'legging', 'yoga', 'athletic',
+    'denim', 'jean', 'ripped', 'distressed',
+    'wide-leg jersey', 'pull-on', 'elastic'
+]
+
+SEMI_FORMAL_PANTS_INDICATORS = [
+    'chino', 'khaki', 'tailored', 'dress',
+    'wide-leg', 'straight-leg', 'slim-fit',
+    'high-waist', 'cigarette', 'ankle'
+]
+
+CASUAL_SWEATER_INDICATORS = [
+    'hoodie', 'sweatshirt', 'oversized',
+    'knit pullover', 'chunky'
+]
+
+CASUAL_JACKET_INDICATORS = [
+    'hoodie', 'sweatshirt', 'denim jacket',
+    'bomber', 'windbreaker', 'puffer',
+    'fleece', 'track jacket'
+]
+
+FORMAL_JACKET_INDICATORS = [
+    'blazer', 'suit', 'tuxedo',
+    'wool coat', 'trench', 'peacoat',
+    'overcoat', 'topcoat'
+]
+
+CASUAL_SKIRT_INDICATORS = [
+    'denim', 'jean', 'mini', 'short',
+    'jersey', 'skort', 'athletic'
+]
+
+SEMI_FORMAL_SKIRT_INDICATORS = [
+    'pencil', 'midi', 'maxi', 'a-line',
+    'pleated', 'wrap', 'high-waist'
+]
+
+CASUAL_KEYWORDS = [
+    't-shirt', 'tee', 'tank top', 'cami',
+    'jeans', 'denim',
+    'shorts', 'short',
+    'hoodie', 'sweatshirt', 'sweatpants',
+    'sneakers', 'sandals', 'flip-flops',
+    'athletic', 'sporty', 'activewear',
+    'joggers', 'leggings',
+    'crop top', 'tube top',
+    'oversized', 'relaxed fit', 'loose fit',
+    'jersey', 'cotton jersey'
+]
+
+# Category-based casual classification
+CASUAL_CATEGORIES = [
+    't-shirt', 'tops & t-shirts',
+    'jeans',
+    'shorts',
+    'hoodies & sweatshirts',
+    'activewear', 'sportswear'
+]
+
 
 def classify_clothing_item(name, category, description):
     """
@@ -26,29 +143,12 @@ def classify_clothing_item(name, category, description):
     # UNIFORM (FORMAL) CLASSIFICATION
     # ============================================
 
-    # Explicit formal keywords
-    formal_keywords = [
-        'suit jacket', 'suit vest', 'blazer', 'tuxedo',
-        'dress shirt', 'oxford shirt', 'formal shirt',
-        'dress pants', 'suit pants', 'tailored pants',
-        'evening dress', 'formal dress', 'cocktail dress', 'gown',
-        'bow tie', 'necktie', 'cufflinks',
-        'dress shoes', 'oxford shoes', 'loafers', 'heels',
-        'tailored', 'business suit', 'three-piece'
-    ]
-
     # Check for explicit formal keywords
-    for keyword in formal_keywords:
+    for keyword in FORMAL_KEYWORDS:
         if keyword in full_text:
             return 'uniform'
 
-    # Category-based formal classification
-    formal_categories = [
-        'suits & blazers',
-        'blazers & vests'
-    ]
-
-    if any(cat in category_lower for cat in formal_categories):
+    if any(cat in category_lower for cat in FORMAL_CATEGORIES):
         # Exception: casual blazer
         if 'casual' in full_text and 'denim' in full_text:
             return 'semi_uniform'
@@ -56,20 +156,9 @@ def classify_clothing_item(name, category, description):
 
     # Dresses - check formality
     if 'dress' in category_lower or ('dress' in name_lower and 'dressing' not in name_lower):
-        formal_dress_indicators = [
-            'evening', 'cocktail', 'formal', 'gown', 'party',
-            'satin', 'silk', 'lace', 'sequin', 'velvet',
-            'maxi', 'midi', 'a-line', 'sheath', 'bodycon'
-        ]
-
-        casual_dress_indicators = [
-            'jersey', 't-shirt', 'tank', 'cami', 'smock',
-            'sweat', 'hoodie', 'denim', 'oversized'
-        ]
-
-        if any(indicator in full_text for indicator in formal_dress_indicators):
+        if any(indicator in full_text for indicator in FORMAL_DRESS_INDICATORS):
             return 'uniform'
-        elif any(indicator in full_text for indicator in casual_dress_indicators):
+        elif any(indicator in full_text for indicator in CASUAL_DRESS_INDICATORS):
             return 'casual'
         else:
             # Default dresses to semi-formal
@@ -79,72 +168,27 @@ def classify_clothing_item(name, category, description):
     # SEMI-FORMAL (SEMI_UNIFORM) CLASSIFICATION
     # ============================================
 
-    semi_formal_keywords = [
-        'polo', 'polo shirt',
-        'chino', 'khaki',
-        'button-down', 'button-up', 'collared shirt',
-        'blouse', 'dress blouse',
-        'cardigan', 'sweater cardigan',
-        'smart casual', 'business casual',
-        'trench coat', 'peacoat', 'wool coat',
-        'ankle boots', 'chelsea boots', 'loafers',
-        'pencil skirt', 'midi skirt', 'a-line skirt'
-    ]
-
-    for keyword in semi_formal_keywords:
+    for keyword in SEMI_FORMAL_KEYWORDS:
         if keyword in full_text:
             return 'semi_uniform'
 
     # Shirts and Blouses - detailed classification
     if 'shirt' in category_lower or 'blouse' in category_lower:
-        # Casual shirts
-        casual_shirt_indicators = [
-            't-shirt', 'tee', 'tank', 'cami', 'crop',
-            'oversized', 'relaxed', 'loose',
-            'jersey', 'cotton jersey',
-            'graphic', 'printed', 'slogan'
-        ]
-
-        # Semi-formal shirts
-        semi_formal_shirt_indicators = [
-            'button', 'collar', 'oxford', 'poplin',
-            'blouse', 'tunic', 'peplum',
-            'wrap', 'tie-front', 'bow'
-        ]
-
-        if any(indicator in full_text for indicator in casual_shirt_indicators):
+        if any(indicator in full_text for indicator in CASUAL_SHIRT_INDICATORS):
             return 'casual'
-        elif any(indicator in full_text for indicator in semi_formal_shirt_indicators):
+        elif any(indicator in full_text for indicator in SEMI_FORMAL_SHIRT_INDICATORS):
             return 'semi_uniform'
 
     # Pants - detailed classification
     if 'pant' in category_lower or 'trouser' in category_lower:
-        casual_pants_indicators = [
-            'sweat', 'jogger', 'track', 'cargo',
-            'legging', 'yoga', 'athletic',
-            'denim', 'jean', 'ripped', 'distressed',
-            'wide-leg jersey', 'pull-on', 'elastic'
-        ]
-
-        semi_formal_pants_indicators = [
-            'chino', 'khaki', 'tailored', 'dress',
-            'wide-leg', 'straight-leg', 'slim-fit',
-            'high-waist', 'cigarette', 'ankle'
-        ]
-
-        if any(indicator in full_text for indicator in casual_pants_indicators):
+        if any(indicator in full_text for indicator in CASUAL_PANTS_INDICATORS):
             return 'casual'
-        elif any(indicator in full_text for indicator in semi_formal_pants_indicators):
+        elif any(indicator in full_text for indicator in SEMI_FORMAL_PANTS_INDICATORS):
             return 'semi_uniform'
 
     # Sweaters and Cardigans
     if 'sweater' in category_lower or 'cardigan' in category_lower:
-        casual_sweater_indicators = [
-            'hoodie', 'sweatshirt', 'oversized',
-            'knit pullover', 'chunky'
-        ]
-
-        if any(indicator in full_text for indicator in casual_sweater_indicators):
+        if any(indicator in full_text for indicator in CASUAL_SWEATER_INDICATORS):
             return 'casual'
         else:
             # Most cardigans and sweaters are semi-formal
@@ -152,71 +196,27 @@ def classify_clothing_item(name, category, description):
 
     # Jackets and Coats
     if 'jacket' in category_lower or 'coat' in category_lower:
-        casual_jacket_indicators = [
-            'hoodie', 'sweatshirt', 'denim jacket',
-            'bomber', 'windbreaker', 'puffer',
-            'fleece', 'track jacket'
-        ]
-
-        formal_jacket_indicators = [
-            'blazer', 'suit', 'tuxedo',
-            'wool coat', 'trench', 'peacoat',
-            'overcoat', 'topcoat'
-        ]
-
-        if any(indicator in full_text for indicator in casual_jacket_indicators):
+        if any(indicator in full_text for indicator in CASUAL_JACKET_INDICATORS):
             return 'casual'
-        elif any(indicator in full_text for indicator in formal_jacket_indicators):
+        elif any(indicator in full_text for indicator in FORMAL_JACKET_INDICATORS):
             return 'semi_uniform'
 
     # Skirts
     if 'skirt' in category_lower:
-        casual_skirt_indicators = [
-            'denim', 'jean', 'mini', 'short',
-            'jersey', 'skort', 'athletic'
-        ]
-
-        semi_formal_skirt_indicators = [
-            'pencil', 'midi', 'maxi', 'a-line',
-            'pleated', 'wrap', 'high-waist'
-        ]
-
-        if any(indicator in full_text for indicator in casual_skirt_indicators):
+        if any(indicator in full_text for indicator in CASUAL_SKIRT_INDICATORS):
             return 'casual'
-        elif any(indicator in full_text for indicator in semi_formal_skirt_indicators):
+        elif any(indicator in full_text for indicator in SEMI_FORMAL_SKIRT_INDICATORS):
             return 'semi_uniform'
 
     # ============================================
     # CASUAL CLASSIFICATION
     # ============================================
 
-    casual_keywords = [
-        't-shirt', 'tee', 'tank top', 'cami',
-        'jeans', 'denim',
-        'shorts', 'short',
-        'hoodie', 'sweatshirt', 'sweatpants',
-        'sneakers', 'sandals', 'flip-flops',
-        'athletic', 'sporty', 'activewear',
-        'joggers', 'leggings',
-        'crop top', 'tube top',
-        'oversized', 'relaxed fit', 'loose fit',
-        'jersey', 'cotton jersey'
-    ]
-
-    for keyword in casual_keywords:
+    for keyword in CASUAL_KEYWORDS:
         if keyword in full_text:
             return 'casual'
 
-    # Category-based casual classification
-    casual_categories = [
-        't-shirt', 'tops & t-shirts',
-        'jeans',
-        'shorts',
-        'hoodies & sweatshirts',
-        'activewear', 'sportswear'
-    ]
-
-    if any(cat in category_lower for cat in casual_categories):
+    if any(cat in category_lower for cat in CASUAL_CATEGORIES):
         return 'casual'
 
     # ============================================
@@ -245,12 +245,11 @@ def main():
     # Classify each product
     classification_counts = {'casual': 0, 'uniform': 0, 'semi_uniform': 0}
 
-    for product_name, product_data in metadata.items():
-        category = product_data.get('category', '')
-        description = product_data.get('desc', '')
+    # Same rules, applied in parallel chunks for large catalogs
+    from style_rules import classify_catalog
 
-        style_type = classify_clothing_item(product_name, category, description)
-        product_data['style_type'] = style_type
+    for product_name, style_type in classify_catalog(metadata, 'improved').items():
+        metadata[product_name]['style_type'] = style_type
         classification_counts[style_type] += 1
 
     # Save updated metadata
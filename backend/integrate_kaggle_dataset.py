@@ -11,20 +11,24 @@ import torch
 import json
 import os
 import csv
-from PIL import Image
 from transformers import CLIPImageProcessor, CLIPVisionModel
+from embedding_jobs import EmbeddingJob, model_version
+from embedding_pipeline import siamese_pipeline
 from train_siamese_resnet50 import SiameseWithProjection
 import faiss
 import numpy as np
 from pathlib import Path
-from tqdm import tqdm
 
 # Configuration
 KAGGLE_DATASET_PATH = None  # Will be set after download
 MODEL_PATH = "best_model.pt"
 OUTPUT_FAISS_DIR = "faiss_indices_kaggle"
 OUTPUT_METADATA = "product_metadata_kaggle.json"
+# Embeddings by content hash, reused across runs (see embedding_jobs.py)
+EMBEDDINGS_DIR = "embeddings_kaggle"
+FAILURE_REPORT = "embedding_failures_kaggle.json"
 BATCH_SIZE = 32
+NUM_WORKERS = min(8, os.cpu_count() or 1)
 
 print("=" * 70)
 print("KAGGLE DATASET INTEGRATION TOOL")
@@ -107,46 +111,41 @@ def process_kaggle_metadata(dataset_path):
 
     return metadata, products_by_category
 
-def generate_embeddings_batch(image_paths, model, processor, device):
-    """Generate embeddings for a batch of images"""
-    embeddings = []
-
-    for img_path in image_paths:
-        try:
-            image = Image.open(img_path).convert("RGB")
-            inputs = processor(images=image, return_tensors="pt").to(device)
+def create_faiss_indices(metadata, products_by_category, model, processor, device):
+    """
+    Create FAISS indices for each category
 
-            with torch.no_grad():
-                emb = model.clip(pixel_values=inputs['pixel_values']).last_hidden_state[:, 0, :]
-                emb = model.projector(emb).squeeze(0).cpu().numpy().astype("float32")
-                embeddings.append(emb)
-        except Exception as e:
-            print(f"⚠ Error processing {img_path}: {e}")
-            # Add zero embedding as placeholder
-            embeddings.append(np.zeros(512, dtype='float32'))
+    Embeddings come from a resumable job keyed by image content hash and
+    model version, so a rerun only embeds new or changed images. Products
+    whose image can't be embedded are left out of the index and the ID list,
+    so the two stay row-aligned.
 
-    return np.array(embeddings)
+    Returns:
+        Dict of product name -> error for products that failed
+    """
+    print("\n🧮 Embedding images...")
+    job = EmbeddingJob(EMBEDDINGS_DIR, model_version(MODEL_PATH))
+    pipeline = siamese_pipeline(model, processor, device, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS)
+    vectors, failed = job.run([info['image'] for info in metadata.values()], pipeline)
 
-def create_faiss_indices(metadata, products_by_category, model, processor, device):
-    """Create FAISS indices for each category"""
     print("\n🔍 Creating FAISS indices...")
-
     os.makedirs(OUTPUT_FAISS_DIR, exist_ok=True)
+    failures = {}
 
-    for category, product_names in tqdm(products_by_category.items(), desc="Categories"):
+    for category, product_names in products_by_category.items():
         print(f"\n  Processing category: {category} ({len(product_names)} items)")
 
-        # Get image paths
-        image_paths = [metadata[name]['image'] for name in product_names]
+        for name in product_names:
+            path = metadata[name]['image']
+            if path not in vectors:
+                failures[name] = failed.get(path, "not embedded")
+        product_names = [name for name in product_names if metadata[name]['image'] in vectors]
 
-        # Generate embeddings in batches
-        all_embeddings = []
-        for i in range(0, len(image_paths), BATCH_SIZE):
-            batch_paths = image_paths[i:i+BATCH_SIZE]
-            batch_embeddings = generate_embeddings_batch(batch_paths, model, processor, device)
-            all_embeddings.append(batch_embeddings)
+        if not product_names:
+            print("  ⚠ No images could be embedded, skipping category")
+            continue
 
-        embeddings = np.vstack(all_embeddings)
+        embeddings = np.stack([vectors[metadata[name]['image']] for name in product_names])
 
         # Create FAISS index
         dimension = embeddings.shape[1]
@@ -165,6 +164,8 @@ def create_faiss_indices(metadata, products_by_category, model, processor, devic
 
         print(f"  ✓ Created index with {len(product_names)} vectors")
 
+    return failures
+
 def main(dataset_path):
     """Main integration workflow"""
 
@@ -179,7 +180,15 @@ def main(dataset_path):
         return
 
     # Step 3: Generate embeddings and create FAISS indices
-    create_faiss_indices(metadata, products_by_category, model, processor, device)
+    failures = create_faiss_indices(metadata, products_by_category, model, processor, device)
+
+    if failures:
+        print(f"\n⚠ {len(failures)} products could not be embedded, see {FAILURE_REPORT}")
+        with open(FAILURE_REPORT, 'w') as f:
+            json.dump([{'product': name, 'image': metadata[name]['image'], 'error': error}
+                       for name, error in failures.items()], f, indent=2)
+        for name in failures:
+            del metadata[name]
 
     # Step 4: Save metadata
     print(f"\n💾 Saving metadata to {OUTPUT_METADATA}...")
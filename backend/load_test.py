@@ -0,0 +1,381 @@
+"""
+End-to-end HTTP load test for the API server
+Replays a realistic traffic mix against a running (or locally started)
+api_server.py and reports throughput, latency percentiles and error rates
+as JSON.
+
+Traffic mix (per arrival, weighted):
+- recommend: POST /recommend with a sample image from data/, followed by
+  /image fetches for the items a user would see and a /shuffle
+- products:  GET /products paging through a category
+- image:     GET /image for a random catalog image
+
+Usage:
+    # Against a server that is already running
+    python load_test.py --url http://localhost:5000 --concurrency 8 --duration 60
+
+    # Start a local server on a scaled catalog, fixed arrival rate
+    python load_test.py --start-server --faiss-dir faiss_indices_100k \\
+        --metadata product_metadata_100k.json --rate 5 --duration 120 --output report.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# Configuration
+DEFAULT_URL = "http://localhost:5000"
+SAMPLE_IMAGE_DIR = "data"
+NUM_SAMPLE_IMAGES = 50
+# Weights of each user action in the traffic mix
+DEFAULT_MIX = {'recommend': 0.3, 'products': 0.4, 'image': 0.3}
+# Images a user looks at after a recommendation (items per category x categories)
+ITEMS_SHOWN = 3
+CATEGORIES_VIEWED = 2
+SERVER_START_TIMEOUT = 900
+
+
+class LoadStats:
+    """Thread-safe collection of per-endpoint latencies and errors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, latency, status):
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            self.status_codes[endpoint][str(status)] += 1
+            if status is None or status >= 400:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        """Per-endpoint and overall throughput, percentiles and error rates"""
+        def describe(latencies, errors):
+            count = len(latencies)
+            if count == 0:
+                return {'count': 0}
+            ms = np.array(latencies) * 1000
+            return {
+                'count': count,
+                'errors': errors,
+                'error_rate': round(errors / count, 4),
+                'throughput_rps': round(count / elapsed, 2),
+                'latency_ms': {
+                    'mean': round(float(ms.mean()), 2),
+                    'p50': round(float(np.percentile(ms, 50)), 2),
+                    'p95': round(float(np.percentile(ms, 95)), 2),
+                    'p99': round(float(np.percentile(ms, 99)), 2),
+                    'max': round(float(ms.max()), 2)
+                }
+            }
+
+        with self._lock:
+            endpoints = {
+                endpoint: {**describe(latencies, self.errors[endpoint]),
+                           'status_codes': dict(self.status_codes[endpoint])}
+                for endpoint, latencies in self.latencies.items()
+            }
+            all_latencies = [lat for lats in self.latencies.values() for lat in lats]
+            overall = describe(all_latencies, sum(self.errors.values()))
+
+        return {'overall': overall, 'endpoints': endpoints}
+
+
+class TrafficReplayer:
+    """Generates the user actions of the traffic mix"""
+
+    def __init__(self, base_url, sample_images, stats, timeout=60.0):
+        self.base_url = base_url.rstrip('/')
+        self.sample_images = sample_images
+        self.stats = stats
+        self.timeout = timeout
+        self._local = threading.local()
+
+        # Seeded by warmup() and refreshed from recommendation responses
+        self.categories = []
+        self.image_ids = deque(maxlen=5000)
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _call(self, endpoint, method, path, scheduled=None, **kwargs):
+        """
+        Issue one request and record it
+
+        Latency is measured from the scheduled arrival time when given, so
+        queueing behind a saturated client pool counts against the server.
+        """
+        start = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            response = self._session().request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response = None
+            status = None
+        self.stats.record(endpoint, time.perf_counter() - start, status)
+        return response
+
+    def warmup(self):
+        """Discover categories and image ids to draw requests from"""
+        response = self._session().get(f"{self.base_url}/categories", timeout=self.timeout)
+        response.raise_for_status()
+        self.categories = response.json()['categories']
+
+        response = self._session().get(f"{self.base_url}/products", params={'limit': 500}, timeout=self.timeout)
+        response.raise_for_status()
+        products = response.json()['products']
+        self.image_ids.extend(p['image_id'] for p in products if p.get('image_id'))
+
+    def catalog_info(self):
+        """Catalog size as reported by the server, for charting latency vs size"""
+        try:
+            health = self._session().get(f"{self.base_url}/health", timeout=self.timeout).json()
+            total = self._session().get(f"{self.base_url}/products", params={'limit': 1},
+                                        timeout=self.timeout).json()['total']
+            return {'products': total, 'categories': health.get('categories')}
+        except (requests.RequestException, ValueError, KeyError):
+            return {}
+
+    def recommend_session(self, scheduled):
+        """Upload an image, look at a few items, then shuffle one category"""
+        image = random.choice(self.sample_images)
+        response = self._call('POST /recommend', 'POST', '/recommend', scheduled,
+                              json={'image': image, 'num_items': 15})
+        if response is None or response.status_code != 200:
+            return
+
+        recommendations = response.json().get('recommendations', {})
+        viewed = random.sample(list(recommendations), min(CATEGORIES_VIEWED, len(recommendations)))
+        for category in viewed:
+            items = recommendations[category]
+            for item in items[:ITEMS_SHOWN]:
+                if item.get('image_id'):
+                    self._call('GET /image', 'GET', f"/image/{item['image_id']}")
+                    self.image_ids.append(item['image_id'])
+
+            names = [item['name'] for item in items]
+            if len(names) > ITEMS_SHOWN:
+                self._call('POST /shuffle', 'POST', '/shuffle', json={
+                    'category': category,
+                    'all_items': names,
+                    'shown_items': names[:ITEMS_SHOWN],
+                    'num_to_show': ITEMS_SHOWN
+                })
+
+    def browse_products(self, scheduled):
+        """Page through a category's products"""
+        params = {'limit': 20, 'offset': random.choice([0, 0, 20, 40, 100])}
+        if self.categories and random.random() < 0.7:
+            params['category'] = random.choice(self.categories)
+        self._call('GET /products', 'GET', '/products', scheduled, params=params)
+
+    def fetch_image(self, scheduled):
+        if not self.image_ids:
+            return
+        image_id = random.choice(self.image_ids)
+        self._call('GET /image', 'GET', f"/image/{image_id}", scheduled)
+
+    def run_action(self, action, scheduled=None):
+        {
+            'recommend': self.recommend_session,
+            'products': self.browse_products,
+            'image': self.fetch_image
+        }[action](scheduled)
+
+
+def load_sample_images(image_dir=SAMPLE_IMAGE_DIR, count=NUM_SAMPLE_IMAGES, seed=0):
+    """Base64-encode a fixed random sample of catalog images to upload"""
+    files = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+    if not files:
+        raise FileNotFoundError(f"No sample images found in {image_dir}")
+    rng = random.Random(seed)
+    chosen = rng.sample(files, min(count, len(files)))
+
+    images = []
+    for name in chosen:
+        with open(os.path.join(image_dir, name), 'rb') as f:
+            images.append(base64.b64encode(f.read()).decode('ascii'))
+    return images
+
+
+def start_local_server(port, faiss_dir=None, metadata_path=None):
+    """Start api_server.py in a subprocess and wait until it is healthy"""
+    env = dict(os.environ, PORT=str(port))
+    if faiss_dir:
+        env['FAISS_DIR'] = faiss_dir
+    if metadata_path:
+        env['METADATA_PATH'] = metadata_path
+
+    print(f"Starting local API server on port {port}...", file=sys.stderr)
+    server = subprocess.Popen([sys.executable, 'api_server.py'], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with code {server.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).json().get('model_loaded'):
+                print("Server is ready", file=sys.stderr)
+                return server, url
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(2)
+
+    server.terminate()
+    raise TimeoutError("API server did not become healthy in time")
+
+
+def run_load(replayer, mix, concurrency, duration, rate=None, max_requests=None, seed=0):
+    """
+    Drive the traffic mix
+
+    Args:
+        mix: Dict of action -> weight
+        concurrency: Number of client threads
+        duration: Seconds to run for
+        rate: Arrivals per second (Poisson). None runs closed-loop: each
+              thread starts its next action as soon as the previous finishes
+        max_requests: Stop after this many arrivals
+
+    Returns:
+        Elapsed seconds
+    """
+    rng = random.Random(seed)
+    actions = list(mix)
+    weights = [mix[a] for a in actions]
+    start = time.perf_counter()
+    end = start + duration
+    arrivals = [0]
+    arrivals_lock = threading.Lock()
+
+    def next_action():
+        with arrivals_lock:
+            if max_requests is not None and arrivals[0] >= max_requests:
+                return None
+            arrivals[0] += 1
+            return rng.choices(actions, weights)[0]
+
+    if rate is None:
+        def worker():
+            while time.perf_counter() < end:
+                action = next_action()
+                if action is None:
+                    return
+                replayer.run_action(action)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            scheduled = start
+            while True:
+                scheduled += rng.expovariate(rate)
+                if scheduled >= end:
+                    break
+                action = next_action()
+                if action is None:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(replayer.run_action, action, scheduled)
+
+    return time.perf_counter() - start
+
+
+def parse_mix(text):
+    """Parse 'recommend=0.3,products=0.4,image=0.3'"""
+    mix = {}
+    for part in text.split(','):
+        action, weight = part.split('=')
+        if action not in DEFAULT_MIX:
+            raise ValueError(f"Unknown action '{action}', expected one of {list(DEFAULT_MIX)}")
+        mix[action] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the outfit recommendation API")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Base URL of a running server")
+    parser.add_argument("--start-server", action="store_true", help="Start api_server.py locally")
+    parser.add_argument("--port", type=int, default=5055, help="Port for --start-server")
+    parser.add_argument("--faiss-dir", help="FAISS directory for --start-server (e.g. a scaled catalog)")
+    parser.add_argument("--metadata", help="Metadata file for --start-server")
+    parser.add_argument("--concurrency", type=int, default=4, help="Client threads")
+    parser.add_argument("--rate", type=float, help="Arrival rate in actions/sec (default: closed loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many actions")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Action weights, e.g. recommend=0.3,products=0.4,image=0.3")
+    parser.add_argument("--images", default=SAMPLE_IMAGE_DIR, help="Directory of sample upload images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.start_server:
+        server, url = start_local_server(args.port, args.faiss_dir, args.metadata)
+
+    try:
+        random.seed(args.seed)
+        stats = LoadStats()
+        replayer = TrafficReplayer(url, load_sample_images(args.images, seed=args.seed), stats)
+        replayer.warmup()
+
+        print(f"Running load test against {url} for {args.duration:.0f}s...", file=sys.stderr)
+        elapsed = run_load(replayer, args.mix, args.concurrency, args.duration,
+                           args.rate, args.requests, args.seed)
+
+        report = {
+            'config': {
+                'url': url,
+                'concurrency': args.concurrency,
+                'rate': args.rate,
+                'duration': args.duration,
+                'mix': args.mix,
+                'faiss_dir': args.faiss_dir,
+                'metadata': args.metadata
+            },
+            'catalog': replayer.catalog_info(),
+            'elapsed_seconds': round(elapsed, 2),
+            **stats.summary(elapsed)
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
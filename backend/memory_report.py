@@ -0,0 +1,222 @@
+"""
+Memory accounting for the serving process
+Attributes the API server's memory to its components so an OOM on a small
+instance can be traced to what grew:
+
+- Models: parameter and buffer bytes of each torch module (shared tensors
+  counted once), split by sub-module (e.g. CLIP vision vs text tower)
+- FAISS indices: stored code bytes per category
+- Metadata and ID maps: deep Python object size (sys.getsizeof over the
+  object graph), cached per catalog version
+- Process: RSS and peak RSS from /proc/self/status
+
+Each component can carry a budget (MEMORY_BUDGETS_MB, e.g.
+"siamese_model=700,faiss_indices=64"). Loads are checked against it before
+they happen where the size can be estimated from the files (catalog
+indices and metadata, model checkpoints) and after they happen otherwise. An
+overrun prints a warning, or with MEMORY_BUDGET_ACTION=refuse raises
+MemoryBudgetExceeded so the load doesn't go ahead.
+"""
+
+import os
+import sys
+
+# Actions on a budget overrun
+ACTIONS = ('warn', 'refuse')
+# In-memory size of parsed metadata relative to its JSON file (measured ~2.3x)
+METADATA_OVERHEAD = 3.0
+MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(Exception):
+    """A component would exceed its memory budget"""
+
+
+def parse_budgets(spec):
+    """'siamese_model=700,faiss_indices=64' (MB) -> {'siamese_model': bytes, ...}"""
+    budgets = {}
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        component, _, megabytes = item.partition('=')
+        budgets[component.strip()] = int(float(megabytes) * MB)
+    return budgets
+
+
+def format_bytes(nbytes):
+    """Human-readable size"""
+    if nbytes is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(nbytes) < 1024 or unit == 'GB':
+            return f"{nbytes:.0f} {unit}" if unit == 'B' else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+
+
+class MemoryBudget:
+    """
+    Per-component memory budgets
+
+    Args:
+        budgets: Component -> budget in bytes; components without one are unlimited
+        action: 'warn' or 'refuse'
+    """
+
+    def __init__(self, budgets=None, action='warn'):
+        if action not in ACTIONS:
+            raise ValueError(f"MEMORY_BUDGET_ACTION must be one of {ACTIONS}, got {action!r}")
+        self.budgets = dict(budgets or {})
+        self.action = action
+
+    def limit(self, component):
+        return self.budgets.get(component)
+
+    def check(self, component, nbytes, estimated=False):
+        """
+        Compare a component's size with its budget
+
+        Args:
+            component: Budget key
+            nbytes: Size in bytes (loaded, or estimated before loading)
+            estimated: nbytes is an estimate of a load about to happen
+
+        Returns:
+            True if within budget (or no budget)
+
+        Raises:
+            MemoryBudgetExceeded: Over budget and the action is 'refuse'
+        """
+        limit = self.budgets.get(component)
+        if limit is None or nbytes <= limit:
+            return True
+        message = (f"{component} {'would need' if estimated else 'uses'} ~{format_bytes(nbytes)}, "
+                   f"over its {format_bytes(limit)} budget")
+        if self.action == 'refuse':
+            raise MemoryBudgetExceeded(message)
+        print(f"⚠ {message}")
+        return False
+
+    def check_catalog_files(self, faiss_dir, metadata_path):
+        """
+        Check a catalog load against the faiss_indices and metadata budgets before reading it
+
+        Flat index files hold the vectors as stored, so their size is the index
+        memory; metadata is estimated from the JSON size.
+        """
+        index_bytes = sum(os.path.getsize(os.path.join(faiss_dir, name))
+                          for name in os.listdir(faiss_dir) if name.endswith('.index'))
+        self.check('faiss_indices', index_bytes, estimated=True)
+        self.check('metadata', int(os.path.getsize(metadata_path) * METADATA_OVERHEAD), estimated=True)
+
+
+def tensor_bytes(tensors):
+    """Bytes of torch tensors, counting tensors that share storage once"""
+    seen = set()
+    total = 0
+    for tensor in tensors:
+        key = (tensor.device.type, tensor.data_ptr())
+        if key in seen:
+            continue
+        seen.add(key)
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def module_bytes(module):
+    """Parameter and buffer bytes of a torch module"""
+    return tensor_bytes(list(module.parameters()) + list(module.buffers()))
+
+
+def module_breakdown(module, parts):
+    """
+    Bytes per named part of a module
+
+    Args:
+        module: torch module
+        parts: Dict of part name -> list of attribute names of module (sub-modules or
+               tensors); everything not covered is reported as 'other'
+
+    Returns:
+        Dict of part name -> bytes
+    """
+    breakdown = {}
+    covered = set()
+    for part, attributes in parts.items():
+        tensors = []
+        for attribute in attributes:
+            value = getattr(module, attribute, None)
+            if value is None:
+                continue
+            if hasattr(value, 'parameters'):
+                tensors.extend(list(value.parameters()) + list(value.buffers()))
+            else:
+                tensors.append(value)
+        covered.update(id(tensor) for tensor in tensors)
+        breakdown[part] = tensor_bytes(tensors)
+    rest = [tensor for tensor in list(module.parameters()) + list(module.buffers()) if id(tensor) not in covered]
+    if rest:
+        breakdown['other'] = tensor_bytes(rest)
+    return breakdown
+
+
+def index_bytes(index):
+    """Stored vector bytes of a FAISS index (flat and other code-based indices)"""
+    code_size = getattr(index, 'code_size', None)
+    if code_size is not None:
+        return int(index.ntotal) * int(code_size)
+    return int(index.ntotal) * int(index.d) * 4
+
+
+def deep_sizeof(obj):
+    """Approximate size of a Python object graph (containers, strings, numbers)"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict) or hasattr(item, 'items') and hasattr(item, 'keys'):
+            for key, value in item.items():
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def process_memory():
+    """
+    Resident memory of this process
+
+    Returns:
+        Dict with rss_bytes and peak_rss_bytes (None where unavailable)
+    """
+    memory = {'rss_bytes': None, 'peak_rss_bytes': None}
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    memory['rss_bytes'] = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    memory['peak_rss_bytes'] = int(line.split()[1]) * 1024
+    except OSError:
+        # Not Linux: peak RSS only (kilobytes on Linux, bytes on macOS)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory['peak_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024
+    return memory
+
+
+def print_report(report):
+    """Print a /debug/memory style report as a table"""
+    process = report['process']
+    print("\nMemory by component:")
+    for component, entry in report['components'].items():
+        budget = entry.get('budget_bytes')
+        flag = "  ⚠ over budget" if entry.get('over_budget') else ""
+        print(f"  {component:22s} {format_bytes(entry['bytes']):>10s}"
+              f"{'  (budget ' + format_bytes(budget) + ')' if budget else ''}{flag}")
+    print(f"  {'accounted':22s} {format_bytes(report['accounted_bytes']):>10s}")
+    print(f"  {'process RSS':22s} {format_bytes(process['rss_bytes']):>10s} "
+          f"(peak {format_bytes(process['peak_rss_bytes'])})")
@@ -0,0 +1,233 @@
+"""
+Complete-outfit assembly for the /outfit endpoint
+Picks whole outfits (one item per slot, e.g. top + bottom + outerwear) for a
+query embedding, instead of returning independent per-category lists:
+- Each slot's top-N candidates come from its categories' FAISS indices, and
+  their vectors are reconstructed from the same indices
+- An outfit's cost is the sum of query->item distances plus, weighted, the
+  item->item distances between every pair of slots (squared L2, the metric
+  the siamese indices rank by). The distances between two slots' candidates
+  are one N x N matrix product, computed once per request
+- Slots are filled one at a time with beam search: every partial outfit in
+  the beam is extended by every candidate of the next slot in one vectorized
+  step, and the beam_width cheapest survive
+
+Work grows as slots x beam_width x N rather than N ** slots.
+"""
+
+import numpy as np
+
+# Slot name -> catalog categories an item for that slot can come from
+DEFAULT_SLOTS = {
+    'top': ['Shirts', 'Shirts & Blouses', 'T-shirts & Tops', 'Tops & T-Shirts', 'Polos',
+            'Hoodies & Sweatshirts', 'Cardigans & Sweaters', 'Sweaters & Cardigans'],
+    'bottom': ['Pants', 'Jeans', 'Shorts', 'Skirts'],
+    'outerwear': ['Jackets & Coats', 'Blazers & Vests', 'Suits & Blazers'],
+}
+NUM_OUTFITS = 5
+CANDIDATES_PER_SLOT = 30
+MAX_CANDIDATES_PER_SLOT = 200
+MAX_OUTFITS = 50
+# Beam width as a multiple of the number of outfits requested
+BEAM_FACTOR = 4
+# Weight of item->item distances relative to query->item distances
+COMPATIBILITY_WEIGHT = 1.0
+
+
+def resolve_slots(slots, categories):
+    """
+    Slot -> categories present in the catalog
+
+    Args:
+        slots: None (DEFAULT_SLOTS), a list of DEFAULT_SLOTS names, or a dict of
+               slot name -> list of categories
+        categories: Categories in the current catalog
+
+    Returns:
+        Tuple of (slots dict, skipped slot names with no category in the catalog)
+    """
+    if slots is None:
+        slots = DEFAULT_SLOTS
+    elif isinstance(slots, list):
+        unknown = [slot for slot in slots if slot not in DEFAULT_SLOTS]
+        if unknown:
+            raise ValueError(f"Unknown slots {unknown}; use {sorted(DEFAULT_SLOTS)} or a dict of slot -> categories")
+        slots = {slot: DEFAULT_SLOTS[slot] for slot in slots}
+    elif not isinstance(slots, dict):
+        raise ValueError("slots must be a list of slot names or a dict of slot -> categories")
+
+    available = set(categories)
+    resolved = {}
+    skipped = []
+    for slot, slot_categories in slots.items():
+        present = [category for category in slot_categories if category in available]
+        if present:
+            resolved[slot] = present
+        else:
+            skipped.append(slot)
+    return resolved, skipped
+
+
+def slot_candidates(snapshot, query, categories, n):
+    """
+    Top-n items over several categories for one query vector
+
+    Returns:
+        Tuple of (names, vectors (m, d), distances (m,)) sorted by distance, m <= n
+    """
+    names, vectors, distances = [], [], []
+    for category in categories:
+        rows, category_distances = snapshot.search_rows(category, query[None], n)[0]
+        id_map = snapshot.id_maps[category]
+        names.extend(id_map[row] for row in rows.tolist())
+        vectors.append(snapshot.vectors(category, rows))
+        distances.append(category_distances)
+
+    vectors = np.concatenate(vectors) if vectors else np.zeros((0, len(query)), dtype=np.float32)
+    distances = np.concatenate(distances) if distances else np.zeros(0, dtype=np.float32)
+    order = np.argsort(distances, kind='stable')[:n]
+    return [names[i] for i in order], vectors[order], distances[order]
+
+
+def pairwise_distances(a, b):
+    """Squared L2 distances between the rows of a and b, (len(a), len(b))"""
+    a = a.astype(np.float32, copy=False)
+    b = b.astype(np.float32, copy=False)
+    distances = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(distances, 0.0)
+
+
+def beam_search(query_distances, vectors, item_ids, beam_width, compatibility_weight=COMPATIBILITY_WEIGHT):
+    """
+    Cheapest combinations of one candidate per slot
+
+    Args:
+        query_distances: Per slot, (n_s,) query->candidate distances
+        vectors: Per slot, (n_s, d) candidate vectors
+        item_ids: Per slot, (n_s,) int ids; an item may fill at most one slot
+        beam_width: Partial outfits kept after each slot
+        compatibility_weight: Weight of candidate->candidate distances
+
+    Returns:
+        Tuple of (picks (b, slots) candidate indices, cost, query_cost, compatibility_cost),
+        sorted by cost
+    """
+    num_slots = len(vectors)
+    pair_distances = {
+        (s, t): pairwise_distances(vectors[s], vectors[t])
+        for t in range(num_slots) for s in range(t)
+    }
+
+    picks = np.zeros((1, 0), dtype=np.int64)
+    query_cost = np.zeros(1, dtype=np.float32)
+    compatibility_cost = np.zeros(1, dtype=np.float32)
+
+    for t in range(num_slots):
+        # (beam, n_t): distance from each chosen item to every candidate of slot t
+        step_compatibility = np.zeros((len(picks), len(vectors[t])), dtype=np.float32)
+        invalid = np.zeros(step_compatibility.shape, dtype=bool)
+        for s in range(t):
+            step_compatibility += pair_distances[(s, t)][picks[:, s]]
+            invalid |= item_ids[s][picks[:, s]][:, None] == item_ids[t][None, :]
+
+        step_query = query_cost[:, None] + query_distances[t][None, :]
+        step_pairs = compatibility_cost[:, None] + step_compatibility
+        total = step_query + compatibility_weight * step_pairs
+        total[invalid] = np.inf
+
+        flat = total.ravel()
+        keep = min(beam_width, int(np.isfinite(flat).sum()))
+        if keep == 0:
+            empty = np.zeros(0, dtype=np.float32)
+            return np.zeros((0, num_slots), dtype=np.int64), empty, empty, empty
+        best = np.argpartition(flat, keep - 1)[:keep] if keep < len(flat) else np.arange(len(flat))
+        best = best[np.argsort(flat[best], kind='stable')]
+        beams, candidates = np.divmod(best, total.shape[1])
+
+        picks = np.hstack([picks[beams], candidates[:, None]])
+        query_cost = step_query[beams, candidates]
+        compatibility_cost = step_pairs[beams, candidates]
+
+    cost = query_cost + compatibility_weight * compatibility_cost
+    return picks, cost, query_cost, compatibility_cost
+
+
+def build_outfits(snapshot, query, slots=None, num_outfits=NUM_OUTFITS, candidates_per_slot=CANDIDATES_PER_SLOT,
+                  beam_width=None, compatibility_weight=COMPATIBILITY_WEIGHT, unique_items=True):
+    """
+    Complete outfits for a query embedding
+
+    Args:
+        snapshot: catalog_store.CatalogSnapshot
+        query: float32 query embedding (d,)
+        slots: See resolve_slots
+        num_outfits: Outfits to return
+        candidates_per_slot: Candidates pulled from the indices per slot
+        beam_width: Partial outfits kept per slot (default BEAM_FACTOR x num_outfits)
+        compatibility_weight: Weight of item->item distances
+        unique_items: Use each product in at most one outfit (fewer outfits may come back)
+
+    Returns:
+        Dict with 'outfits' (list of {'items': {slot: (name, distance)}, 'cost',
+        'query_cost', 'compatibility_cost'}), 'slots' (slot -> categories used),
+        'skipped_slots' and 'candidates' (slot -> candidates considered)
+    """
+    query = np.asarray(query, dtype=np.float32).reshape(-1)
+    slots, skipped = resolve_slots(slots, snapshot.faiss_indices.keys())
+    beam_width = beam_width or max(BEAM_FACTOR * num_outfits, 16)
+
+    slot_names, names, vectors, distances = [], [], [], []
+    for slot, categories in slots.items():
+        candidate_names, slot_vectors, slot_distances = slot_candidates(snapshot, query, categories,
+                                                                        candidates_per_slot)
+        if not candidate_names:
+            skipped.append(slot)
+            continue
+        slot_names.append(slot)
+        names.append(candidate_names)
+        vectors.append(slot_vectors)
+        distances.append(slot_distances)
+
+    # One integer id per product, shared across slots, so no product fills two slots
+    product_ids = {}
+    item_ids = [np.array([product_ids.setdefault(name, len(product_ids)) for name in slot_items])
+                for slot_items in names]
+
+    # (picks, cost, query_cost, compatibility_cost) of each outfit
+    found = []
+    if slot_names and unique_items:
+        # The final beam tends to share its best items, so disjoint outfits are
+        # found one after another with the items already used excluded
+        used = []
+        for _ in range(num_outfits):
+            masked = [np.where(np.isin(ids, used), np.inf, slot_distances)
+                      for ids, slot_distances in zip(item_ids, distances)]
+            picks, cost, query_cost, compatibility_cost = beam_search(
+                masked, vectors, item_ids, beam_width, compatibility_weight)
+            if not len(picks):
+                break
+            found.append((picks[0], cost[0], query_cost[0], compatibility_cost[0]))
+            used.extend(int(item_ids[s][index]) for s, index in enumerate(picks[0]))
+    elif slot_names:
+        found = list(zip(*beam_search(distances, vectors, item_ids, beam_width, compatibility_weight)))[:num_outfits]
+
+    found.sort(key=lambda outfit: outfit[1])
+    outfits = [
+        {
+            'items': {
+                slot: (names[s][index], float(distances[s][index]))
+                for s, (slot, index) in enumerate(zip(slot_names, picks.tolist()))
+            },
+            'cost': float(cost),
+            'query_cost': float(query_cost),
+            'compatibility_cost': float(compatibility_cost)
+        }
+        for picks, cost, query_cost, compatibility_cost in found
+    ]
+
+    return {
+        'outfits': outfits,
+        'slots': {slot: slots[slot] for slot in slot_names},
+        'skipped_slots': skipped,
+        'candidates': {slot: len(slot_items) for slot, slot_items in zip(slot_names, names)}
+    }
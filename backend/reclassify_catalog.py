@@ -0,0 +1,161 @@
+"""
+Reclassify catalog products from stored CLIP image features
+The image encoder never runs for images already in the feature store: the
+whole catalog is scored with one matrix multiply against the text prompts
+(or one pass through a trained head), which takes milliseconds. That makes
+trying new prompts or heads interactive.
+
+By default this is a dry run that prints the new style distribution and how
+many labels would change. --write updates style_type and
+classification_confidence for predictions above --min-confidence.
+
+Usage:
+    python reclassify_catalog.py
+    python reclassify_catalog.py --prompts prompts.json
+    python reclassify_catalog.py --head clip_style_head.pth --write
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+
+from catalog_store import CatalogTransaction, catalog_write_lock, load_metadata
+from clothing_classifier import ClothingStyleClassifier
+from feature_store import FEATURES_DIR, FeatureStore, pipeline_compute
+
+# Configuration
+FAISS_DIR = "faiss_indices"
+METADATA_PATH = "product_metadata.json"
+# Only predictions above this confidence replace a product's label
+MIN_CONFIDENCE = 0.6
+
+
+def catalog_images(metadata):
+    """
+    Products that have an image
+
+    Returns:
+        Tuple of (product names, image ids)
+    """
+    names = [name for name, info in metadata.items() if info.get('image')]
+    return names, [metadata[name]['image'] for name in names]
+
+
+def reclassify(classifier, metadata, feature_store, compute_missing=True):
+    """
+    Classify every catalog product from its stored CLIP features
+
+    Args:
+        classifier: ClothingStyleClassifier (zero-shot prompts or trained head)
+        metadata: Product name -> product info
+        feature_store: CLIP FeatureStore for classifier.model_version
+        compute_missing: Run the image encoder for images without stored features;
+                         otherwise those products are skipped
+
+    Returns:
+        Tuple of (classifications, skipped): product name -> (style_type, confidence),
+        and the names of products without features
+    """
+    names, image_ids = catalog_images(metadata)
+    if compute_missing:
+        features, found, _ = feature_store.ensure(image_ids, pipeline_compute(classifier.feature_pipeline()))
+    else:
+        features, found = feature_store.get_many(image_ids)
+
+    kept = [name for name, has_features in zip(names, found) if has_features]
+    skipped = [name for name, has_features in zip(names, found) if not has_features]
+    classifications = dict(zip(kept, classifier.classify_features(features[found]))) if kept else {}
+    return classifications, skipped
+
+
+def apply_classifications(metadata, classifications, min_confidence=MIN_CONFIDENCE):
+    """
+    Write confident predictions into metadata (in place)
+
+    Returns:
+        Dict of style_type -> number of products updated
+    """
+    updated = Counter()
+    for name, (style_type, confidence) in classifications.items():
+        if confidence > min_confidence and name in metadata:
+            metadata[name]['style_type'] = style_type
+            metadata[name]['classification_confidence'] = float(confidence)
+            updated[style_type] += 1
+    return dict(updated)
+
+
+def write_classifications(classifications, min_confidence=MIN_CONFIDENCE,
+                          faiss_dir=FAISS_DIR, metadata_path=METADATA_PATH):
+    """
+    Apply predictions to product_metadata.json under the catalog write lock
+
+    Metadata is re-read under the lock so concurrent ingests are not lost, and
+    published atomically; a running API server picks it up on reload.
+
+    Returns:
+        Dict of style_type -> number of products updated
+    """
+    with catalog_write_lock(faiss_dir):
+        metadata = load_metadata(metadata_path)
+        updated = apply_classifications(metadata, classifications, min_confidence)
+        with CatalogTransaction(faiss_dir) as txn:
+            txn.write_json(metadata_path, metadata, indent=4)
+    return updated
+
+
+def _load_prompts(path, class_names):
+    with open(path, 'r') as f:
+        prompts = json.load(f)
+    if isinstance(prompts, dict):
+        prompts = [prompts[name] for name in class_names]
+    return prompts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassify catalog products from stored CLIP features")
+    parser.add_argument("--head", help="Checkpoint with a trained classifier head")
+    parser.add_argument("--prompts", help="JSON list of prompts (class order) or object of class -> prompt")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE)
+    parser.add_argument("--cached-only", action="store_true",
+                        help="Skip products whose features are not stored instead of computing them")
+    parser.add_argument("--write", action="store_true", help="Update product_metadata.json")
+    parser.add_argument("--metadata", default=METADATA_PATH)
+    parser.add_argument("--faiss-dir", default=FAISS_DIR)
+    parser.add_argument("--feature-dir", default=FEATURES_DIR)
+    args = parser.parse_args()
+
+    classifier = ClothingStyleClassifier(model_path=args.head)
+    if args.prompts:
+        classifier.set_text_prompts(_load_prompts(args.prompts, classifier.class_names))
+
+    metadata = load_metadata(args.metadata)
+    store = FeatureStore('clip', classifier.model_version, root=args.feature_dir)
+
+    start = time.perf_counter()
+    classifications, skipped = reclassify(classifier, metadata, store, compute_missing=not args.cached_only)
+    print(f"✓ Classified {len(classifications)} products in {(time.perf_counter() - start) * 1000:.1f}ms")
+    if skipped:
+        print(f"⚠ {len(skipped)} products have no stored features and were skipped")
+
+    predicted = Counter(style_type for style_type, _ in classifications.values())
+    confident = {name: result for name, result in classifications.items() if result[1] > args.min_confidence}
+    changed = sum(1 for name, (style_type, _) in confident.items()
+                  if metadata[name].get('style_type') != style_type)
+
+    print(f"\n{'Style':14s}{'Current':>9s}{'Predicted':>11s}")
+    current = Counter(metadata[name].get('style_type') for name in classifications)
+    for class_name in classifier.class_names:
+        print(f"{classifier.get_display_name(class_name):14s}{current[class_name]:>9d}{predicted[class_name]:>11d}")
+    print(f"\n{len(confident)} predictions above {args.min_confidence:.2f} confidence, "
+          f"{changed} of them change the current label")
+
+    if args.write:
+        updated = write_classifications(classifications, args.min_confidence, args.faiss_dir, args.metadata)
+        print(f"✓ Updated {sum(updated.values())} products in {args.metadata}: {updated}")
+    else:
+        print("Dry run, use --write to update the catalog")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Background style reclassification jobs for the API server
+Relabels catalog products on a worker thread instead of inside an HTTP request:
+- The catalog is processed in chunks. CLIP features come from the feature
+  store and are only computed (and stored) for images that have none yet
+- Progress and throughput can be polled while the job runs, and the job can
+  be cancelled between chunks
+- With an admission controller, each chunk waits for an inference slot like
+  a request does, so a job doesn't compete with requests for the CPU
+- Each chunk's predictions are appended to reclassify_jobs/<job id>.jsonl as
+  soon as they are made
+- A finished job publishes every label in one atomic metadata write under the
+  catalog write lock, then the server reloads its snapshot
+
+Requests keep reading the current snapshot, which the job never modifies.
+Jobs live in the server process; one runs at a time.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from admission import Rejected
+from feature_store import FEATURES_DIR, FeatureStore, pipeline_compute
+from reclassify_catalog import MIN_CONFIDENCE, catalog_images, write_classifications
+
+JOBS_DIR = "reclassify_jobs"
+# Products classified (and checkpointed) per chunk
+CHUNK_SIZE = 256
+# Finished jobs kept for status queries
+MAX_JOBS_KEPT = 20
+# Admission endpoint for job chunks, and how long a chunk queues before trying again
+ADMISSION_ENDPOINT = 'reclassify'
+SLOT_WAIT_SECONDS = 30.0
+
+ACTIVE_STATES = ('queued', 'running', 'cancelling', 'publishing')
+
+
+class ReclassifyJob:
+    """State of one reclassification job"""
+
+    def __init__(self, total, min_confidence, chunk_size, jobs_dir):
+        self.id = uuid.uuid4().hex[:12]
+        self.state = 'queued'
+        self.total = total
+        self.processed = 0
+        self.classified = 0
+        self.failed = {}
+        self.updated = {}
+        self.min_confidence = min_confidence
+        self.chunk_size = chunk_size
+        self.results_path = os.path.join(jobs_dir, f"{self.id}.jsonl")
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.cancel_requested = threading.Event()
+
+    def status(self):
+        """Status dict for the admin endpoints"""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        throughput = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.processed
+        return {
+            'id': self.id,
+            'state': self.state,
+            'total': self.total,
+            'processed': self.processed,
+            'classified': self.classified,
+            'failed': len(self.failed),
+            'progress': round(self.processed / self.total, 4) if self.total else 1.0,
+            'products_per_second': round(throughput, 1),
+            'eta_seconds': round(remaining / throughput, 1) if throughput and self.state == 'running' else None,
+            'elapsed_seconds': round(elapsed, 2),
+            'updated': self.updated,
+            'min_confidence': self.min_confidence,
+            'results_path': self.results_path,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+
+
+class ReclassifyJobRunner:
+    """
+    Starts, tracks and cancels reclassification jobs
+
+    Args:
+        catalog: catalog_store.CatalogManager serving the API
+        faiss_dir: Catalog directory (holds the write lock and transaction journal)
+        metadata_path: product_metadata.json to publish to
+        feature_dir: Feature store root
+        jobs_dir: Directory for per-job result files
+        admission: Optional admission.AdmissionController each chunk takes a slot from
+    """
+
+    def __init__(self, catalog, faiss_dir, metadata_path, feature_dir=FEATURES_DIR, jobs_dir=JOBS_DIR,
+                 admission=None):
+        self.catalog = catalog
+        self.faiss_dir = faiss_dir
+        self.metadata_path = metadata_path
+        self.feature_dir = feature_dir
+        self.jobs_dir = jobs_dir
+        self.admission = admission
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, classifier, min_confidence=MIN_CONFIDENCE, chunk_size=CHUNK_SIZE):
+        """
+        Start a job over the current catalog snapshot
+
+        Returns:
+            Tuple of (job, started); started is False and job is the running
+            job if one is already active
+        """
+        snapshot = self.catalog.current()
+        if snapshot is None:
+            raise RuntimeError("Catalog is not loaded")
+
+        with self._lock:
+            for job in self._jobs.values():
+                if job.state in ACTIVE_STATES:
+                    return job, False
+
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            names, image_ids = catalog_images(snapshot.metadata)
+            job = ReclassifyJob(len(names), min_confidence, max(1, chunk_size), self.jobs_dir)
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_JOBS_KEPT:
+                self._jobs.popitem(last=False)
+
+        threading.Thread(target=self._run, args=(job, classifier, names, image_ids),
+                         name=f"reclassify-{job.id}", daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """All kept jobs, newest first"""
+        return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop after its current chunk
+
+        The check and the state change happen under the runner's lock, the same
+        lock the job takes to start publishing, so a job is either cancelled or
+        publishes, never both.
+
+        Returns:
+            False if the job is unknown or already past the point of cancelling
+            (publishing or finished)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in ('queued', 'running'):
+                return False
+            job.state = 'cancelling'
+            job.cancel_requested.set()
+            return True
+
+    def _transition(self, job, state):
+        """Move a job to state unless it was cancelled; returns False if it was"""
+        with self._lock:
+            if job.cancel_requested.is_set():
+                return False
+            job.state = state
+            return True
+
+    def _acquire_slot(self, job):
+        """
+        Wait for an inference slot for the next chunk
+
+        Returns:
+            False if the job was cancelled while waiting
+        """
+        while not job.cancel_requested.is_set():
+            try:
+                self.admission.acquire(ADMISSION_ENDPOINT, time.perf_counter() + SLOT_WAIT_SECONDS,
+                                       job.cancel_requested.is_set)
+                return True
+            except Rejected as e:
+                # Busy: back off and queue again, unless cancelled meanwhile
+                job.cancel_requested.wait(min(e.retry_after, SLOT_WAIT_SECONDS))
+        return False
+
+    def _classify_chunk(self, store, compute, classifier, chunk_ids):
+        """Features (computing missing ones) and predictions for one chunk, under a slot if admitted"""
+        start = time.perf_counter()
+        try:
+            features, found, failed = store.ensure(chunk_ids, compute)
+            predictions = classifier.classify_features(features[found]) if found.any() else []
+            return found, failed, predictions
+        finally:
+            if self.admission is not None:
+                self.admission.release(ADMISSION_ENDPOINT, time.perf_counter() - start)
+
+    def _run(self, job, classifier, names, image_ids):
+        job.started_at = time.time()
+        try:
+            if not self._transition(job, 'running'):
+                job.state = 'cancelled'
+                return
+
+            store = FeatureStore('clip', classifier.model_version, root=self.feature_dir)
+            compute = pipeline_compute(classifier.feature_pipeline())
+            classifications = {}
+
+            with open(job.results_path, 'a') as results_file:
+                for start in range(0, len(names), job.chunk_size):
+                    if job.cancel_requested.is_set() or \
+                            (self.admission is not None and not self._acquire_slot(job)):
+                        job.state = 'cancelled'
+                        print(f"Reclassify job {job.id} cancelled after {job.processed}/{job.total} products")
+                        return
+
+                    chunk_names = names[start:start + job.chunk_size]
+                    chunk_ids = image_ids[start:start + job.chunk_size]
+                    found, failed, predictions = self._classify_chunk(store, compute, classifier, chunk_ids)
+
+                    kept = [name for name, has_features in zip(chunk_names, found) if has_features]
+                    for name, (style_type, confidence) in zip(kept, predictions):
+                        classifications[name] = (style_type, confidence)
+                        results_file.write(json.dumps({
+                            'product': name, 'style_type': style_type, 'confidence': round(confidence, 4)
+                        }) + '\n')
+                    results_file.flush()
+                    os.fsync(results_file.fileno())
+
+                    for name, image_id, has_features in zip(chunk_names, chunk_ids, found):
+                        if not has_features:
+                            job.failed[name] = failed.get(image_id, "no features")
+                    job.classified += len(kept)
+                    job.processed += len(chunk_names)
+
+            # Past this point the job can't be cancelled
+            if not self._transition(job, 'publishing'):
+                job.state = 'cancelled'
+                print(f"Reclassify job {job.id} cancelled after {job.processed}/{job.total} products")
+                return
+            job.updated = write_classifications(classifications, job.min_confidence,
+                                                self.faiss_dir, self.metadata_path)
+            self.catalog.reload_async()
+            job.state = 'completed'
+            print(f"✓ Reclassify job {job.id}: {job.classified} classified, "
+                  f"{sum(job.updated.values())} updated, {len(job.failed)} failed")
+
+        except Exception as e:
+            job.state = 'failed'
+            job.error = str(e)
+            print(f"Reclassify job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
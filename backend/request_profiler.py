@@ -0,0 +1,135 @@
+"""
+On-demand request profiling and slow-request capture
+- A configurable fraction of requests (or any request with the debug header)
+  is profiled with cProfile and gets a Server-Timing breakdown
+- Requests slower than a threshold are kept in a bounded ring buffer with
+  their stage timings and parameters, for dumping from an admin endpoint
+"""
+
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+PROFILE_HEADER = "X-Debug-Profile"
+# Number of functions kept from each cProfile run
+PROFILE_TOP_FUNCTIONS = 25
+
+
+def format_server_timing(timings, total_seconds):
+    """
+    Build a Server-Timing header value
+
+    Args:
+        timings: List of (stage, seconds)
+        total_seconds: Whole request duration
+
+    Returns:
+        e.g. 'decode_image;dur=3.1, clip_forward;dur=41.7, total;dur=52.0'
+    """
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the slow-request buffer"""
+
+    def __init__(self, sample_rate=0.0, slow_threshold=1.0, buffer_size=100):
+        """
+        Args:
+            sample_rate: Fraction of requests to profile (0.0 - 1.0)
+            slow_threshold: Requests slower than this (seconds) are captured
+            buffer_size: Number of captured requests to keep
+        """
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self._buffer = deque(maxlen=buffer_size)
+        self._buffer_lock = threading.Lock()
+        # Only one cProfile can be active per interpreter
+        self._cprofile_lock = threading.Lock()
+
+    def should_profile(self, headers):
+        """True if the request asked for profiling or was sampled"""
+        if headers.get(PROFILE_HEADER):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """
+        Start a cProfile run for the current request
+
+        Returns:
+            The running profile, or None if another request is being profiled
+        """
+        if not self._cprofile_lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already active
+            self._cprofile_lock.release()
+            return None
+        return profile
+
+    def stop(self, profile):
+        """
+        Stop a cProfile run
+
+        Returns:
+            Text report of the top functions by cumulative time
+        """
+        profile.disable()
+        self._cprofile_lock.release()
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        return stream.getvalue()
+
+    def record(self, endpoint, duration, timings, params=None, profile_report=None):
+        """
+        Keep the request in the ring buffer if it was slow or profiled
+
+        Returns:
+            True if the request was captured
+        """
+        slow = duration >= self.slow_threshold
+        if not slow and profile_report is None:
+            return False
+
+        entry = {
+            'timestamp': time.time(),
+            'endpoint': endpoint,
+            'duration_ms': round(duration * 1000, 2),
+            'slow': slow,
+            'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in timings},
+            'params': params or {}
+        }
+        if profile_report is not None:
+            entry['profile'] = profile_report
+
+        with self._buffer_lock:
+            self._buffer.append(entry)
+        return True
+
+    def dump(self, clear=False):
+        """Return captured requests, newest first"""
+        with self._buffer_lock:
+            entries = list(self._buffer)
+            if clear:
+                self._buffer.clear()
+        entries.reverse()
+        return entries
+
+    def status(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'slow_threshold_ms': self.slow_threshold * 1000,
+            'buffer_size': self._buffer.maxlen,
+            'captured': len(self._buffer)
+        }
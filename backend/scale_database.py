@@ -1,6 +1,9 @@
 """
 Script to scale up the outfit recommendation database for testing
 This will duplicate products and FAISS indices with variations
+
+For catalogs beyond a few times the real size, use generate_synthetic_catalog.py,
+which streams a seeded catalog to a separate directory instead.
 """
 
 import json
@@ -9,6 +12,8 @@ import numpy as np
 import os
 from shutil import copy2
 
+from catalog_store import stored_vectors
+
 # Configuration
 SCALE_FACTOR = 5  # Multiply database size by this factor
 FAISS_DIR = "faiss_indices"
@@ -88,11 +93,12 @@ def scale_faiss_indices(scale_factor):
 
             # Load original index
             index = faiss.read_index(index_path)
-            original_vectors = index.reconstruct_n(0, index.ntotal)
+            rows, original_vectors = stored_vectors(index)
 
-            # Load original IDs
+            # Load original IDs, in the index's storage order
             with open(ids_path, 'r') as f:
-                original_ids = json.load(f)
+                ids = json.load(f)
+            original_ids = [ids[row] for row in rows.tolist()]
 
             original_count = len(original_ids)
             print(f"    Original vectors: {original_count}")
@@ -192,7 +198,10 @@ if __name__ == "__main__":
         print("Original files will be backed up with '_backup' suffix")
         print("\nTo restore original data, run: python scale_database.py --restore")
 
-        response = input("\nProceed with scaling? (yes/no): ").lower().strip()
+        if "--yes" in sys.argv:
+            response = 'yes'
+        else:
+            response = input("\nProceed with scaling? (yes/no): ").lower().strip()
 
         if response == 'yes':
             try:
@@ -0,0 +1,328 @@
+"""
+Precomputed item-to-item neighbour graph for the /similar endpoint
+"More like this" for a catalog product needs no image upload or model
+forward: every product's nearest neighbours are computed offline from the
+vectors already stored in the category indices, and the server answers from
+a table lookup.
+
+- Vectors are reconstructed from the FAISS indices (deleted rows skipped) and
+  ordered by category, so a category is one contiguous column range
+- Neighbours are found with blocked matrix products (squared L2, the metric
+  the indices rank by): each block of queries is one (block x N) product,
+  blocks run on a thread pool (numpy releases the GIL in BLAS and sorting)
+- Each product keeps its top-k in the same category and top-k across all
+  other categories
+
+On disk (written to temporary files and renamed, products.json last):
+
+    similarity_graph/neighbors.npy   int32   (count, 2, k) product rows, -1 = none
+    similarity_graph/distances.npy   float16 (count, 2, k)
+    similarity_graph/products.json   names, categories, k, catalog version and fingerprint
+
+Axis 1 is 0 = same category, 1 = other categories. The arrays are memory-mapped
+when served, so a lookup is two row reads. The graph isn't updated by catalog
+writes: the server compares its catalog version with the snapshot it serves
+and reports it as stale until it is rebuilt.
+
+Usage:
+    python similarity_graph.py build
+    python similarity_graph.py build --k 30 --workers 8
+    python similarity_graph.py info
+    python similarity_graph.py query "RELAXED JEANS"
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from catalog_store import CatalogManager, catalog_fingerprint
+from outfit_builder import pairwise_distances
+
+GRAPH_DIR = "similarity_graph"
+FAISS_DIR = "faiss_indices"
+METADATA_PATH = "product_metadata.json"
+NUM_NEIGHBORS = 20
+# Query rows per matrix product; a block holds block_size x catalog size float32 distances
+BLOCK_SIZE = 256
+BUILD_WORKERS = min(4, os.cpu_count() or 1)
+
+SAME, OTHER = 0, 1
+KINDS = {'same': SAME, 'other': OTHER}
+
+
+def fingerprint_hash(faiss_dir, metadata_path):
+    """Short hash of catalog_fingerprint, stored with the graph to detect a stale one"""
+    entries = [(os.path.basename(path), size, mtime) for path, size, mtime in catalog_fingerprint(faiss_dir, metadata_path)]
+    return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()[:16]
+
+
+def collect_vectors(snapshot):
+    """
+    Live catalog vectors, grouped by category
+
+    Args:
+        snapshot: catalog_store.CatalogSnapshot
+
+    Returns:
+        Tuple of (names, category names, category id per product, vectors (count, d),
+        category -> (start, end) row range)
+    """
+    names, category_ids, blocks, ranges = [], [], [], {}
+    seen = set()
+    categories = snapshot.categories
+    for category_id, category in enumerate(categories):
+        id_map = snapshot.id_maps[category]
+        # A product indexed under two categories is kept under the first
+        rows = [row for row in snapshot.live_rows(category).tolist()
+                if row < len(id_map) and id_map[row] not in seen]
+        seen.update(id_map[row] for row in rows)
+
+        ranges[category] = (len(names), len(names) + len(rows))
+        names.extend(id_map[row] for row in rows)
+        category_ids.extend([category_id] * len(rows))
+        blocks.append(snapshot.vectors(category, rows))
+
+    dimension = next(iter(snapshot.faiss_indices.values())).d if snapshot.faiss_indices else 0
+    vectors = np.concatenate(blocks) if blocks else np.zeros((0, dimension), dtype=np.float32)
+    return names, categories, np.array(category_ids, dtype=np.int32), vectors, ranges
+
+
+def top_k(distances, k):
+    """
+    Column indices and values of the k smallest entries per row, ascending
+
+    Rows with fewer than k finite entries are padded with -1 / inf.
+    """
+    rows, columns = distances.shape
+    indices = np.full((rows, k), -1, dtype=np.int32)
+    values = np.full((rows, k), np.inf, dtype=np.float32)
+    keep = min(k, columns)
+    if keep == 0:
+        return indices, values
+
+    if keep < columns:
+        best = np.argpartition(distances, keep - 1, axis=1)[:, :keep]
+    else:
+        best = np.broadcast_to(np.arange(columns), (rows, columns))
+    best_values = np.take_along_axis(distances, best, axis=1)
+    order = np.argsort(best_values, axis=1, kind='stable')
+    best = np.take_along_axis(best, order, axis=1)
+    best_values = np.take_along_axis(best_values, order, axis=1)
+
+    finite = np.isfinite(best_values)
+    indices[:, :keep] = np.where(finite, best, -1)
+    values[:, :keep] = np.where(finite, best_values, np.inf)
+    return indices, values
+
+
+def _neighbour_block(vectors, start, end, category_start, category_end, k, neighbors, distances):
+    """Fill rows start:end (all in one category) of the output arrays"""
+    block = pairwise_distances(vectors[start:end], vectors)
+
+    # Same category: the category's column range, minus the product itself
+    same = block[:, category_start:category_end]
+    same[np.arange(end - start), np.arange(start, end) - category_start] = np.inf
+    indices, values = top_k(same, k)
+    neighbors[start:end, SAME] = np.where(indices >= 0, indices + category_start, -1)
+    distances[start:end, SAME] = values
+
+    # Other categories: everything else
+    block[:, category_start:category_end] = np.inf
+    indices, values = top_k(block, k)
+    neighbors[start:end, OTHER] = indices
+    distances[start:end, OTHER] = values
+
+
+def compute_neighbours(vectors, ranges, k=NUM_NEIGHBORS, block_size=BLOCK_SIZE, workers=BUILD_WORKERS):
+    """
+    Top-k same-category and other-category neighbours of every row
+
+    Args:
+        vectors: (count, d) float32, rows grouped by category
+        ranges: Category -> (start, end) row range
+        k: Neighbours per kind
+        block_size: Query rows per matrix product
+        workers: Threads computing blocks
+
+    Returns:
+        Tuple of (neighbors int32 (count, 2, k), distances float32 (count, 2, k))
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count = len(vectors)
+    neighbors = np.full((count, 2, k), -1, dtype=np.int32)
+    distances = np.full((count, 2, k), np.inf, dtype=np.float32)
+
+    # Blocks never cross a category boundary
+    blocks = [
+        (start, min(start + block_size, category_end), category_start, category_end)
+        for category_start, category_end in ranges.values()
+        for start in range(category_start, category_end, block_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_neighbour_block, vectors, *block, k, neighbors, distances) for block in blocks]
+        for future in futures:
+            future.result()
+    return neighbors, distances
+
+
+def _save_atomic(path, save):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        save(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def build_graph(faiss_dir=FAISS_DIR, metadata_path=METADATA_PATH, output_dir=GRAPH_DIR, k=NUM_NEIGHBORS,
+                block_size=BLOCK_SIZE, workers=BUILD_WORKERS):
+    """
+    Build and write the neighbour graph for the catalog on disk
+
+    Returns:
+        Number of products in the graph
+    """
+    fingerprint = fingerprint_hash(faiss_dir, metadata_path)
+    snapshot = CatalogManager(faiss_dir, metadata_path).load()
+    names, categories, category_ids, vectors, ranges = collect_vectors(snapshot)
+    print(f"Computing {k} + {k} neighbours for {len(names)} products "
+          f"({len(categories)} categories, blocks of {block_size}, {workers} workers)...")
+
+    start = time.perf_counter()
+    neighbors, distances = compute_neighbours(vectors, ranges, k, block_size, workers)
+    print(f"✓ Neighbours computed in {time.perf_counter() - start:.1f}s")
+
+    os.makedirs(output_dir, exist_ok=True)
+    _save_atomic(os.path.join(output_dir, "neighbors.npy"), lambda f: np.save(f, neighbors))
+    _save_atomic(os.path.join(output_dir, "distances.npy"), lambda f: np.save(f, distances.astype(np.float16)))
+    products = {
+        'count': len(names),
+        'k': k,
+        'names': names,
+        'categories': categories,
+        'category_ids': category_ids.tolist(),
+        'catalog_fingerprint': fingerprint,
+        'catalog_version': snapshot.version,
+        'built_at': time.time()
+    }
+    _save_atomic(os.path.join(output_dir, "products.json"),
+                 lambda f: f.write(json.dumps(products).encode('utf-8')))
+    return len(names)
+
+
+class SimilarityGraph:
+    """Read-only, memory-mapped neighbour graph"""
+
+    def __init__(self, directory=GRAPH_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "products.json"), 'r') as f:
+            products = json.load(f)
+        self.names = products['names']
+        self.categories = products['categories']
+        self.category_ids = products['category_ids']
+        self.k = products['k']
+        self.catalog_fingerprint = products['catalog_fingerprint']
+        self.catalog_version = products.get('catalog_version')
+        self.built_at = products['built_at']
+        self.neighbors = np.load(os.path.join(directory, "neighbors.npy"), mmap_mode='r')
+        self.distances = np.load(os.path.join(directory, "distances.npy"), mmap_mode='r')
+        if self.neighbors.shape != (products['count'], 2, self.k) or self.distances.shape != self.neighbors.shape:
+            raise ValueError(f"{directory} arrays don't match products.json; rebuild the graph")
+        self._rows = {name: row for row, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, product_name):
+        return product_name in self._rows
+
+    def is_stale(self, snapshot):
+        """True if the graph was built from a different catalog than snapshot (or an unknown one)"""
+        return snapshot is None or self.catalog_version != snapshot.version
+
+    def status(self, snapshot):
+        """Summary for /health"""
+        return {
+            'products': len(self),
+            'k': self.k,
+            'built_at': self.built_at,
+            'catalog_version': self.catalog_version,
+            'stale': self.is_stale(snapshot)
+        }
+
+    def neighbours(self, product_name, kind='same', k=None):
+        """
+        Precomputed neighbours of a product
+
+        Args:
+            product_name: Product in the graph
+            kind: 'same' (same category) or 'other' (other categories)
+            k: Neighbours to return (at most the k the graph was built with)
+
+        Returns:
+            List of (name, category, distance), nearest first
+        """
+        row = self._rows[product_name]
+        columns = slice(0, k)
+        neighbors = self.neighbors[row, KINDS[kind], columns].tolist()
+        distances = self.distances[row, KINDS[kind], columns].tolist()
+        return [
+            (self.names[neighbor], self.categories[self.category_ids[neighbor]], distance)
+            for neighbor, distance in zip(neighbors, distances)
+            if neighbor >= 0
+        ]
+
+
+def open_graph(directory=GRAPH_DIR):
+    """SimilarityGraph at directory, or None when it hasn't been built"""
+    if not os.path.exists(os.path.join(directory, "products.json")):
+        print(f"⚠ No similarity graph at {directory}; run: python similarity_graph.py build")
+        return None
+    graph = SimilarityGraph(directory)
+    print(f"✓ Loaded similarity graph: {len(graph)} products, {graph.k} neighbours per kind")
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precomputed item-to-item neighbour graph")
+    parser.add_argument("command", choices=["build", "info", "query"])
+    parser.add_argument("product", nargs="?", help="Product name (query)")
+    parser.add_argument("--graph-dir", default=GRAPH_DIR)
+    parser.add_argument("--faiss-dir", default=FAISS_DIR)
+    parser.add_argument("--metadata", default=METADATA_PATH)
+    parser.add_argument("--k", type=int, default=NUM_NEIGHBORS, help="Neighbours per kind")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_graph(args.faiss_dir, args.metadata, args.graph_dir, args.k, args.block_size, args.workers)
+        size = sum(os.path.getsize(os.path.join(args.graph_dir, f)) for f in os.listdir(args.graph_dir))
+        print(f"✓ Wrote {args.graph_dir} ({count} products, {size / 1e6:.1f} MB) "
+              f"in {time.perf_counter() - start:.1f}s")
+        return
+
+    graph = SimilarityGraph(args.graph_dir)
+    if args.command == "info":
+        stale = graph.catalog_fingerprint != fingerprint_hash(args.faiss_dir, args.metadata)
+        print(f"{args.graph_dir}: {len(graph)} products, {len(graph.categories)} categories, "
+              f"k={graph.k}, built {time.ctime(graph.built_at)}"
+              f"{' (catalog changed since, rebuild)' if stale else ''}")
+        return
+
+    if args.product not in graph:
+        parser.error(f"{args.product!r} is not in the graph")
+    for kind in KINDS:
+        print(f"\n{kind.upper()} CATEGORY:" if kind == 'same' else f"\n{kind.upper()} CATEGORIES:")
+        for name, category, distance in graph.neighbours(args.product, kind):
+            print(f"  {distance:7.3f}  {name} ({category})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Evaluation for the clothing style classifiers
+Scores a labeled set in one pass and reports, per labeler:
+- confusion matrix
+- per-class precision / recall / F1 and support, accuracy, macro F1, balanced accuracy
+- expected calibration error (for labelers that give confidences)
+
+Labelers compared side by side on the catalog's style_type labels:
+- zero_shot: CLIP ViT-B/32 against the text prompts
+- head:      a trained classifier head (train_classifier.py / sweep_style_head.py)
+- rules:     improved_classify rules on name, category and description
+             (the catalog labels were produced by these rules, so this measures
+             drift between the rules and the stored labels)
+
+Image features are read from the feature store, or computed in large batches
+by the prefetching embedding pipeline and cached for the next run.
+
+Usage:
+    python style_evaluation.py
+    python style_evaluation.py --head clip_style_head.pth --output style_report.json
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from clothing_classifier import ClothingStyleClassifier
+from feature_store import FEATURES_DIR, FeatureStore
+import style_rules
+
+CLASS_NAMES = ['casual', 'uniform', 'semi_uniform']
+DISPLAY_NAMES = ['Casual', 'Formal', 'Semi-formal']
+LABEL_MAPPING = {name: i for i, name in enumerate(CLASS_NAMES)}
+METADATA_PATH = "product_metadata.json"
+CALIBRATION_BINS = 15
+
+
+def confusion_matrix(labels, predicted, num_classes=len(CLASS_NAMES)):
+    """Counts with rows = true class, columns = predicted class"""
+    labels = np.asarray(labels, dtype=np.int64)
+    predicted = np.asarray(predicted, dtype=np.int64)
+    return np.bincount(labels * num_classes + predicted,
+                       minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def class_accuracies(confusion):
+    """Per-class accuracy (= recall) in %, 0 for classes without samples"""
+    support = confusion.sum(axis=1)
+    return 100. * np.diag(confusion) / np.maximum(support, 1)
+
+
+def expected_calibration_error(confidences, correct, bins=CALIBRATION_BINS):
+    """
+    Expected calibration error over equal-width confidence bins
+
+    Returns:
+        Tuple of (ece, reliability) where reliability lists per non-empty bin
+        its confidence range, sample count, mean confidence and accuracy
+    """
+    confidences = np.asarray(confidences, dtype=np.float64)
+    correct = np.asarray(correct, dtype=np.float64)
+    which = np.clip((confidences * bins).astype(np.int64), 0, bins - 1)
+
+    counts = np.bincount(which, minlength=bins)
+    confidence_sums = np.bincount(which, weights=confidences, minlength=bins)
+    correct_sums = np.bincount(which, weights=correct, minlength=bins)
+
+    filled = counts > 0
+    mean_confidence = confidence_sums[filled] / counts[filled]
+    accuracy = correct_sums[filled] / counts[filled]
+    ece = float(np.sum(counts[filled] / max(len(confidences), 1) * np.abs(accuracy - mean_confidence)))
+
+    reliability = [
+        {
+            'range': [round(b / bins, 3), round((b + 1) / bins, 3)],
+            'count': int(count),
+            'confidence': round(float(conf), 4),
+            'accuracy': round(float(acc), 4)
+        }
+        for b, count, conf, acc in zip(np.flatnonzero(filled), counts[filled], mean_confidence, accuracy)
+    ]
+    return ece, reliability
+
+
+def evaluate_predictions(labels, predicted, confidences=None):
+    """
+    Full report for one labeler
+
+    Args:
+        labels: True class indices
+        predicted: Predicted class indices
+        confidences: Optional confidence of each prediction (0-1)
+
+    Returns:
+        JSON-serializable dict
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    predicted = np.asarray(predicted, dtype=np.int64)
+    confusion = confusion_matrix(labels, predicted)
+
+    true_positives = np.diag(confusion).astype(np.float64)
+    predicted_totals = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    precision = true_positives / np.maximum(predicted_totals, 1)
+    recall = true_positives / np.maximum(support, 1)
+    f1 = np.where(precision + recall > 0, 2 * precision * recall / np.maximum(precision + recall, 1e-12), 0.0)
+
+    report = {
+        'samples': int(len(labels)),
+        'accuracy': round(100. * float(true_positives.sum()) / max(len(labels), 1), 2),
+        'balanced_accuracy': round(100. * float(recall[support > 0].mean()) if support.any() else 0.0, 2),
+        'macro_f1': round(100. * float(f1[support > 0].mean()) if support.any() else 0.0, 2),
+        'per_class': {
+            name: {
+                'precision': round(100. * float(p), 2),
+                'recall': round(100. * float(r), 2),
+                'f1': round(100. * float(f), 2),
+                'support': int(s)
+            }
+            for name, p, r, f, s in zip(CLASS_NAMES, precision, recall, f1, support)
+        },
+        'confusion_matrix': confusion.tolist()
+    }
+
+    if confidences is not None:
+        ece, reliability = expected_calibration_error(confidences, predicted == labels)
+        report['ece'] = round(ece, 4)
+        report['mean_confidence'] = round(float(np.mean(confidences)), 4)
+        report['reliability'] = reliability
+
+    return report
+
+
+def format_report(name, report):
+    """Human-readable report for one labeler"""
+    lines = [
+        f"\n{name}",
+        "-" * 60,
+        f"Accuracy {report['accuracy']:.2f}% | Balanced {report['balanced_accuracy']:.2f}% | "
+        f"Macro F1 {report['macro_f1']:.2f}%" + (f" | ECE {report['ece']:.4f}" if 'ece' in report else ""),
+        f"{'':14s}{'Precision':>10s}{'Recall':>10s}{'F1':>10s}{'Support':>10s}",
+    ]
+    for display, class_name in zip(DISPLAY_NAMES, CLASS_NAMES):
+        stats = report['per_class'][class_name]
+        lines.append(f"{display:14s}{stats['precision']:>9.1f}%{stats['recall']:>9.1f}%"
+                     f"{stats['f1']:>9.1f}%{stats['support']:>10d}")
+    lines.append("Confusion (rows = true, cols = predicted):")
+    for display, row in zip(DISPLAY_NAMES, report['confusion_matrix']):
+        lines.append(f"  {display:12s}" + "".join(f"{count:>8d}" for count in row))
+    return "\n".join(lines)
+
+
+def labeled_catalog(metadata_path=METADATA_PATH):
+    """
+    Catalog products with a style label and an image
+
+    Returns:
+        List of (product name, product info, label index)
+    """
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    return [
+        (name, info, LABEL_MAPPING[info['style_type']])
+        for name, info in metadata.items()
+        if info.get('image') and info.get('style_type') in LABEL_MAPPING
+    ]
+
+
+def rule_predictions(products):
+    """improved_classify labels for (name, info, label) products -> class indices"""
+    labels = style_rules.classify_many(
+        [(name, info.get('category', ''), info.get('desc', '')) for name, info, _ in products], 'improved')
+    return np.array([LABEL_MAPPING[label] for label in labels], dtype=np.int64)
+
+
+def model_predictions(classifier, features):
+    """
+    Predicted classes and confidences for raw CLIP features
+
+    Returns:
+        Tuple of (predicted, confidences) arrays
+    """
+    probabilities = classifier.feature_probabilities(features)
+    return probabilities.argmax(axis=-1), probabilities.max(axis=-1)
+
+
+def evaluate_catalog(metadata_path=METADATA_PATH, head_path=None, feature_store=None, limit=None,
+                     classifier=None):
+    """
+    Evaluate zero-shot, head (if given) and rule labels on the labeled catalog
+
+    Args:
+        head_path: Checkpoint with a trained classifier head
+        feature_store: Optional CLIP FeatureStore (model version must match the classifier)
+        limit: Only evaluate the first N products
+        classifier: Zero-shot ClothingStyleClassifier to reuse (loaded if None)
+
+    Returns:
+        Dict of labeler -> report
+    """
+    products = labeled_catalog(metadata_path)[:limit]
+    labels = np.array([label for _, _, label in products], dtype=np.int64)
+    image_ids = [info['image'] for _, info, _ in products]
+
+    classifier = classifier or ClothingStyleClassifier()
+    features, found, failed = classifier.image_features(image_ids, feature_store)
+    if failed:
+        print(f"⚠ {len(failed)} images could not be loaded and are left out of the image-based reports")
+
+    reports = {}
+    predicted, confidences = model_predictions(classifier, features[found])
+    reports['zero_shot'] = evaluate_predictions(labels[found], predicted, confidences)
+
+    if head_path:
+        # Only the head is needed: heads are trained on frozen CLIP, so it scores the
+        # features computed above (any CLIP weights in the checkpoint are the same ones)
+        head = classifier.load_head(head_path)
+        if head is None:
+            raise ValueError(f"{head_path} has no classifier head")
+        zero_shot_head = classifier.classifier_head
+        classifier.classifier_head = head
+        try:
+            predicted, confidences = model_predictions(classifier, features[found])
+        finally:
+            classifier.classifier_head = zero_shot_head
+        reports['head'] = evaluate_predictions(labels[found], predicted, confidences)
+
+    reports['rules'] = evaluate_predictions(labels, rule_predictions(products))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate style classifiers on the labeled catalog")
+    parser.add_argument("--metadata", default=METADATA_PATH)
+    parser.add_argument("--head", help="Checkpoint with a trained classifier head")
+    parser.add_argument("--feature-dir", default=FEATURES_DIR)
+    parser.add_argument("--no-feature-store", action="store_true", help="Compute features without caching")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    classifier = ClothingStyleClassifier()
+    store = None
+    if not args.no_feature_store:
+        store = FeatureStore('clip', classifier.model_version, root=args.feature_dir)
+
+    reports = evaluate_catalog(args.metadata, args.head, store, args.limit, classifier)
+
+    print("=" * 60)
+    print("STYLE CLASSIFIER EVALUATION")
+    print("=" * 60)
+    print(f"\n{'Labeler':12s}{'Samples':>9s}{'Accuracy':>10s}{'Balanced':>10s}{'Macro F1':>10s}{'ECE':>8s}")
+    for name, report in reports.items():
+        ece = f"{report['ece']:.4f}" if 'ece' in report else "-"
+        print(f"{name:12s}{report['samples']:>9d}{report['accuracy']:>9.2f}%"
+              f"{report['balanced_accuracy']:>9.2f}%{report['macro_f1']:>9.2f}%{ece:>8s}")
+    for name, report in reports.items():
+        print(format_report(name, report))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
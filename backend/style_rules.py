@@ -0,0 +1,145 @@
+"""
+Parallel catalog labeling with the keyword style rules
+Runs the original rule functions, improved_classify.classify_clothing_item
+('improved') and classify_products.classify_product ('basic'), over a whole
+catalog in chunks across worker processes. The rules themselves are unchanged,
+so the labels are identical by construction; `verify` checks that anyway and
+measures the speedup over a plain serial loop.
+
+Usage:
+    python style_rules.py verify
+    python style_rules.py verify --ruleset basic --workers 4
+    python style_rules.py classify --write
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import classify_products as basic
+import improved_classify as improved
+
+METADATA_PATH = "product_metadata.json"
+# Products per parallel chunk; catalogs smaller than two chunks run inline
+CHUNK_SIZE = 5000
+NUM_WORKERS = os.cpu_count() or 1
+
+RULESETS = {
+    'improved': improved.classify_clothing_item,
+    'basic': basic.classify_product,
+}
+
+
+def catalog_products(metadata):
+    """(name, category, description) tuples in metadata order"""
+    return [(name, info.get('category', ''), info.get('desc', '')) for name, info in metadata.items()]
+
+
+def classify_many(products, ruleset='improved'):
+    """Labels for (name, category, description) tuples, in order"""
+    classify = RULESETS[ruleset]
+    return [classify(name, category, description) for name, category, description in products]
+
+
+def _classify_chunk(task):
+    ruleset, products = task
+    return classify_many(products, ruleset)
+
+
+def classify_catalog(metadata, ruleset='improved', workers=NUM_WORKERS, chunk_size=CHUNK_SIZE):
+    """
+    Label every product in a catalog
+
+    Args:
+        metadata: Product name -> product info ('category', 'desc')
+        ruleset: 'improved' or 'basic'
+        workers: Worker processes for catalogs of two or more chunks
+
+    Returns:
+        Dict of product name -> style_type
+    """
+    products = catalog_products(metadata)
+    if workers <= 1 or len(products) < 2 * chunk_size:
+        labels = classify_many(products, ruleset)
+    else:
+        chunks = [(ruleset, products[start:start + chunk_size])
+                  for start in range(0, len(products), chunk_size)]
+        # spawn, as in sweep_style_head.py: callers may already have torch threads running
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            labels = [label for chunk_labels in pool.map(_classify_chunk, chunks) for label in chunk_labels]
+    return dict(zip(metadata, labels))
+
+
+def verify(metadata, ruleset='improved', workers=NUM_WORKERS):
+    """
+    Compare classify_catalog with a serial loop over the original function
+
+    Returns:
+        Tuple of (mismatches as (name, expected, got), serial seconds, parallel seconds)
+    """
+    products = catalog_products(metadata)
+
+    start = time.perf_counter()
+    expected = classify_many(products, ruleset)
+    serial_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    labels = classify_catalog(metadata, ruleset, workers)
+    parallel_seconds = time.perf_counter() - start
+
+    mismatches = [
+        (name, e, labels.get(name))
+        for (name, _, _), e in zip(products, expected)
+        if labels.get(name) != e
+    ]
+    return mismatches, serial_seconds, parallel_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel keyword style rules")
+    parser.add_argument("command", choices=["verify", "classify"])
+    parser.add_argument("--ruleset", choices=sorted(RULESETS), default="improved")
+    parser.add_argument("--metadata", default=METADATA_PATH)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--write", action="store_true", help="Store the labels as style_type (classify)")
+    args = parser.parse_args()
+
+    with open(args.metadata, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    if args.command == "verify":
+        mismatches, serial_seconds, parallel_seconds = verify(metadata, args.ruleset, args.workers)
+        print(f"{len(metadata)} products, ruleset '{args.ruleset}', {args.workers} workers "
+              f"({os.cpu_count()} CPUs)")
+        print(f"  serial:    {serial_seconds * 1000:8.1f}ms")
+        print(f"  parallel:  {parallel_seconds * 1000:8.1f}ms ({serial_seconds / parallel_seconds:.2f}x)")
+        if len(metadata) < 2 * CHUNK_SIZE or args.workers <= 1:
+            print(f"  (under {2 * CHUNK_SIZE} products or one worker: runs inline)")
+        if mismatches:
+            print(f"⚠ {len(mismatches)} labels differ:")
+            for name, e, got in mismatches[:20]:
+                print(f"  {name}: expected {e}, got {got}")
+            raise SystemExit(1)
+        print("✓ All labels identical")
+        return
+
+    start = time.perf_counter()
+    labels = classify_catalog(metadata, args.ruleset, args.workers)
+    print(f"✓ Classified {len(labels)} products in {time.perf_counter() - start:.2f}s")
+    counts = Counter(labels.values())
+    for style_type in ('casual', 'uniform', 'semi_uniform'):
+        print(f"  {style_type:13s}{counts[style_type]:>8d}")
+
+    if args.write:
+        for name, style_type in labels.items():
+            metadata[name]['style_type'] = style_type
+        with open(args.metadata, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=4)
+        print(f"Saved to {args.metadata}")
+
+
+if __name__ == "__main__":
+    main()
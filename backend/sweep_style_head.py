@@ -0,0 +1,279 @@
+"""
+Hyperparameter sweep for the clothing style head
+Trains many head configurations on cached CLIP features across stratified
+k folds, in parallel worker processes, and writes a ranked leaderboard.
+The best configuration is retrained and saved as a checkpoint that
+ClothingStyleClassifier(model_path=...) loads.
+
+Swept per configuration:
+- learning rate and weight decay
+- class balancing: WeightedRandomSampler-style sampling, class-weighted loss, or none
+- head initialization: random, or from the zero-shot text prompt embeddings
+
+Usage:
+    python sweep_style_head.py --folds 5 --workers 4
+    python sweep_style_head.py --lr 1e-3,5e-4,1e-4 --weight-decay 0,1e-4 --init random,prompt
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from clothing_classifier import ClothingStyleClassifier
+from feature_store import FEATURES_DIR, FeatureStore
+from train_classifier import (
+    AUGMENT_VIEWS, augmented_train_features, labeled_images, train_head_on_features
+)
+
+# Configuration
+METADATA_PATH = "product_metadata.json"
+LEADERBOARD_PATH = "sweep_leaderboard.json"
+SAVE_PATH = "clip_style_head.pth"
+CLASS_NAMES = ['casual', 'formal', 'semi_formal']
+
+# Worker process state, loaded once per process by _init_worker
+_features = None
+_labels = None
+_prompt_state = None
+
+
+def prompt_head_state(text_features, image_features):
+    """
+    Head weights that reproduce zero-shot prompt scoring
+
+    Zero-shot logits are 100 * cos(image, prompt); for raw image features of
+    typical norm this is approximately a linear layer with the normalized
+    prompt embeddings scaled by 100 / mean image-feature norm.
+    """
+    text_features = text_features.float().cpu()
+    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+    scale = 100.0 / float(np.linalg.norm(image_features, axis=-1).mean())
+    return {'weight': text_features * scale, 'bias': torch.zeros(len(text_features))}
+
+
+def _init_worker(features_path, labels_path, prompt_state):
+    global _features, _labels, _prompt_state
+    # One thread per worker, the parallelism comes from the processes
+    torch.set_num_threads(1)
+    _features = torch.from_numpy(np.load(features_path))
+    _labels = torch.from_numpy(np.load(labels_path))
+    _prompt_state = prompt_state
+
+
+def _run_trial(task):
+    config, fold, train_rows, val_rows, epochs, batch_size, seed = task
+    torch.manual_seed(seed + fold)
+
+    start = time.perf_counter()
+    _, val_acc, class_acc, history = train_head_on_features(
+        _features[train_rows], _labels[train_rows],
+        _features[val_rows, 0], _labels[val_rows],
+        num_epochs=epochs,
+        batch_size=batch_size,
+        learning_rate=config['learning_rate'],
+        weight_decay=config['weight_decay'],
+        balance=config['balance'],
+        init_state=_prompt_state if config['init'] == 'prompt' else None,
+        verbose=False
+    )
+    return {
+        'config': config,
+        'fold': fold,
+        'val_acc': val_acc,
+        'class_accuracies': class_acc,
+        'best_epoch': max(history, key=lambda h: h['val_acc'])['epoch'],
+        'seconds': time.perf_counter() - start
+    }
+
+
+def build_grid(learning_rates, weight_decays, balances, inits):
+    return [
+        {'learning_rate': lr, 'weight_decay': wd, 'balance': balance, 'init': init}
+        for lr, wd, balance, init in itertools.product(learning_rates, weight_decays, balances, inits)
+    ]
+
+
+def summarize(trials):
+    """
+    Aggregate fold results per configuration
+
+    Returns:
+        Leaderboard entries, ranked by mean balanced accuracy (mean of per-class accuracies)
+    """
+    by_config = {}
+    for trial in trials:
+        by_config.setdefault(json.dumps(trial['config'], sort_keys=True), []).append(trial)
+
+    leaderboard = []
+    for key, results in by_config.items():
+        accuracies = np.array([r['val_acc'] for r in results])
+        class_acc = np.array([r['class_accuracies'] for r in results])
+        balanced = class_acc.mean(axis=1)
+        leaderboard.append({
+            'config': json.loads(key),
+            'balanced_acc': round(float(balanced.mean()), 2),
+            'balanced_acc_std': round(float(balanced.std()), 2),
+            'val_acc': round(float(accuracies.mean()), 2),
+            'val_acc_std': round(float(accuracies.std()), 2),
+            'class_accuracies': {
+                name: round(float(acc), 2) for name, acc in zip(CLASS_NAMES, class_acc.mean(axis=0))
+            },
+            'best_epoch': int(np.median([r['best_epoch'] for r in results])),
+            'folds': len(results)
+        })
+
+    leaderboard.sort(key=lambda entry: (entry['balanced_acc'], entry['val_acc']), reverse=True)
+    for rank, entry in enumerate(leaderboard, 1):
+        entry['rank'] = rank
+    return leaderboard
+
+
+def train_best(config, features, labels, prompt_state, epochs, batch_size, seed, model_version):
+    """
+    Retrain the winning configuration on all labeled images
+
+    A stratified 10% holdout picks the best epoch's weights.
+
+    Returns:
+        Checkpoint dict in the format ClothingStyleClassifier loads
+    """
+    rows = np.arange(len(labels))
+    train_rows, holdout_rows = train_test_split(rows, test_size=0.1, stratify=labels, random_state=seed)
+    torch.manual_seed(seed)
+
+    features = torch.from_numpy(features)
+    labels = torch.from_numpy(labels)
+    head_state, val_acc, class_acc, _ = train_head_on_features(
+        features[train_rows], labels[train_rows], features[holdout_rows, 0], labels[holdout_rows],
+        num_epochs=epochs,
+        batch_size=batch_size,
+        learning_rate=config['learning_rate'],
+        weight_decay=config['weight_decay'],
+        balance=config['balance'],
+        init_state=prompt_state if config['init'] == 'prompt' else None,
+        verbose=False
+    )
+    return {
+        'classifier_state_dict': head_state,
+        'val_acc': val_acc,
+        'class_accuracies': dict(zip(CLASS_NAMES, class_acc)),
+        'config': config,
+        'feature_model_version': model_version
+    }
+
+
+def print_leaderboard(leaderboard, top=10):
+    print(f"\n{'Rank':<5} {'Balanced':>9} {'Acc':>7} {'Casual':>7} {'Formal':>7} {'Semi':>7}  Config")
+    for entry in leaderboard[:top]:
+        acc = entry['class_accuracies']
+        config = entry['config']
+        print(f"{entry['rank']:<5} {entry['balanced_acc']:>8.2f}% {entry['val_acc']:>6.2f}% "
+              f"{acc['casual']:>6.1f}% {acc['formal']:>6.1f}% {acc['semi_formal']:>6.1f}%  "
+              f"lr={config['learning_rate']:g} wd={config['weight_decay']:g} "
+              f"balance={config['balance']} init={config['init']}")
+
+
+def _floats(value):
+    return [float(v) for v in value.split(',')]
+
+
+def _names(value):
+    return [v.strip() for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep style head configurations over k folds")
+    parser.add_argument("--lr", type=_floats, default=[1e-3, 5e-4, 1e-4])
+    parser.add_argument("--weight-decay", type=_floats, default=[0.0, 1e-4])
+    parser.add_argument("--balance", type=_names, default=['sampler', 'class_weights'])
+    parser.add_argument("--init", type=_names, default=['random', 'prompt'])
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--augment-views", type=int, default=AUGMENT_VIEWS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--metadata", default=METADATA_PATH)
+    parser.add_argument("--feature-dir", default=FEATURES_DIR)
+    parser.add_argument("--leaderboard", default=LEADERBOARD_PATH)
+    parser.add_argument("--save-path", default=SAVE_PATH)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("STYLE HEAD SWEEP")
+    print("=" * 60)
+
+    # Zero-shot classifier: provides CLIP, its preprocess and the prompt embeddings
+    classifier = ClothingStyleClassifier()
+    image_paths, labels = labeled_images(args.metadata)
+    print(f"Found {len(image_paths)} labeled images")
+
+    store = FeatureStore('clip', classifier.model_version, root=args.feature_dir)
+    augmented_store = FeatureStore('clip_augmented', classifier.model_version, dimension=512, root=args.feature_dir)
+    features, found = augmented_train_features(
+        store, augmented_store, classifier.model, classifier.preprocess, classifier.device,
+        image_paths, args.augment_views, args.batch_size
+    )
+    features = features[found]
+    labels = np.array(labels, dtype=np.int64)[found]
+    prompt_state = prompt_head_state(classifier.text_features, features[:, 0])
+
+    grid = build_grid(args.lr, args.weight_decay, args.balance, args.init)
+    folds = list(StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed)
+                 .split(np.zeros(len(labels)), labels))
+    tasks = [
+        (config, fold, train_rows, val_rows, args.epochs, args.batch_size, args.seed)
+        for config in grid
+        for fold, (train_rows, val_rows) in enumerate(folds)
+    ]
+    print(f"\nTraining {len(grid)} configurations x {args.folds} folds = {len(tasks)} heads "
+          f"on {args.workers} workers...")
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        features_path = os.path.join(tmp_dir, "features.npy")
+        labels_path = os.path.join(tmp_dir, "labels.npy")
+        np.save(features_path, features)
+        np.save(labels_path, labels)
+
+        # Spawned, not forked: this process has already run torch, and forked children
+        # can deadlock in its OpenMP/MKL thread pools. Workers load everything in _init_worker
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(features_path, labels_path, prompt_state),
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            trials = list(pool.map(_run_trial, tasks))
+    print(f"✓ Sweep finished in {time.perf_counter() - start:.1f}s")
+
+    leaderboard = summarize(trials)
+    print_leaderboard(leaderboard)
+
+    with open(args.leaderboard, 'w') as f:
+        json.dump({
+            'folds': args.folds,
+            'epochs': args.epochs,
+            'augment_views': args.augment_views,
+            'images': int(len(labels)),
+            'feature_model_version': classifier.model_version,
+            'leaderboard': leaderboard
+        }, f, indent=2)
+    print(f"\nLeaderboard saved to {args.leaderboard}")
+
+    best = leaderboard[0]
+    checkpoint = train_best(best['config'], features, labels, prompt_state, args.epochs,
+                            args.batch_size, args.seed, classifier.model_version)
+    torch.save(checkpoint, args.save_path)
+    print(f"Best head (holdout acc {checkpoint['val_acc']:.2f}%) saved to {args.save_path}")
+    print(f"Use it with: ClothingStyleClassifier(model_path='{args.save_path}')")
+
+
+if __name__ == "__main__":
+    main()
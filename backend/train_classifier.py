@@ -6,7 +6,7 @@ Trains on GPU for casual, formal, and semi-formal classification
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader, WeightedRandomSampler
+from torch.utils.data import Dataset, DataLoader, TensorDataset, WeightedRandomSampler
 import clip
 from PIL import Image
 import json
@@ -14,34 +14,54 @@ import os
 import numpy as np
 from tqdm import tqdm
 import random
+import time
 from collections import Counter
 import torchvision.transforms as transforms
 
+from embedding_jobs import model_version
+from embedding_pipeline import clip_pipeline, load_rgb_image
+from feature_store import FEATURES_DIR, FeatureStore, pipeline_compute
+from image_pack import open_pack
+from style_evaluation import (
+    CLASS_NAMES, class_accuracies, confusion_matrix, evaluate_predictions, format_report
+)
+
+
+# Number of augmented views cached per training image in cached-feature mode
+AUGMENT_VIEWS = 4
+
+
+def build_augment_transform():
+    """Random augmentation applied to training images before CLIP preprocessing"""
+    return transforms.Compose([
+        transforms.RandomHorizontalFlip(p=0.5),
+        transforms.RandomRotation(degrees=15),
+        transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2),
+        transforms.RandomResizedCrop(224, scale=(0.8, 1.0)),
+    ])
+
 
 class ClothingStyleDataset(Dataset):
     """Dataset for clothing style classification"""
 
-    def __init__(self, image_paths, labels, preprocess, augment=False):
+    def __init__(self, image_paths, labels, preprocess, augment=False, load_image=load_rgb_image):
         """
         Args:
             image_paths: List of image file paths
             labels: List of labels (0=casual, 1=uniform/formal, 2=semi_uniform)
             preprocess: CLIP preprocessing function
             augment: Whether to apply data augmentation
+            load_image: Callable path -> RGB PIL image (e.g. ImagePack.load_image)
         """
         self.image_paths = image_paths
         self.labels = labels
         self.preprocess = preprocess
         self.augment = augment
+        self.load_image = load_image
 
         # Data augmentation transforms
         if augment:
-            self.augment_transform = transforms.Compose([
-                transforms.RandomHorizontalFlip(p=0.5),
-                transforms.RandomRotation(degrees=15),
-                transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2),
-                transforms.RandomResizedCrop(224, scale=(0.8, 1.0)),
-            ])
+            self.augment_transform = build_augment_transform()
 
     def __len__(self):
         return len(self.image_paths)
@@ -52,7 +72,7 @@ class ClothingStyleDataset(Dataset):
 
         try:
             # Load image
-            image = Image.open(image_path).convert('RGB')
+            image = self.load_image(image_path)
 
             # Apply augmentation if enabled
             if self.augment:
@@ -69,14 +89,13 @@ class ClothingStyleDataset(Dataset):
             return self.preprocess(blank_image), label
 
 
-def prepare_dataset(metadata_path='product_metadata.json'):
+def labeled_images(metadata_path='product_metadata.json'):
     """
-    Prepare training, validation, and test datasets
+    All catalog images with a style label
 
     Returns:
-        Tuple of (train_data, val_data, test_data, class_counts)
+        Tuple of (image_paths, labels) with labels 0=casual, 1=uniform/formal, 2=semi_uniform
     """
-    print("Loading product metadata...")
     with open(metadata_path, 'r') as f:
         products = json.load(f)
 
@@ -101,6 +120,19 @@ def prepare_dataset(metadata_path='product_metadata.json'):
                 image_paths.append(image_path)
                 labels.append(label_mapping[style_type])
 
+    return image_paths, labels
+
+
+def prepare_dataset(metadata_path='product_metadata.json'):
+    """
+    Prepare training, validation, and test datasets
+
+    Returns:
+        Tuple of (train_data, val_data, test_data, class_counts)
+    """
+    print("Loading product metadata...")
+    image_paths, labels = labeled_images(metadata_path)
+
     print(f"Found {len(image_paths)} valid images")
 
     # Count class distribution
@@ -166,7 +198,25 @@ def get_weighted_sampler(labels, class_counts):
     return sampler
 
 
-def train_model(num_epochs=10, batch_size=32, learning_rate=1e-5, save_path='clip_style_classifier.pth'):
+def feature_dataset(store, compute, image_paths, labels):
+    """
+    Frozen CLIP features for un-augmented images, read from the feature store
+
+    Images that can't be loaded are left out.
+
+    Returns:
+        TensorDataset of (features, labels)
+    """
+    features, found, failed = store.ensure(image_paths, compute)
+    for path, error in failed.items():
+        print(f"Error loading {path}: {error}")
+
+    labels = torch.tensor(labels)[torch.from_numpy(found)]
+    return TensorDataset(torch.from_numpy(features[found]), labels)
+
+
+def train_model(num_epochs=10, batch_size=32, learning_rate=1e-5, save_path='clip_style_classifier.pth',
+                feature_dir=FEATURES_DIR, image_pack=None):
     """
     Train CLIP model for clothing style classification
 
@@ -175,6 +225,8 @@ def train_model(num_epochs=10, batch_size=32, learning_rate=1e-5, save_path='cli
         batch_size: Batch size for training
         learning_rate: Learning rate
         save_path: Path to save best model
+        feature_dir: Feature store holding CLIP features for validation/test images
+        image_pack: Optional image_pack file to read images from instead of decoding JPEGs
     """
     # Set device
     device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -192,9 +244,17 @@ def train_model(num_epochs=10, batch_size=32, learning_rate=1e-5, save_path='cli
     (train_images, train_labels), (val_images, val_labels), (test_images, test_labels), class_counts = prepare_dataset()
 
     # Create datasets
-    train_dataset = ClothingStyleDataset(train_images, train_labels, preprocess, augment=True)
-    val_dataset = ClothingStyleDataset(val_images, val_labels, preprocess, augment=False)
-    test_dataset = ClothingStyleDataset(test_images, test_labels, preprocess, augment=False)
+    # CLIP is frozen and val/test images aren't augmented, so their features are
+    # computed once (or read from the feature store) instead of every epoch
+    pack = open_pack(image_pack)
+    load_image = pack.load_image if pack is not None else load_rgb_image
+    # Augmentations crop and rotate the full image, not the pack's center crop
+    load_original = pack.load_original if pack is not None else load_rgb_image
+    train_dataset = ClothingStyleDataset(train_images, train_labels, preprocess, augment=True, load_image=load_original)
+    store = FeatureStore('clip', model_version(None, base_model="ViT-B-32"), root=feature_dir)
+    compute = pipeline_compute(clip_pipeline(model, preprocess, device, batch_size=batch_size, load_image=load_image))
+    val_dataset = feature_dataset(store, compute, val_images, val_labels)
+    test_dataset = feature_dataset(store, compute, test_images, test_labels)
 
     # Create weighted sampler for balanced training
     train_sampler = get_weighted_sampler(train_labels, class_counts)
@@ -282,39 +342,13 @@ def train_model(num_epochs=10, batch_size=32, learning_rate=1e-5, save_path='cli
 
         # Validation phase
         classifier_head.eval()
-        val_correct = 0
-        val_total = 0
-        class_correct = [0, 0, 0]
-        class_total = [0, 0, 0]
-
-        with torch.no_grad():
-            for images, labels in tqdm(val_loader, desc=f"Epoch {epoch+1}/{num_epochs} [Val]  "):
-                images = images.to(device)
-                labels = labels.to(device)
-
-                # Get CLIP features and classify
-                image_features = model.encode_image(images)
-                image_features = image_features.float()
-                outputs = classifier_head(image_features)
-
-                _, predicted = outputs.max(1)
-                val_total += labels.size(0)
-                val_correct += predicted.eq(labels).sum().item()
-
-                # Per-class accuracy
-                for i in range(len(labels)):
-                    label = labels[i].item()
-                    class_total[label] += 1
-                    if predicted[i] == labels[i]:
-                        class_correct[label] += 1
-
-        val_acc = 100. * val_correct / val_total
+        val_report = evaluate_head(classifier_head, val_loader, device,
+                                   desc=f"Epoch {epoch+1}/{num_epochs} [Val]  ")
+        val_acc = val_report['accuracy']
         val_accuracies.append(val_acc)
 
         # Per-class accuracies
-        casual_acc = 100. * class_correct[0] / class_total[0] if class_total[0] > 0 else 0
-        formal_acc = 100. * class_correct[1] / class_total[1] if class_total[1] > 0 else 0
-        semi_acc = 100. * class_correct[2] / class_total[2] if class_total[2] > 0 else 0
+        casual_acc, formal_acc, semi_acc = [val_report['per_class'][name]['recall'] for name in CLASS_NAMES]
 
         print(f"\nEpoch {epoch+1}/{num_epochs}")
         print(f"  Train Loss: {avg_train_loss:.4f} | Train Acc: {train_acc:.2f}%")
@@ -351,45 +385,258 @@ def train_model(num_epochs=10, batch_size=32, learning_rate=1e-5, save_path='cli
     print(f"{'='*60}\n")
 
     classifier_head.eval()
-    test_correct = 0
-    test_total = 0
-    class_correct = [0, 0, 0]
-    class_total = [0, 0, 0]
+    test_report = evaluate_head(classifier_head, test_loader, device, desc="Testing")
+    print(format_report("Test (last epoch head)", test_report))
+    print(f"\nBest validation accuracy: {best_val_acc:.2f}%")
+    print(f"Model saved to: {save_path}")
+
+
+def augmented_train_features(store, augmented_store, model, preprocess, device, image_paths,
+                             views=AUGMENT_VIEWS, batch_size=64, load_image=load_rgb_image, load_original=None):
+    """
+    CLIP features for several views of each training image, computed once and cached
+
+    View 0 is the plain image (shared with the 'clip' feature store); views
+    1..views-1 are random augmentations, stored as '<image>#view<k>'.
+
+    Args:
+        load_image: Callable path -> RGB PIL image (e.g. ImagePack.load_image)
+        load_original: Callable path -> full-size RGB PIL image the augmentations start
+                       from (e.g. ImagePack.load_original); defaults to load_image. The
+                       augmented views are the same whichever source the plain view uses,
+                       so they share one cache
+
+    Returns:
+        Tuple of (features, found): float32 array (len(image_paths), views, 512)
+        and a bool mask of images whose views could all be computed
+    """
+    augment = build_augment_transform()
+    load_original = load_original or load_image
+
+    def load_view(view_id):
+        path = view_id.rsplit('#view', 1)[0]
+        return augment(load_original(path))
+
+    plain_compute = pipeline_compute(
+        clip_pipeline(model, preprocess, device, batch_size=batch_size, load_image=load_image))
+    augmented_compute = pipeline_compute(
+        clip_pipeline(model, preprocess, device, batch_size=batch_size, load_image=load_view))
+
+    features = np.zeros((len(image_paths), views, 512), dtype='float32')
+    plain, found, _ = store.ensure(image_paths, plain_compute)
+    features[:, 0] = plain
+    for view in range(1, views):
+        view_ids = [f"{path}#view{view}" for path in image_paths]
+        vectors, view_found, _ = augmented_store.ensure(view_ids, augmented_compute)
+        features[:, view] = vectors
+        found &= view_found
+    return features, found
+
+
+def per_class_accuracy(predicted, labels):
+    """Overall and per-class accuracy (%) from prediction and label tensors"""
+    confusion = confusion_matrix(labels.cpu().numpy(), predicted.cpu().numpy())
+    return 100. * float(np.trace(confusion)) / max(int(confusion.sum()), 1), class_accuracies(confusion).tolist()
+
 
+def evaluate_head(classifier_head, loader, device, desc="Evaluating"):
+    """
+    Evaluate a head over a loader of (features, labels) batches
+
+    Returns:
+        style_evaluation report (accuracy, per-class precision/recall/F1, confusion, ECE)
+    """
+    predicted = []
+    confidences = []
+    all_labels = []
     with torch.no_grad():
-        for images, labels in tqdm(test_loader, desc="Testing"):
-            images = images.to(device)
-            labels = labels.to(device)
+        for image_features, labels in tqdm(loader, desc=desc):
+            probabilities = classifier_head(image_features.to(device)).softmax(dim=-1)
+            confidence, prediction = probabilities.max(dim=-1)
+            predicted.append(prediction.cpu())
+            confidences.append(confidence.cpu())
+            all_labels.append(labels)
+    return evaluate_predictions(torch.cat(all_labels).numpy(), torch.cat(predicted).numpy(),
+                                torch.cat(confidences).numpy())
+
+
+def train_head_on_features(train_features, train_labels, val_features, val_labels, num_epochs=10,
+                           batch_size=64, learning_rate=5e-4, device="cpu", weight_decay=0.0,
+                           balance='sampler', init_state=None, verbose=True):
+    """
+    Train the linear style head directly on cached CLIP feature tensors
 
-            image_features = model.encode_image(images)
-            image_features = image_features.float()
-            outputs = classifier_head(image_features)
+    Args:
+        train_features: float tensor (n, views, 512) - each epoch samples one view per draw
+        train_labels: long tensor (n,)
+        val_features: float tensor (m, 512)
+        val_labels: long tensor (m,)
+        weight_decay: Adam weight decay
+        balance: 'sampler' (inverse-frequency sampling, like get_weighted_sampler),
+                 'class_weights' (inverse-frequency loss weights) or 'none'
+        init_state: Optional head state_dict to start from (e.g. prompt-initialized)
+        verbose: Print a line per epoch
 
-            _, predicted = outputs.max(1)
-            test_total += labels.size(0)
-            test_correct += predicted.eq(labels).sum().item()
-
-            for i in range(len(labels)):
-                label = labels[i].item()
-                class_total[label] += 1
-                if predicted[i] == labels[i]:
-                    class_correct[label] += 1
-
-    test_acc = 100. * test_correct / test_total
-    casual_acc = 100. * class_correct[0] / class_total[0] if class_total[0] > 0 else 0
-    formal_acc = 100. * class_correct[1] / class_total[1] if class_total[1] > 0 else 0
-    semi_acc = 100. * class_correct[2] / class_total[2] if class_total[2] > 0 else 0
-
-    print(f"\nTest Accuracy: {test_acc:.2f}%")
-    print(f"Per-class accuracy:")
-    print(f"  Casual:      {casual_acc:.2f}%")
-    print(f"  Formal:      {formal_acc:.2f}%")
-    print(f"  Semi-formal: {semi_acc:.2f}%")
+    Returns:
+        Tuple of (best_head_state, best_val_acc, best_class_accuracies, history)
+    """
+    n, views, feature_dim = train_features.shape
+    train_features = train_features.to(device)
+    train_labels = train_labels.to(device)
+    val_features = val_features.to(device)
+    val_labels = val_labels.to(device)
+
+    classifier_head = nn.Linear(feature_dim, 3).to(device)
+    if init_state is not None:
+        classifier_head.load_state_dict(init_state)
+    optimizer = optim.Adam(classifier_head.parameters(), lr=learning_rate, weight_decay=weight_decay)
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='max', factor=0.5, patience=2)
+
+    # Inverse-frequency class weights, applied by sampling or in the loss
+    class_counts = torch.bincount(train_labels, minlength=3).float()
+    class_weights = n / class_counts.clamp(min=1)
+    sample_weights = class_weights[train_labels]
+    if balance == 'class_weights':
+        criterion = nn.CrossEntropyLoss(weight=class_weights / class_weights.sum() * 3)
+    else:
+        criterion = nn.CrossEntropyLoss()
+
+    best_val_acc = 0.0
+    best_state = None
+    best_class_acc = [0.0, 0.0, 0.0]
+    history = []
+
+    for epoch in range(num_epochs):
+        classifier_head.train()
+        if balance == 'sampler':
+            draws = torch.multinomial(sample_weights, n, replacement=True)
+        else:
+            draws = torch.randperm(n, device=device)
+        draw_views = torch.randint(0, views, (n,), device=device)
+
+        train_loss = 0.0
+        train_correct = 0
+        for start in range(0, n, batch_size):
+            rows = draws[start:start + batch_size]
+            features = train_features[rows, draw_views[start:start + batch_size]]
+            labels = train_labels[rows]
+
+            outputs = classifier_head(features)
+            loss = criterion(outputs, labels)
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            train_loss += loss.item() * len(rows)
+            train_correct += outputs.argmax(1).eq(labels).sum().item()
+
+        classifier_head.eval()
+        with torch.no_grad():
+            val_acc, class_acc = per_class_accuracy(classifier_head(val_features).argmax(1), val_labels)
+        scheduler.step(val_acc)
+
+        history.append({
+            'epoch': epoch + 1,
+            'train_loss': train_loss / n,
+            'train_acc': 100. * train_correct / n,
+            'val_acc': val_acc
+        })
+        if verbose:
+            print(f"Epoch {epoch+1}/{num_epochs}  loss {train_loss / n:.4f}  "
+                  f"train {100. * train_correct / n:.2f}%  val {val_acc:.2f}%  "
+                  f"(casual {class_acc[0]:.1f}% | formal {class_acc[1]:.1f}% | semi-formal {class_acc[2]:.1f}%)")
+
+        if val_acc > best_val_acc or best_state is None:
+            best_val_acc = val_acc
+            best_class_acc = class_acc
+            best_state = {k: v.detach().cpu().clone() for k, v in classifier_head.state_dict().items()}
+
+    return best_state, best_val_acc, best_class_acc, history
+
+
+def train_model_cached(num_epochs=10, batch_size=64, learning_rate=5e-4, save_path='clip_style_classifier.pth',
+                       feature_dir=FEATURES_DIR, augment_views=AUGMENT_VIEWS, image_pack=None):
+    """
+    Train the style head from cached CLIP features
+
+    CLIP is frozen, so features are extracted once (plus augment_views - 1
+    augmented views per training image), cached in the feature store and
+    reused by every epoch and every later run.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"\nUsing device: {device}")
+
+    print("\nLoading CLIP model...")
+    model, preprocess = clip.load("ViT-B/32", device=device)
+    model.eval()
+
+    (train_images, train_labels), (val_images, val_labels), (test_images, test_labels), _ = prepare_dataset()
+
+    pack = open_pack(image_pack)
+    load_image = pack.load_image if pack is not None else load_rgb_image
+    load_original = pack.load_original if pack is not None else load_rgb_image
+    version = model_version(None, base_model="ViT-B-32")
+    store = FeatureStore('clip', version, root=feature_dir)
+    augmented_store = FeatureStore('clip_augmented', version, dimension=512, root=feature_dir)
+    compute = pipeline_compute(clip_pipeline(model, preprocess, device, batch_size=batch_size, load_image=load_image))
+
+    print(f"\nExtracting features ({augment_views} views per training image)...")
+    train_features, found = augmented_train_features(store, augmented_store, model, preprocess, device,
+                                                     train_images, augment_views, batch_size, load_image,
+                                                     load_original)
+    train_x = torch.from_numpy(train_features[found])
+    train_y = torch.tensor(train_labels)[torch.from_numpy(found)]
+    val_x, val_y = feature_dataset(store, compute, val_images, val_labels).tensors
+    test_x, test_y = feature_dataset(store, compute, test_images, test_labels).tensors
+
+    print(f"\n{'='*60}")
+    print(f"Training head for {num_epochs} epochs on cached features")
+    print(f"{'='*60}\n")
+    start = time.perf_counter()
+    head_state, best_val_acc, class_acc, history = train_head_on_features(
+        train_x, train_y, val_x, val_y, num_epochs, batch_size, learning_rate, device
+    )
+    print(f"\nTrained in {time.perf_counter() - start:.1f}s")
+
+    classifier_head = nn.Linear(512, 3)
+    classifier_head.load_state_dict(head_state)
+    classifier_head.eval()
+    with torch.no_grad():
+        probabilities = classifier_head(test_x).softmax(dim=-1)
+    confidences, predicted = probabilities.max(dim=-1)
+    test_report = evaluate_predictions(test_y.numpy(), predicted.numpy(), confidences.numpy())
+
+    # CLIP is frozen, so only the head is saved; ClothingStyleClassifier pairs it with stock CLIP
+    torch.save({
+        'epoch': len(history) - 1,
+        'classifier_state_dict': head_state,
+        'val_acc': best_val_acc,
+        'class_accuracies': {
+            'casual': class_acc[0],
+            'formal': class_acc[1],
+            'semi_formal': class_acc[2]
+        }
+    }, save_path)
+
+    print(format_report("Test (best validation head)", test_report))
     print(f"\nBest validation accuracy: {best_val_acc:.2f}%")
     print(f"Model saved to: {save_path}")
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the clothing style head on frozen CLIP")
+    parser.add_argument("--cached-features", action="store_true",
+                        help="Extract CLIP features once and train the head from cached tensors")
+    parser.add_argument("--augment-views", type=int, default=AUGMENT_VIEWS,
+                        help="Views cached per training image (1 = no augmentation)")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--save-path", default='clip_style_classifier_simple.pth')
+    parser.add_argument("--image-pack", help="Read images from this image_pack.py file instead of decoding JPEGs")
+    args = parser.parse_args()
+
     # Set random seeds for reproducibility
     random.seed(42)
     np.random.seed(42)
@@ -397,10 +644,21 @@ if __name__ == "__main__":
     if torch.cuda.is_available():
         torch.cuda.manual_seed_all(42)
 
-    # Train the model with simple approach - frozen CLIP, no class weights
-    train_model(
-        num_epochs=10,  # Shorter training since we're only training classifier head
-        batch_size=64,
-        learning_rate=5e-4,  # Higher LR for faster convergence with frozen features
-        save_path='clip_style_classifier_simple.pth'
-    )
+    if args.cached_features:
+        train_model_cached(
+            num_epochs=args.epochs,
+            batch_size=64,
+            learning_rate=5e-4,
+            save_path=args.save_path,
+            augment_views=args.augment_views,
+            image_pack=args.image_pack
+        )
+    else:
+        # Train the model with simple approach - frozen CLIP, no class weights
+        train_model(
+            num_epochs=args.epochs,  # Shorter training since we're only training classifier head
+            batch_size=64,
+            learning_rate=5e-4,  # Higher LR for faster convergence with frozen features
+            save_path=args.save_path,
+            image_pack=args.image_pack
+        )